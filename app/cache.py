@@ -0,0 +1,112 @@
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Hashable, Optional
+
+
+@dataclass
+class CacheEntry:
+    etag: str
+    body: Optional[bytes]
+    value: Any
+    stored_at: float
+
+
+class FetchCache:
+    """
+    A thread safe LRU cache for conditional Github requests.
+
+    Every entry holds the ETag, the raw response body and the parsed result of the last
+    successful fetch of a request, so a ``304 Not Modified`` can be answered without parsing
+    again. A request is keyed by its URL, Accept header and parser, so a revalidation never
+    returns the result of another parser.
+    """
+
+    def __init__(self, ttl_seconds: float, max_entries: int) -> None:
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[Hashable, CacheEntry]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable) -> Optional[CacheEntry]:
+        """
+        Return the cached entry for the key if it is younger than the TTL.
+
+        Parameters
+        ----------
+        key : Hashable
+            The cache key of the request.
+
+        Returns
+        -------
+        Optional[CacheEntry]
+            The cached entry or None if there is no fresh entry.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if time.monotonic() - entry.stored_at > self.ttl_seconds:
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return entry
+
+    def put(
+        self, key: Hashable, etag: str, body: Optional[bytes], value: Any
+    ) -> CacheEntry:
+        """
+        Store a fetched and parsed response and evict the least recently used entries.
+
+        Parameters
+        ----------
+        key : Hashable
+            The cache key of the request.
+        etag : str
+            The ETag header returned by Github.
+        body : Optional[bytes]
+            The raw response body or None if the body was streamed.
+        value : Any
+            The parsed result of the response body.
+
+        Returns
+        -------
+        CacheEntry
+            The stored entry.
+        """
+        entry = CacheEntry(
+            etag=etag, body=body, value=value, stored_at=time.monotonic()
+        )
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return entry
+
+    def touch(self, key: Hashable) -> None:
+        """
+        Reset the age of an entry after Github confirmed it is still current.
+
+        Parameters
+        ----------
+        key : Hashable
+            The cache key of the request.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                entry.stored_at = time.monotonic()
+                self._entries.move_to_end(key)
+
+    def clear(self) -> None:
+        """
+        Remove all entries from the cache.
+        """
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._entries)
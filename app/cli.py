@@ -0,0 +1,300 @@
+"""
+Parse local ARM templates and global parameter files into static json artifacts.
+
+Usage:
+
+    python -m app.cli path/to/adf-repository --output dist
+    python -m app.cli "repositories/*/some-factory" --output dist --format ndjson
+
+Inputs are files, directories, which are searched for 'ARMTemplateForFactory.json' and
+'*_GlobalParameters.json' files, or glob patterns. Every input is written to
+'<output>/<factory>/<document>.<format>'. Inputs whose content did not change since the
+previous run, according to '<output>/manifest.json', are skipped, unless the artifacts
+were written by a version of the parser with a different result.
+"""
+import argparse
+import glob
+import hashlib
+import json
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from pydantic import TypeAdapter
+
+from .documents import GLOBAL_PARAMETERS, USER_DEFINED_FUNCTIONS
+from .models import UserDefinedFunctionLibrary
+from .parse import parse_global_parameters_json, parse_udf_functions_with_comments
+from .responses import REPRESENTATION_VERSION
+
+ARM_TEMPLATE_FILE_NAME = "ARMTemplateForFactory.json"
+GLOBAL_PARAMETERS_SUFFIX = "_GlobalParameters.json"
+MANIFEST_FILE_NAME = "manifest.json"
+FORMATS = ("json", "ndjson")
+
+_UDF_LIBRARIES_ADAPTER = TypeAdapter(List[UserDefinedFunctionLibrary])
+
+
+@dataclass(frozen=True)
+class BatchInput:
+    path: str
+    factory_name: str
+    document: str
+
+
+def _classify(path: str) -> Optional[BatchInput]:
+    file_name = os.path.basename(path)
+    if file_name == ARM_TEMPLATE_FILE_NAME:
+        # '<factory>/ARMTemplateForFactory.json' in an adf_publish branch
+        factory_name = os.path.basename(os.path.dirname(os.path.abspath(path)))
+        return BatchInput(path, factory_name, USER_DEFINED_FUNCTIONS)
+    if file_name.endswith(GLOBAL_PARAMETERS_SUFFIX):
+        factory_name = file_name[: -len(GLOBAL_PARAMETERS_SUFFIX)]
+        return BatchInput(path, factory_name, GLOBAL_PARAMETERS)
+    return None
+
+
+def _expand(pattern: str) -> Iterator[str]:
+    paths = glob.glob(pattern, recursive=True) if glob.has_magic(pattern) else [pattern]
+    for path in sorted(paths):
+        if os.path.isdir(path):
+            for directory, _, file_names in sorted(os.walk(path)):
+                for file_name in sorted(file_names):
+                    yield os.path.join(directory, file_name)
+        else:
+            yield path
+
+
+def collect_inputs(patterns: List[str]) -> List[BatchInput]:
+    """
+    Find the ARM templates and global parameter files of the given paths and globs.
+
+    Parameters
+    ----------
+    patterns : List[str]
+        Files, directories and glob patterns.
+
+    Returns
+    -------
+    List[BatchInput]
+        The found files, every file once.
+    """
+    inputs = {}
+    for pattern in patterns:
+        for path in _expand(pattern):
+            batch_input = _classify(path)
+            if batch_input is not None:
+                inputs.setdefault(os.path.abspath(path), batch_input)
+    return list(inputs.values())
+
+
+def artifact_path(output: str, batch_input: BatchInput, output_format: str) -> str:
+    """
+    Build the path an input is written to.
+
+    Parameters
+    ----------
+    output : str
+        The output directory.
+    batch_input : BatchInput
+        The parsed file.
+    output_format : str
+        One of FORMATS.
+
+    Returns
+    -------
+    str
+        The path of the artifact.
+    """
+    return os.path.join(
+        output,
+        batch_input.factory_name,
+        f"{batch_input.document}.{output_format}",
+    )
+
+
+def _file_hash(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _serialize(batch_input: BatchInput, content: bytes, output_format: str) -> bytes:
+    if batch_input.document == GLOBAL_PARAMETERS:
+        global_parameters = parse_global_parameters_json(content)
+        if output_format == "json":
+            return global_parameters.model_dump_json().encode("utf-8")
+        # one parameter per line
+        return b"".join(
+            json.dumps(
+                {"name": name, **parameter.model_dump()}, separators=(",", ":")
+            ).encode("utf-8")
+            + b"\n"
+            for name, parameter in global_parameters.root.items()
+        )
+
+    libraries = parse_udf_functions_with_comments(json.loads(content))
+    if output_format == "json":
+        return _UDF_LIBRARIES_ADAPTER.dump_json(libraries)
+    # one library per line
+    return b"".join(
+        library.model_dump_json().encode("utf-8") + b"\n" for library in libraries
+    )
+
+
+def parse_to_artifact(batch_input: BatchInput, path: str, output_format: str) -> None:
+    """
+    Parse an input file and write it as an artifact.
+
+    The artifact is written to a temporary file first and then moved into place, so a
+    crashed run never leaves a partial artifact behind.
+
+    Parameters
+    ----------
+    batch_input : BatchInput
+        The file to parse.
+    path : str
+        The path of the artifact.
+    output_format : str
+        One of FORMATS.
+    """
+    with open(batch_input.path, "rb") as f:
+        content = f.read()
+    body = _serialize(batch_input, content, output_format)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    temporary_path = f"{path}.tmp"
+    with open(temporary_path, "wb") as f:
+        f.write(body)
+    os.replace(temporary_path, path)
+
+
+def _load_manifest(output: str) -> Dict[str, Dict[str, Any]]:
+    try:
+        with open(os.path.join(output, MANIFEST_FILE_NAME)) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+
+
+def _store_manifest(output: str, manifest: Dict[str, Dict[str, Any]]) -> None:
+    os.makedirs(output, exist_ok=True)
+    with open(os.path.join(output, MANIFEST_FILE_NAME), "w") as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+
+
+def run(
+    inputs: List[BatchInput], output: str, output_format: str, workers: int
+) -> Tuple[List[str], List[str], Dict[str, str]]:
+    """
+    Parse the changed inputs into artifacts and update the manifest.
+
+    Only the entries of the given inputs are updated, the entries of other inputs are
+    kept, so a run on a subset of the factories does not invalidate the others.
+
+    Parameters
+    ----------
+    inputs : List[BatchInput]
+        The files to parse.
+    output : str
+        The output directory.
+    output_format : str
+        One of FORMATS.
+    workers : int
+        The number of worker processes, 1 parses in the calling process.
+
+    Returns
+    -------
+    Tuple[List[str], List[str], Dict[str, str]]
+        The parsed and the skipped inputs and the error of every failed input.
+    """
+    previous_manifest = _load_manifest(output)
+    manifest = dict(previous_manifest)
+    pending: Dict[str, Tuple[BatchInput, str, Dict[str, str]]] = {}
+    skipped: List[str] = []
+    failed: Dict[str, str] = {}
+    artifacts: Dict[str, str] = {}
+
+    for batch_input in inputs:
+        path = artifact_path(output, batch_input, output_format)
+        # relative to the output, the manifest stays valid in another checkout
+        key = os.path.relpath(path, output)
+        if path in artifacts:
+            message = f"'{artifacts[path]}' is written to '{path}' too."
+            failed[batch_input.path] = message
+            continue
+        artifacts[path] = batch_input.path
+        entry = {
+            "sha256": _file_hash(batch_input.path),
+            "artifact": key,
+            # artifacts of an older parser are written again
+            "representation_version": REPRESENTATION_VERSION,
+        }
+        if previous_manifest.get(key) == entry and os.path.exists(path):
+            skipped.append(batch_input.path)
+        else:
+            pending[key] = (batch_input, path, entry)
+
+    if workers > 1 and len(pending) > 1:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            futures = {
+                key: executor.submit(
+                    parse_to_artifact, batch_input, path, output_format
+                )
+                for key, (batch_input, path, _) in pending.items()
+            }
+            results = {key: future.exception() for key, future in futures.items()}
+    else:
+        results = {}
+        for key, (batch_input, path, _) in pending.items():
+            try:
+                parse_to_artifact(batch_input, path, output_format)
+                results[key] = None
+            except Exception as e:
+                results[key] = e
+
+    parsed = []
+    for key, error in results.items():
+        batch_input, _, entry = pending[key]
+        if error is None:
+            parsed.append(batch_input.path)
+            manifest[key] = entry
+        else:
+            # failed inputs are dropped from the manifest, so the next run retries them
+            manifest.pop(key, None)
+            failed[batch_input.path] = str(error)
+
+    _store_manifest(output, manifest)
+    return parsed, skipped, failed
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0].strip())
+    parser.add_argument(
+        "inputs",
+        nargs="+",
+        help="Files, directories or glob patterns of ARM templates and global parameter files.",
+    )
+    parser.add_argument("--output", required=True, help="The output directory.")
+    parser.add_argument("--format", choices=FORMATS, default="json")
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=os.cpu_count() or 1,
+        help="The number of worker processes. Defaults to the number of cores.",
+    )
+    args = parser.parse_args(argv)
+
+    inputs = collect_inputs(args.inputs)
+    parsed, skipped, failed = run(inputs, args.output, args.format, args.workers)
+    for path, error in failed.items():
+        print(f"FAILED {path}: {error}", file=sys.stderr)
+    print(f"Parsed {len(parsed)}, skipped {len(skipped)}, failed {len(failed)} inputs.")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,12 +1,75 @@
+from typing import Dict, List, Literal, Optional
+
+from pydantic import BaseModel, model_validator
 from pydantic_settings import BaseSettings, SettingsConfigDict
 
 
+class FactoryTarget(BaseModel):
+    factory_name: str
+    organization_name: Optional[str] = None
+    repository_name: Optional[str] = None
+    branch_name: Optional[str] = None
+
+
 class GithubSettings(BaseSettings):
     base_url: str = "https://api.github.com/repos"
     repository_name: str = "azure-datafactory"
     branch_name: str = "adf_publish"
     organization_name: str
-    factory_name: str
+    factory_name: Optional[str] = None
+    factories: List[FactoryTarget] = []
     github_adf_token: str
+    cache_ttl_seconds: float = 300
+    cache_max_entries: int = 128
+    github_max_connections: int = 20
+    max_concurrent_fetches: int = 8
+    stream_arm_template: bool = True
+    incremental_parse: bool = True
+    parse_workers: int = 1
+    parallel_parse_min_script_lines: int = 20_000
+    github_webhook_secret: Optional[str] = None
+    snapshot_soft_ttl_seconds: float = 60
+    refresh_interval_seconds: Optional[float] = None
+    metrics_enabled: bool = False
+    source: Literal["github", "git_mirror"] = "github"
+    git_remote_url: str = "https://github.com/{organization_name}/{repository_name}.git"
+    git_mirror_directory: str = ".git-mirrors"
+    snapshot_store_path: Optional[str] = None
+    shared_snapshot_directory: Optional[str] = None
+    events_keepalive_seconds: float = 15
+    events_poll_seconds: float = 1
+    http_cache_control: str = "no-cache"
 
     model_config = SettingsConfigDict(env_file=".env")
+
+    @model_validator(mode="after")
+    def check_factories(self) -> "GithubSettings":
+        if not self.factory_name and not self.factories:
+            raise ValueError("Either 'factory_name' or 'factories' must be set.")
+        return self
+
+    def factory_settings(self) -> Dict[str, "GithubSettings"]:
+        """
+        Resolve the settings of every configured factory.
+
+        Organization, repository and branch of a factory default to the top level settings.
+
+        Returns
+        -------
+        Dict[str, GithubSettings]
+            The settings of every factory by factory name, in configuration order.
+        """
+        targets = self.factories or [FactoryTarget(factory_name=self.factory_name)]
+        return {
+            target.factory_name: self.model_copy(
+                update={
+                    "factory_name": target.factory_name,
+                    "organization_name": target.organization_name
+                    or self.organization_name,
+                    "repository_name": target.repository_name or self.repository_name,
+                    "branch_name": target.branch_name or self.branch_name,
+                    "factories": [],
+                }
+            )
+            for target in targets
+        }
@@ -0,0 +1,175 @@
+import base64
+import hashlib
+import json
+import os
+import subprocess
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List
+from urllib.parse import unquote, urlsplit
+
+import pytest
+
+FACTORY_NAME = "some-factory"
+ORGANIZATION_NAME = "some-organization"
+REPOSITORY_NAME = "azure-datafactory"
+BRANCH_NAME = "adf_publish"
+ARM_TEMPLATE_PATH = f"{FACTORY_NAME}/ARMTemplateForFactory.json"
+GLOBAL_PARAMETERS_PATH = (
+    f"{FACTORY_NAME}/globalParameters/{FACTORY_NAME}_GlobalParameters.json"
+)
+
+
+def arm_template(definition: str) -> bytes:
+    """
+    Build an ARM template with one UDF library holding 'CustomAdd' with the definition.
+    """
+    return json.dumps(
+        {
+            "resources": [
+                {
+                    "name": "[concat(parameters('factoryName'), '/SomeLibrary')]",
+                    "type": "Microsoft.DataFactory/factories/dataflows",
+                    "description": "Some Description",
+                    "properties": {
+                        "type": "UDFLibrary",
+                        "typeProperties": {
+                            "scriptLines": [
+                                f"CustomAdd(double, double) as double = {definition}"
+                            ]
+                        },
+                    },
+                }
+            ]
+        }
+    ).encode("utf-8")
+
+
+class StandInGithub:
+    """
+    A local stand-in for the Github contents API serving files from memory.
+    """
+
+    def __init__(self) -> None:
+        self.files: Dict[str, bytes] = {}
+        self.requests: List[str] = []
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), self._handler())
+        self._thread = threading.Thread(
+            target=self._server.serve_forever, args=(0.05,), daemon=True
+        )
+
+    @property
+    def base_url(self) -> str:
+        host, port = self._server.server_address
+        return f"http://{host}:{port}/repos"
+
+    def start(self) -> None:
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+
+    def _handler(self):
+        stand_in = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self) -> None:
+                stand_in.requests.append(self.path)
+                prefix = f"/repos/{ORGANIZATION_NAME}/{REPOSITORY_NAME}/contents/"
+                path = unquote(urlsplit(self.path).path)
+                content = stand_in.files.get(path[len(prefix) :])
+                if not path.startswith(prefix) or content is None:
+                    self._send(404, b'{"message": "Not Found"}')
+                    return
+                etag = '"' + hashlib.sha1(content).hexdigest() + '"'
+                if self.headers.get("If-None-Match") == etag:
+                    self._send(304, b"", etag)
+                    return
+                if self.headers.get("Accept") == "application/vnd.github.json":
+                    content = json.dumps(
+                        {"content": base64.b64encode(content).decode("ascii")}
+                    ).encode("utf-8")
+                self._send(200, content, etag)
+
+            def _send(self, status: int, body: bytes, etag: str = "") -> None:
+                self.send_response(status)
+                if etag:
+                    self.send_header("ETag", etag)
+                self.send_header("X-RateLimit-Remaining", "4999")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args) -> None:
+                pass
+
+        return Handler
+
+
+@pytest.fixture
+def stand_in_github():
+    stand_in = StandInGithub()
+    stand_in.start()
+    yield stand_in
+    stand_in.stop()
+
+
+@pytest.fixture
+def app_settings(monkeypatch, stand_in_github):
+    from . import main
+
+    monkeypatch.setenv("BASE_URL", stand_in_github.base_url)
+    monkeypatch.setenv("ORGANIZATION_NAME", ORGANIZATION_NAME)
+    monkeypatch.setenv("REPOSITORY_NAME", REPOSITORY_NAME)
+    monkeypatch.setenv("FACTORY_NAME", FACTORY_NAME)
+    monkeypatch.setenv("GITHUB_ADF_TOKEN", "some-token")
+
+    def clear_caches():
+        main.get_settings.cache_clear()
+        main.get_fetch_cache.cache_clear()
+
+    clear_caches()
+    yield monkeypatch
+    clear_caches()
+
+
+class LocalRepository:
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self._git("init", "--quiet", "--initial-branch", BRANCH_NAME)
+
+    def commit(self, files) -> None:
+        for path, content in files.items():
+            file_path = os.path.join(self.path, path)
+            os.makedirs(os.path.dirname(file_path), exist_ok=True)
+            with open(file_path, "wb") as f:
+                f.write(content)
+        self._git("add", "--all")
+        self._git("commit", "--quiet", "--message", "Azure Data Factory publish")
+
+    def head(self) -> str:
+        return self._git("rev-parse", "HEAD").decode("ascii").strip()
+
+    def _git(self, *args: str) -> bytes:
+        return subprocess.run(
+            [
+                "git",
+                "-C",
+                self.path,
+                "-c",
+                "user.name=some-user",
+                "-c",
+                "user.email=some-user@example.com",
+                *args,
+            ],
+            check=True,
+            capture_output=True,
+        ).stdout
+
+
+@pytest.fixture
+def local_repository(tmp_path):
+    path = tmp_path / "remote" / ORGANIZATION_NAME / REPOSITORY_NAME
+    path.mkdir(parents=True)
+    return LocalRepository(str(path))
@@ -0,0 +1,220 @@
+from collections import Counter
+from typing import Dict, List, Tuple
+
+from .incremental import _content_hash
+from .models import (
+    DocumentDiff,
+    FieldChange,
+    GlobalParameterChange,
+    GlobalParameterDiff,
+    GlobalParameterReference,
+    GlobalParameters,
+    UserDefinedFunction,
+    UserDefinedFunctionChange,
+    UserDefinedFunctionDiff,
+    UserDefinedFunctionLibrary,
+    UserDefinedFunctionReference,
+)
+
+# every serialized field, so any change of the parse result shows up in the diff
+DIFF_FIELDS = ("declaration", "definition", "documentation", "params", "examples")
+
+# a function is identified by its name and, for duplicate names, its occurrence
+_FunctionKey = Tuple[str, int]
+
+
+def _function_hash(function: UserDefinedFunction) -> str:
+    return _content_hash(
+        function.name,
+        function.declaration,
+        function.definition,
+        function.documentation,
+        function.params,
+        function.examples,
+    )
+
+
+def _keyed_functions(
+    library: UserDefinedFunctionLibrary,
+) -> Dict[_FunctionKey, Tuple[str, UserDefinedFunction]]:
+    occurrences: Counter = Counter()
+    keyed = {}
+    for function in library.functions:
+        keyed[(function.name, occurrences[function.name])] = (
+            _function_hash(function),
+            function,
+        )
+        occurrences[function.name] += 1
+    return keyed
+
+
+def _library_hash(
+    library: UserDefinedFunctionLibrary,
+    functions: Dict[_FunctionKey, Tuple[str, UserDefinedFunction]],
+) -> str:
+    return _content_hash(
+        library.name,
+        library.description,
+        *[function_hash for function_hash, _ in functions.values()],
+    )
+
+
+def _field_changes(
+    base: UserDefinedFunction, head: UserDefinedFunction
+) -> List[FieldChange]:
+    return [
+        FieldChange(field=field, base=getattr(base, field), head=getattr(head, field))
+        for field in DIFF_FIELDS
+        if getattr(base, field) != getattr(head, field)
+    ]
+
+
+def diff_udf_libraries(
+    base: List[UserDefinedFunctionLibrary], head: List[UserDefinedFunctionLibrary]
+) -> UserDefinedFunctionDiff:
+    """
+    Compare two parsed versions of the UDF libraries of a factory.
+
+    Libraries are matched by name and functions by name within their library. Libraries
+    and functions with the same content hash on both sides are skipped, only functions
+    whose hash changed are compared field by field.
+
+    Parameters
+    ----------
+    base : List[UserDefinedFunctionLibrary]
+        The older version.
+    head : List[UserDefinedFunctionLibrary]
+        The newer version.
+
+    Returns
+    -------
+    UserDefinedFunctionDiff
+        The added, removed and changed functions in the order of the libraries.
+    """
+    diff = UserDefinedFunctionDiff(added=[], removed=[], changed=[])
+    base_libraries = {library.name: library for library in base}
+    head_names = {library.name for library in head}
+
+    for head_library in head:
+        head_functions = _keyed_functions(head_library)
+        base_library = base_libraries.get(head_library.name)
+        if base_library is None:
+            base_functions = {}
+        else:
+            base_functions = _keyed_functions(base_library)
+            if _library_hash(base_library, base_functions) == _library_hash(
+                head_library, head_functions
+            ):
+                continue
+
+        for key, (head_hash, head_function) in head_functions.items():
+            if key not in base_functions:
+                diff.added.append(
+                    UserDefinedFunctionReference(
+                        library=head_library.name, function=head_function
+                    )
+                )
+                continue
+            base_hash, base_function = base_functions[key]
+            if base_hash == head_hash:
+                continue
+            changes = _field_changes(base_function, head_function)
+            if changes:
+                diff.changed.append(
+                    UserDefinedFunctionChange(
+                        library=head_library.name,
+                        name=head_function.name,
+                        changes=changes,
+                    )
+                )
+        for key, (_, base_function) in base_functions.items():
+            if key not in head_functions:
+                diff.removed.append(
+                    UserDefinedFunctionReference(
+                        library=head_library.name, function=base_function
+                    )
+                )
+
+    for base_library in base:
+        if base_library.name not in head_names:
+            diff.removed.extend(
+                UserDefinedFunctionReference(library=base_library.name, function=f)
+                for f in base_library.functions
+            )
+    return diff
+
+
+def diff_global_parameters(
+    base: GlobalParameters, head: GlobalParameters
+) -> GlobalParameterDiff:
+    """
+    Compare two parsed versions of the global parameters of a factory.
+
+    Parameters are matched by name, a parameter changed if its type or value changed.
+
+    Parameters
+    ----------
+    base : GlobalParameters
+        The older version.
+    head : GlobalParameters
+        The newer version.
+
+    Returns
+    -------
+    GlobalParameterDiff
+        The added and changed parameters in the order of the newer version and the
+        removed parameters in the order of the older version.
+    """
+    diff = GlobalParameterDiff(added=[], removed=[], changed=[])
+    for name, head_parameter in head.root.items():
+        base_parameter = base.root.get(name)
+        if base_parameter is None:
+            diff.added.append(
+                GlobalParameterReference(name=name, parameter=head_parameter)
+            )
+        elif base_parameter != head_parameter:
+            diff.changed.append(
+                GlobalParameterChange(
+                    name=name, base=base_parameter, head=head_parameter
+                )
+            )
+    for name, base_parameter in base.root.items():
+        if name not in head.root:
+            diff.removed.append(
+                GlobalParameterReference(name=name, parameter=base_parameter)
+            )
+    return diff
+
+
+def diff_documents(
+    base_parameters: GlobalParameters,
+    head_parameters: GlobalParameters,
+    base_libraries: List[UserDefinedFunctionLibrary],
+    head_libraries: List[UserDefinedFunctionLibrary],
+) -> DocumentDiff:
+    """
+    Compare two parsed versions of the global parameters and UDF libraries of a factory.
+
+    Parameters
+    ----------
+    base_parameters : GlobalParameters
+        The older version of the global parameters.
+    head_parameters : GlobalParameters
+        The newer version of the global parameters.
+    base_libraries : List[UserDefinedFunctionLibrary]
+        The older version of the UDF libraries.
+    head_libraries : List[UserDefinedFunctionLibrary]
+        The newer version of the UDF libraries.
+
+    Returns
+    -------
+    DocumentDiff
+        The changed functions and the changed global parameters.
+    """
+    udf_diff = diff_udf_libraries(base_libraries, head_libraries)
+    return DocumentDiff(
+        added=udf_diff.added,
+        removed=udf_diff.removed,
+        changed=udf_diff.changed,
+        global_parameters=diff_global_parameters(base_parameters, head_parameters),
+    )
@@ -0,0 +1,716 @@
+import asyncio
+import hashlib
+import json
+import logging
+import threading
+import time
+from dataclasses import dataclass, replace
+from typing import (
+    Any,
+    Coroutine,
+    Dict,
+    FrozenSet,
+    Iterable,
+    List,
+    Optional,
+    Tuple,
+    Union,
+)
+
+import httpx
+from pydantic import TypeAdapter
+from starlette.concurrency import run_in_threadpool
+
+from .config import GithubSettings
+from .events import (
+    ChangeBroadcaster,
+    global_parameters_change_event,
+    udf_change_event,
+)
+from .github import (
+    GithubClient,
+    GithubError,
+    arm_template_path,
+    arm_template_url,
+    github_headers,
+    global_parameters_path,
+    global_parameters_url,
+)
+from .incremental import IncrementalUDFParser
+from .metrics import STAGE_SECONDS
+from .mirror import GitMirror
+from .models import (
+    GlobalParameters,
+    UserDefinedFunction,
+    UserDefinedFunctionLibrary,
+)
+from .parallel import ParallelUDFParser
+from .parse import (
+    UDFLibraryStreamParser,
+    parse_global_parameters_json,
+    parse_udf_functions_with_comments,
+)
+from .responses import EncodedBody, encode_body, join_json_object
+from .search import UDFSearchIndex
+from .shared import SharedSnapshotCache
+from .store import SnapshotStore, StoredVersion
+
+logger = logging.getLogger(__name__)
+
+GLOBAL_PARAMETERS = "global-parameters"
+USER_DEFINED_FUNCTIONS = "user-defined-functions"
+DOCUMENTS = (GLOBAL_PARAMETERS, USER_DEFINED_FUNCTIONS)
+
+# the interval in which a worker checks if another worker released the lock of a factory
+SHARED_LOCK_RETRY_SECONDS = 0.05
+
+# bundle bodies kept per document service, e.g. one per page of a portal
+MAX_BUNDLES = 16
+
+_DOCUMENT_ADAPTERS = {
+    GLOBAL_PARAMETERS: TypeAdapter(GlobalParameters),
+    USER_DEFINED_FUNCTIONS: TypeAdapter(List[UserDefinedFunctionLibrary]),
+}
+
+
+def _decode_body(res: httpx.Response) -> Any:
+    with STAGE_SECONDS.time(stage="body_decode"):
+        return res.json()
+
+
+def _source_sha(content: bytes) -> str:
+    return hashlib.sha256(content).hexdigest()
+
+
+@dataclass(frozen=True)
+class _Loaded:
+    value: Any
+    source_sha: str
+
+
+class _HashingStreamParser:
+    """
+    Hashes the source file while it is fed to a stream parser.
+    """
+
+    def __init__(self, stream_parser: UDFLibraryStreamParser) -> None:
+        self._stream_parser = stream_parser
+        self._digest = hashlib.sha256()
+
+    def feed(self, chunk: bytes) -> None:
+        self._digest.update(chunk)
+        self._stream_parser.feed(chunk)
+
+    def close(self) -> _Loaded:
+        return _Loaded(self._stream_parser.close(), self._digest.hexdigest())
+
+
+class UnknownFactoryError(Exception):
+    """
+    Raised when a factory is requested that is not configured.
+    """
+
+    def __init__(self, factory_name: str) -> None:
+        super().__init__(factory_name)
+        self.factory_name = factory_name
+
+
+@dataclass(frozen=True)
+class UDFLookupIndex:
+    """
+    The libraries and functions of a snapshot by name, for point lookups in O(1).
+
+    If a library defines a function name twice, the first definition is kept.
+    """
+
+    libraries: Dict[str, UserDefinedFunctionLibrary]
+    functions: Dict[Tuple[str, str], UserDefinedFunction]
+
+    @classmethod
+    def build(cls, libraries: List[UserDefinedFunctionLibrary]) -> "UDFLookupIndex":
+        functions: Dict[Tuple[str, str], UserDefinedFunction] = {}
+        for library in libraries:
+            for function in library.functions:
+                functions.setdefault((library.name, function.name), function)
+        return cls({library.name: library for library in libraries}, functions)
+
+
+@dataclass
+class Snapshot:
+    value: Any
+    fetched_at: float
+    body: EncodedBody
+    source_sha: str
+    udf_index: Optional[UDFLookupIndex] = None
+    # the time the source first had this content, 'Last-Modified' of the responses
+    modified_at: Optional[float] = None
+
+    def __post_init__(self) -> None:
+        if self.modified_at is None:
+            self.modified_at = self.fetched_at
+
+    @property
+    def age(self) -> float:
+        return time.time() - self.fetched_at
+
+    def refetched(self, fetched_at: float) -> "Snapshot":
+        """
+        Return the same snapshot with a new fetch time, for a source that did not change.
+        """
+        return replace(self, fetched_at=fetched_at)
+
+
+class DocumentService:
+    """
+    Loads the documentation of a factory from Github and keeps the last parsed snapshots.
+
+    The files are fetched from the contents API or, if a git mirror is given, read from the
+    local mirror of the repository. With a snapshot store, every new version is persisted
+    and the latest versions can be restored after a restart.
+
+    With a shared cache, the worker processes of the app share their snapshots. Only one
+    worker at a time loads the documents of a factory, the others wait for it and adopt
+    its result instead of fetching and parsing the same files again.
+
+    Whenever a new snapshot parses to a different result than the previous one, the
+    changed names are published to the subscribers of 'changes'.
+
+    Reads are answered from the last good snapshot without contacting Github. Once a
+    snapshot is older than the soft TTL, a read triggers a reload in the background
+    (stale-while-revalidate). Snapshots are also kept current by Github push webhooks and
+    by the periodic refresher started from the app lifespan.
+    """
+
+    def __init__(
+        self,
+        github_settings: GithubSettings,
+        github_client: GithubClient,
+        udf_parser: Optional[IncrementalUDFParser] = None,
+        git_mirror: Optional[GitMirror] = None,
+        parallel_parser: Optional[ParallelUDFParser] = None,
+        snapshot_store: Optional[SnapshotStore] = None,
+        shared_cache: Optional[SharedSnapshotCache] = None,
+    ) -> None:
+        self.github_settings = github_settings
+        self.github_client = github_client
+        self.udf_parser = udf_parser
+        self.git_mirror = git_mirror
+        self.parallel_parser = parallel_parser
+        self.snapshot_store = snapshot_store
+        self.shared_cache = shared_cache
+        self.search_index = UDFSearchIndex()
+        self.changes = ChangeBroadcaster(
+            github_settings.events_keepalive_seconds,
+            poll=self._adopt_changed_shared if shared_cache is not None else None,
+            poll_seconds=github_settings.events_poll_seconds,
+        )
+        self._snapshots: Dict[str, Snapshot] = {}
+        self._revalidating: Dict[str, "asyncio.Task[Any]"] = {}
+        self._bundles: Dict[Tuple[str, str, FrozenSet[str]], EncodedBody] = {}
+        self._bundles_lock = threading.Lock()
+
+    def snapshot(self, document: str) -> Optional[Snapshot]:
+        """
+        Return the last loaded snapshot of a document.
+
+        Parameters
+        ----------
+        document : str
+            One of GLOBAL_PARAMETERS and USER_DEFINED_FUNCTIONS.
+
+        Returns
+        -------
+        Optional[Snapshot]
+            The snapshot or None if the document was not loaded yet.
+        """
+        return self._snapshots.get(document)
+
+    async def get(self, document: str) -> Snapshot:
+        """
+        Return the snapshot of a document and revalidate it in the background if it is stale.
+
+        Only the very first read of a document waits for Github.
+
+        Parameters
+        ----------
+        document : str
+            One of GLOBAL_PARAMETERS and USER_DEFINED_FUNCTIONS.
+
+        Returns
+        -------
+        Snapshot
+            The snapshot of the parsed document.
+        """
+        snapshot = self._snapshots.get(document)
+        if self.shared_cache is not None and self.shared_cache.changed(
+            self.github_settings.factory_name, document
+        ):
+            if snapshot is None:
+                snapshot = await self._adopt_shared(document)
+            else:
+                # validating the snapshot of another worker is kept off the request
+                self._in_background(document, self._adopt_shared(document))
+        if snapshot is None:
+            return await self.load(document)
+        if (
+            snapshot.age > self.github_settings.snapshot_soft_ttl_seconds
+            and document not in self._revalidating
+        ):
+            self._in_background(document, self.refresh([document]))
+        return snapshot
+
+    def _in_background(self, document: str, work: Coroutine[Any, Any, Any]) -> None:
+        if document in self._revalidating:
+            # the running revalidation or adoption picks up the newest snapshot
+            work.close()
+            return
+        revalidation = asyncio.ensure_future(work)
+        self._revalidating[document] = revalidation
+        revalidation.add_done_callback(
+            lambda done: self._forget_background(document, done)
+        )
+
+    def _forget_background(self, document: str, done: "asyncio.Future[Any]") -> None:
+        self._revalidating.pop(document, None)
+        if not done.cancelled() and done.exception() is not None:
+            logger.error(
+                "Updating '%s' in the background failed.",
+                document,
+                exc_info=done.exception(),
+            )
+
+    async def load(self, document: str) -> Snapshot:
+        """
+        Fetch and parse a document from Github and store it as the latest snapshot.
+
+        Parameters
+        ----------
+        document : str
+            One of GLOBAL_PARAMETERS and USER_DEFINED_FUNCTIONS.
+
+        Returns
+        -------
+        Snapshot
+            The snapshot of the parsed document.
+
+        Raises
+        ------
+        GithubError
+            If Github answers with a non successful status code.
+        """
+        if self.shared_cache is None:
+            return await self._load_snapshot(document)
+        requested_at = time.time()
+        lock = self.shared_cache.lock(self.github_settings.factory_name, document)
+        try:
+            # polled, a blocking wait would hold a threadpool thread for the whole load
+            # of another worker
+            while not lock.try_acquire():
+                await asyncio.sleep(SHARED_LOCK_RETRY_SECONDS)
+            # another worker may have loaded the document while this one waited
+            shared = await self._adopt_shared(document, newer_than=requested_at)
+            if shared is not None:
+                return shared
+            snapshot = await self._load_snapshot(document)
+            await run_in_threadpool(
+                self.shared_cache.save,
+                self.github_settings.factory_name,
+                document,
+                snapshot.source_sha,
+                snapshot.fetched_at,
+                snapshot.body,
+            )
+            return snapshot
+        finally:
+            lock.release()
+
+    async def _load_snapshot(self, document: str) -> Snapshot:
+        loaded = await self._load(document, self.github_settings, incremental=True)
+        previous = self._snapshots.get(document)
+        if previous is not None and previous.source_sha == loaded.source_sha:
+            # the source did not change, the previous value and body are still valid
+            snapshot = previous.refetched(time.time())
+        else:
+            body, udf_index = await run_in_threadpool(
+                self._prepare, document, loaded.value
+            )
+            snapshot = Snapshot(
+                loaded.value, time.time(), body, loaded.source_sha, udf_index
+            )
+            if self.snapshot_store is not None:
+                await run_in_threadpool(
+                    self.snapshot_store.save,
+                    self.github_settings.factory_name,
+                    document,
+                    snapshot.source_sha,
+                    snapshot.fetched_at,
+                    snapshot.value,
+                    snapshot.body,
+                )
+        self._snapshots[document] = snapshot
+        await self._publish_changes(document, previous, snapshot)
+        return snapshot
+
+    async def _publish_changes(
+        self, document: str, previous: Optional[Snapshot], snapshot: Snapshot
+    ) -> None:
+        if previous is None or previous.source_sha == snapshot.source_sha:
+            return
+        change_event = (
+            udf_change_event
+            if document == USER_DEFINED_FUNCTIONS
+            else global_parameters_change_event
+        )
+        event = await run_in_threadpool(
+            change_event,
+            self.github_settings.factory_name,
+            document,
+            snapshot.source_sha,
+            previous.value,
+            snapshot.value,
+        )
+        if event is not None:
+            self.changes.publish(event)
+
+    def bundle_body(
+        self,
+        global_parameters: Snapshot,
+        user_defined_functions: Snapshot,
+        excluded_fields: FrozenSet[str],
+    ) -> EncodedBody:
+        """
+        Join both documents into one pre-encoded body, without some fields of the functions.
+
+        A bundle is serialized and compressed once per pair of snapshots and projection,
+        and kept for the following reads.
+
+        Parameters
+        ----------
+        global_parameters : Snapshot
+            A snapshot of GLOBAL_PARAMETERS.
+        user_defined_functions : Snapshot
+            A snapshot of USER_DEFINED_FUNCTIONS.
+        excluded_fields : FrozenSet[str]
+            The fields left out of every function.
+
+        Returns
+        -------
+        EncodedBody
+            The bundle with its compressed variants.
+        """
+        key = (
+            global_parameters.source_sha,
+            user_defined_functions.source_sha,
+            excluded_fields,
+        )
+        with self._bundles_lock:
+            body = self._bundles.get(key)
+        if body is not None:
+            return body
+        user_defined_functions_body = user_defined_functions.body.identity
+        if excluded_fields:
+            with STAGE_SECONDS.time(stage="serialization"):
+                user_defined_functions_body = _DOCUMENT_ADAPTERS[
+                    USER_DEFINED_FUNCTIONS
+                ].dump_json(
+                    user_defined_functions.value,
+                    exclude={"__all__": {"functions": {"__all__": excluded_fields}}},
+                )
+        with STAGE_SECONDS.time(stage="compression"):
+            body = encode_body(
+                join_json_object(
+                    {
+                        "global_parameters": global_parameters.body.identity,
+                        "user_defined_functions": user_defined_functions_body,
+                    }
+                )
+            )
+        with self._bundles_lock:
+            self._bundles[key] = body
+            while len(self._bundles) > MAX_BUNDLES:
+                self._bundles.pop(next(iter(self._bundles)))
+        return body
+
+    async def get_at(self, document: str, ref: str) -> Any:
+        """
+        Return a document as of a branch or commit.
+
+        The configured branch is answered from its snapshot. Other refs are fetched
+        conditionally and parsed without touching the state of the incremental parser, so
+        a read of an old commit does not evict the results of the current one.
+
+        Parameters
+        ----------
+        document : str
+            One of GLOBAL_PARAMETERS and USER_DEFINED_FUNCTIONS.
+        ref : str
+            A branch name or a full commit SHA.
+
+        Returns
+        -------
+        Any
+            The parsed document.
+
+        Raises
+        ------
+        GithubError
+            If Github answers with a non successful status code.
+        """
+        if ref == self.github_settings.branch_name:
+            return (await self.get(document)).value
+        github_settings = self.github_settings.model_copy(update={"branch_name": ref})
+        loaded = await self._load(document, github_settings, incremental=False)
+        return loaded.value
+
+    def restore(self) -> List[str]:
+        """
+        Restore the latest stored snapshot of every document from the snapshot store.
+
+        The restored snapshots keep the time they were fetched at, so reads are answered
+        right away and stale ones are revalidated in the background.
+
+        Returns
+        -------
+        List[str]
+            The documents that were restored.
+        """
+        if self.snapshot_store is None:
+            return []
+        restored = []
+        for document in DOCUMENTS:
+            stored = self.snapshot_store.latest(
+                self.github_settings.factory_name, document
+            )
+            if stored is None:
+                continue
+            self._snapshots[document] = self._snapshot_from_stored(document, stored)
+            restored.append(document)
+        return restored
+
+    def _snapshot_from_stored(self, document: str, stored: StoredVersion) -> Snapshot:
+        previous = self._snapshots.get(document)
+        if previous is not None and previous.source_sha == stored.source_sha:
+            return previous.refetched(stored.stored_at)
+        value = _DOCUMENT_ADAPTERS[document].validate_json(stored.body.identity)
+        return Snapshot(
+            value,
+            stored.stored_at,
+            stored.body,
+            stored.source_sha,
+            self._index(document, value),
+        )
+
+    async def _adopt_shared(
+        self, document: str, newer_than: Optional[float] = None
+    ) -> Optional[Snapshot]:
+        """
+        Take over the snapshot another worker wrote to the shared cache if it is newer.
+        """
+        shared = await run_in_threadpool(
+            self.shared_cache.latest, self.github_settings.factory_name, document
+        )
+        if shared is None:
+            return None
+        previous = self._snapshots.get(document)
+        if newer_than is None and previous is not None:
+            newer_than = previous.fetched_at
+        if newer_than is not None and shared.stored_at < newer_than:
+            return None
+        snapshot = await run_in_threadpool(self._snapshot_from_stored, document, shared)
+        self._snapshots[document] = snapshot
+        await self._publish_changes(document, previous, snapshot)
+        return snapshot
+
+    async def _adopt_changed_shared(self) -> None:
+        """
+        Take over the snapshots other workers wrote since the last check.
+
+        It keeps the event subscribers of this worker informed about reloads of other
+        workers, without waiting for a read of the document.
+        """
+        for document in DOCUMENTS:
+            if self.shared_cache.changed(self.github_settings.factory_name, document):
+                await self._adopt_shared(document)
+
+    def _prepare(
+        self, document: str, value: Any
+    ) -> Tuple[EncodedBody, Optional[UDFLookupIndex]]:
+        udf_index = self._index(document, value)
+        with STAGE_SECONDS.time(stage="serialization"):
+            body = _DOCUMENT_ADAPTERS[document].dump_json(value)
+        with STAGE_SECONDS.time(stage="compression"):
+            return encode_body(body), udf_index
+
+    def _index(self, document: str, value: Any) -> Optional[UDFLookupIndex]:
+        if document != USER_DEFINED_FUNCTIONS:
+            # the global parameters are a dict by name already
+            return None
+        self.search_index.update(value)
+        return UDFLookupIndex.build(value)
+
+    async def refresh(self, documents: Iterable[str]) -> List[str]:
+        """
+        Reload documents in the background and keep the old snapshot on failure.
+
+        Parameters
+        ----------
+        documents : Iterable[str]
+            The documents to reload.
+
+        Returns
+        -------
+        List[str]
+            The documents that were reloaded successfully.
+        """
+        refreshed = []
+        for document in documents:
+            try:
+                await self.load(document)
+                refreshed.append(document)
+            except Exception:
+                logger.exception("Refreshing '%s' failed.", document)
+        return refreshed
+
+    async def run_refresher(self, interval_seconds: Optional[float]) -> None:
+        """
+        Load all documents and keep reloading them on an interval.
+
+        Parameters
+        ----------
+        interval_seconds : Optional[float]
+            The time between two refreshes or None to load the documents only once.
+        """
+        while True:
+            await self.refresh(DOCUMENTS)
+            if interval_seconds is None:
+                return
+            await asyncio.sleep(interval_seconds)
+
+    async def _load(
+        self, document: str, github_settings: GithubSettings, incremental: bool
+    ) -> _Loaded:
+        if document == GLOBAL_PARAMETERS:
+            return await self._load_global_parameters(github_settings)
+        if document == USER_DEFINED_FUNCTIONS:
+            return await self._load_user_defined_functions(github_settings, incremental)
+        raise ValueError(f"Unknown document '{document}'.")
+
+    async def _load_global_parameters(self, github_settings: GithubSettings) -> _Loaded:
+        if self.git_mirror is not None:
+            return await self.git_mirror.read(
+                github_settings.branch_name,
+                global_parameters_path(github_settings),
+                self._parse_global_parameters,
+            )
+        headers = github_headers(github_settings, "application/vnd.github.raw")
+        return await self.github_client.fetch(
+            global_parameters_url(github_settings),
+            headers,
+            lambda res: self._parse_global_parameters(res.content),
+            parser_key=GLOBAL_PARAMETERS,
+        )
+
+    def _parse_global_parameters(self, content: bytes) -> _Loaded:
+        return _Loaded(parse_global_parameters_json(content), _source_sha(content))
+
+    async def _load_user_defined_functions(
+        self, github_settings: GithubSettings, incremental: bool
+    ) -> _Loaded:
+        if self.git_mirror is not None:
+            return await self.git_mirror.read(
+                github_settings.branch_name,
+                arm_template_path(github_settings),
+                lambda content: self._parse_arm_template(content, incremental),
+            )
+        headers = github_headers(github_settings, "application/vnd.github.raw")
+        request_url = arm_template_url(github_settings)
+        if github_settings.stream_arm_template:
+            return await self.github_client.fetch_streamed(
+                request_url,
+                headers,
+                lambda: _HashingStreamParser(self._stream_parser(incremental)),
+                parser_key=(USER_DEFINED_FUNCTIONS, incremental),
+            )
+        return await self.github_client.fetch(
+            request_url,
+            headers,
+            lambda res: _Loaded(
+                self._parse_udfs(_decode_body(res), incremental),
+                _source_sha(res.content),
+            ),
+            parser_key=(USER_DEFINED_FUNCTIONS, incremental),
+        )
+
+    def _parse_arm_template(self, content: bytes, incremental: bool) -> _Loaded:
+        if self.github_settings.stream_arm_template:
+            stream_parser = self._stream_parser(incremental)
+            stream_parser.feed(content)
+            return _Loaded(stream_parser.close(), _source_sha(content))
+        with STAGE_SECONDS.time(stage="body_decode"):
+            file_content = json.loads(content)
+        return _Loaded(
+            self._parse_udfs(file_content, incremental), _source_sha(content)
+        )
+
+    def _stream_parser(self, incremental: bool) -> UDFLibraryStreamParser:
+        if incremental and self.udf_parser is not None:
+            return self.udf_parser.stream_parser()
+        if self.parallel_parser is not None:
+            return UDFLibraryStreamParser(self.parallel_parser.parse_libraries)
+        return UDFLibraryStreamParser()
+
+    def _parse_udfs(self, file_content: Dict[str, Any], incremental: bool) -> Any:
+        if incremental and self.udf_parser is not None:
+            return self.udf_parser.parse(file_content)
+        if self.parallel_parser is not None:
+            return parse_udf_functions_with_comments(
+                file_content, self.parallel_parser.parse_libraries
+            )
+        return parse_udf_functions_with_comments(file_content)
+
+
+async def gather_snapshots(
+    document_services: Dict[str, DocumentService], document: str, limit: int
+) -> Dict[str, Union[Snapshot, Exception]]:
+    """
+    Get a document of many factories concurrently with a bounded number of loads.
+
+    A factory that cannot be loaded or parsed does not fail the others, its error is
+    returned in place of its snapshot and the other loads run to completion.
+
+    Parameters
+    ----------
+    document_services : Dict[str, DocumentService]
+        The document services by factory name.
+    document : str
+        One of GLOBAL_PARAMETERS and USER_DEFINED_FUNCTIONS.
+    limit : int
+        The maximum number of factories loaded at the same time.
+
+    Returns
+    -------
+    Dict[str, Union[Snapshot, Exception]]
+        The snapshots or the errors by factory name, in the order of the factories.
+    """
+    semaphore = asyncio.Semaphore(limit)
+
+    async def get(
+        document_service: DocumentService,
+    ) -> Union[Snapshot, Exception]:
+        async with semaphore:
+            try:
+                return await document_service.get(document)
+            except (GithubError, httpx.HTTPError) as e:
+                return e
+            except Exception as e:
+                logger.exception(
+                    "Loading '%s' of factory '%s' failed.",
+                    document,
+                    document_service.github_settings.factory_name,
+                )
+                return e
+
+    snapshots = await asyncio.gather(
+        *[get(document_service) for document_service in document_services.values()]
+    )
+    return dict(zip(document_services, snapshots))
@@ -0,0 +1,277 @@
+import asyncio
+import logging
+from collections import deque
+from typing import AsyncIterator, Awaitable, Callable, Deque, List, Optional, Tuple
+
+from .diff import diff_udf_libraries
+from .models import (
+    ChangedFunction,
+    DocumentChangeEvent,
+    GlobalParameters,
+    UserDefinedFunctionLibrary,
+)
+
+logger = logging.getLogger(__name__)
+
+# events kept for subscribers that reconnect with 'Last-Event-ID'
+EVENT_HISTORY = 100
+
+
+def udf_change_event(
+    factory_name: str,
+    document: str,
+    snapshot_id: str,
+    base: List[UserDefinedFunctionLibrary],
+    head: List[UserDefinedFunctionLibrary],
+) -> Optional[DocumentChangeEvent]:
+    """
+    Describe the changes between two parsed versions of the UDF libraries.
+
+    Parameters
+    ----------
+    factory_name : str
+        The name of the factory.
+    document : str
+        The changed document.
+    snapshot_id : str
+        The SHA-256 of the source file of the new version.
+    base : List[UserDefinedFunctionLibrary]
+        The previous version.
+    head : List[UserDefinedFunctionLibrary]
+        The new version.
+
+    Returns
+    -------
+    Optional[DocumentChangeEvent]
+        The names of the changed libraries and functions or None if the parse result
+        did not change.
+    """
+    diff = diff_udf_libraries(base, head)
+    functions = [
+        ChangedFunction(library=reference.library, name=reference.function.name)
+        for reference in diff.added + diff.removed
+    ] + [
+        ChangedFunction(library=change.library, name=change.name)
+        for change in diff.changed
+    ]
+    base_libraries = {library.name: library for library in base}
+    head_libraries = {library.name: library for library in head}
+    libraries = dict.fromkeys(function.library for function in functions)
+    for name in {*base_libraries, *head_libraries}:
+        base_library = base_libraries.get(name)
+        head_library = head_libraries.get(name)
+        if (
+            base_library is None
+            or head_library is None
+            or base_library.description != head_library.description
+        ):
+            libraries.setdefault(name)
+    if not libraries:
+        return None
+    return DocumentChangeEvent(
+        factory=factory_name,
+        document=document,
+        snapshot_id=snapshot_id,
+        libraries=sorted(libraries),
+        functions=functions,
+    )
+
+
+def global_parameters_change_event(
+    factory_name: str,
+    document: str,
+    snapshot_id: str,
+    base: GlobalParameters,
+    head: GlobalParameters,
+) -> Optional[DocumentChangeEvent]:
+    """
+    Describe the changes between two parsed versions of the global parameters.
+
+    Parameters
+    ----------
+    factory_name : str
+        The name of the factory.
+    document : str
+        The changed document.
+    snapshot_id : str
+        The SHA-256 of the source file of the new version.
+    base : GlobalParameters
+        The previous version.
+    head : GlobalParameters
+        The new version.
+
+    Returns
+    -------
+    Optional[DocumentChangeEvent]
+        The names of the added, removed and changed global parameters or None if the
+        parse result did not change.
+    """
+    names = sorted(
+        name
+        for name in {*base.root, *head.root}
+        if base.root.get(name) != head.root.get(name)
+    )
+    if not names:
+        return None
+    return DocumentChangeEvent(
+        factory=factory_name,
+        document=document,
+        snapshot_id=snapshot_id,
+        global_parameters=names,
+    )
+
+
+class ChangeBroadcaster:
+    """
+    Pushes change events to any number of Server-Sent Events subscribers.
+
+    An event is serialized once when it is published. Subscribers do not own a queue or
+    a timer, they wait on one shared asyncio event and then copy the new frames from a
+    short history. A single heartbeat wakes all subscribers to send keepalive comments.
+    An idle subscriber is therefore a single suspended coroutine.
+
+    The id of an event is the snapshot ID of the new document version, so every worker
+    process publishing the same change sends the same id and a client can reconnect to
+    any of them with 'Last-Event-ID'.
+
+    Parameters
+    ----------
+    keepalive_seconds : float
+        The interval of keepalive comments, so proxies keep idle connections open.
+    poll : Optional[Callable[[], Awaitable[None]]]
+        Checks for changes made by other worker processes, it is awaited periodically
+        while there are subscribers.
+    poll_seconds : float
+        The interval of 'poll'.
+    """
+
+    def __init__(
+        self,
+        keepalive_seconds: float = 15,
+        poll: Optional[Callable[[], Awaitable[None]]] = None,
+        poll_seconds: float = 1,
+    ) -> None:
+        self.keepalive_seconds = keepalive_seconds
+        self.poll = poll
+        self.poll_seconds = poll_seconds
+        self.subscribers = 0
+        self._events: Deque[Tuple[int, str, bytes]] = deque(maxlen=EVENT_HISTORY)
+        self._sequence = 0
+        self._woken = asyncio.Event()
+        self._heartbeat: Optional[asyncio.TimerHandle] = None
+        self._poller: Optional[asyncio.TimerHandle] = None
+        self._polling: Optional["asyncio.Task[None]"] = None
+
+    def publish(self, event: DocumentChangeEvent) -> str:
+        """
+        Send an event to all subscribers.
+
+        Parameters
+        ----------
+        event : DocumentChangeEvent
+            The event.
+
+        Returns
+        -------
+        str
+            The id of the event, its snapshot ID.
+        """
+        self._sequence += 1
+        frame = (
+            f"id: {event.snapshot_id}\nevent: change\ndata: ".encode("utf-8")
+            + event.model_dump_json(exclude_defaults=True).encode("utf-8")
+            + b"\n\n"
+        )
+        self._events.append((self._sequence, event.snapshot_id, frame))
+        self._wake()
+        return event.snapshot_id
+
+    def _wake(self) -> None:
+        woken, self._woken = self._woken, asyncio.Event()
+        woken.set()
+
+    def _beat(self) -> None:
+        self._heartbeat = None
+        if self.subscribers:
+            self._wake()
+            self._schedule_heartbeat()
+
+    def _schedule_heartbeat(self) -> None:
+        if self._heartbeat is None:
+            self._heartbeat = asyncio.get_running_loop().call_later(
+                self.keepalive_seconds, self._beat
+            )
+
+    def _start_poll(self) -> None:
+        self._poller = None
+        if self.subscribers and self.poll is not None:
+            self._polling = asyncio.ensure_future(self._run_poll())
+
+    async def _run_poll(self) -> None:
+        try:
+            await self.poll()
+        except Exception:
+            logger.exception("Polling for changes of other workers failed.")
+        self._schedule_poll()
+
+    def _schedule_poll(self) -> None:
+        if self._poller is None and self.poll is not None and self.subscribers:
+            self._poller = asyncio.get_running_loop().call_later(
+                self.poll_seconds, self._start_poll
+            )
+
+    def _sequence_of(self, event_id: str) -> Optional[int]:
+        for sequence, known_id, _ in reversed(self._events):
+            if known_id == event_id:
+                return sequence
+        return None
+
+    async def subscribe(
+        self, last_event_id: Optional[str] = None
+    ) -> AsyncIterator[bytes]:
+        """
+        Stream the frames of the events published after subscribing.
+
+        Parameters
+        ----------
+        last_event_id : Optional[str]
+            The 'Last-Event-ID' header of a reconnecting client. The events it missed are
+            sent first, or a 'resync' event if its last event is no longer in the history.
+
+        Yields
+        ------
+        bytes
+            Server-Sent Events frames.
+        """
+        last_seen = self._sequence
+        if last_event_id is not None:
+            sequence = self._sequence_of(last_event_id)
+            if sequence is None:
+                # the history was rotated or the process restarted, or the event was
+                # published by a worker process that is ahead of this one
+                latest_id = f"id: {self._events[-1][1]}\n" if self._events else ""
+                yield f"{latest_id}event: resync\ndata: {{}}\n\n".encode("utf-8")
+            else:
+                last_seen = sequence
+        self.subscribers += 1
+        self._schedule_heartbeat()
+        self._schedule_poll()
+        try:
+            yield b"retry: 5000\n\n"
+            while True:
+                woken = self._woken
+                if last_seen < self._sequence:
+                    pending = [
+                        frame
+                        for sequence, _, frame in self._events
+                        if sequence > last_seen
+                    ]
+                    last_seen = self._sequence
+                    for frame in pending:
+                        yield frame
+                    continue
+                await woken.wait()
+                if last_seen == self._sequence:
+                    yield b": keepalive\n\n"
+        finally:
+            self.subscribers -= 1
@@ -0,0 +1,337 @@
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional, Protocol, Tuple
+from urllib.parse import quote
+
+import httpx
+from starlette.concurrency import run_in_threadpool
+
+from .cache import FetchCache
+from .config import GithubSettings
+from .metrics import GITHUB_RATE_LIMIT_REMAINING, GITHUB_RESPONSES, STAGE_SECONDS
+
+
+STREAM_CHUNK_SIZE = 64 * 1024
+
+
+class StreamParser(Protocol):
+    """
+    A parser that is fed the response body chunk by chunk.
+    """
+
+    def feed(self, chunk: bytes) -> None:
+        ...
+
+    def close(self) -> Any:
+        ...
+
+
+class GithubError(Exception):
+    """
+    Raised when Github answers with a non successful status code.
+    """
+
+    def __init__(self, status_code: int, message: str) -> None:
+        super().__init__(message)
+        self.status_code = status_code
+        self.message = message
+
+
+def _contents_url(github_settings: GithubSettings, path: str) -> str:
+    branch_suffix = (
+        # branch names are sent by callers of /diff and may contain '&' or '#'
+        "?ref=" + quote(github_settings.branch_name, safe="")
+        if github_settings.branch_name
+        else ""
+    )
+    return f"{github_settings.base_url}/{github_settings.organization_name}/{github_settings.repository_name}/contents/{path}{branch_suffix}"
+
+
+def global_parameters_path(github_settings: GithubSettings) -> str:
+    """
+    Build the repository path of the global parameters file.
+
+    Parameters
+    ----------
+    github_settings : GithubSettings
+        The configuration object for this app.
+
+    Returns
+    -------
+    str
+        The path of 'YOUR_DATA_FACTORY_GlobalParameters.json'.
+    """
+    return f"{github_settings.factory_name}/globalParameters/{github_settings.factory_name}_GlobalParameters.json"
+
+
+def arm_template_path(github_settings: GithubSettings) -> str:
+    """
+    Build the repository path of the ARM template of the factory.
+
+    Parameters
+    ----------
+    github_settings : GithubSettings
+        The configuration object for this app.
+
+    Returns
+    -------
+    str
+        The path of 'ARMTemplateForFactory.json'.
+    """
+    return f"{github_settings.factory_name}/ARMTemplateForFactory.json"
+
+
+def global_parameters_url(github_settings: GithubSettings) -> str:
+    """
+    Build the contents API url of the global parameters file.
+
+    Parameters
+    ----------
+    github_settings : GithubSettings
+        The configuration object for this app.
+
+    Returns
+    -------
+    str
+        The url of 'YOUR_DATA_FACTORY_GlobalParameters.json'.
+    """
+    return _contents_url(github_settings, global_parameters_path(github_settings))
+
+
+def arm_template_url(github_settings: GithubSettings) -> str:
+    """
+    Build the contents API url of the ARM template of the factory.
+
+    Parameters
+    ----------
+    github_settings : GithubSettings
+        The configuration object for this app.
+
+    Returns
+    -------
+    str
+        The url of 'ARMTemplateForFactory.json'.
+    """
+    return _contents_url(github_settings, arm_template_path(github_settings))
+
+
+def github_headers(github_settings: GithubSettings, accept: str) -> Dict[str, str]:
+    """
+    Build the headers for a Github contents API request.
+
+    Parameters
+    ----------
+    github_settings : GithubSettings
+        The configuration object for this app.
+    accept : str
+        The requested media type.
+
+    Returns
+    -------
+    Dict[str, str]
+        The request headers.
+    """
+    return {
+        "Authorization": f"Token {github_settings.github_adf_token}",
+        "Accept": accept,
+        "X-GitHub-Api-Version": "2022-11-28",
+    }
+
+
+def _record_response(res: httpx.Response) -> None:
+    GITHUB_RESPONSES.inc(status=str(res.status_code))
+    remaining = res.headers.get("X-RateLimit-Remaining")
+    if remaining is not None and remaining.isdigit():
+        GITHUB_RATE_LIMIT_REMAINING.set(int(remaining))
+
+
+_RequestKey = Tuple[str, Optional[str], Hashable]
+
+
+def _request_key(
+    request_url: str, headers: Dict[str, str], parser_key: Hashable
+) -> _RequestKey:
+    # the same url answers differently per Accept header and is parsed differently per parser
+    return request_url, headers.get("Accept"), parser_key
+
+
+class GithubClient:
+    """
+    A pooled async client for the Github contents API.
+
+    Connections are kept alive across requests. Requests are keyed by their url, Accept
+    header and parser: responses are cached by ETag per key and concurrent fetches of the
+    same key are coalesced into a single Github round-trip.
+    """
+
+    def __init__(self, client: httpx.AsyncClient, fetch_cache: FetchCache) -> None:
+        self.client = client
+        self.fetch_cache = fetch_cache
+        self._in_flight: Dict[_RequestKey, "asyncio.Future[Any]"] = {}
+
+    async def fetch(
+        self,
+        request_url: str,
+        headers: Dict[str, str],
+        parse: Callable[[httpx.Response], Any],
+        parser_key: Optional[Hashable] = None,
+    ) -> Any:
+        """
+        Fetch and parse a file, sharing the result with concurrent callers of the same request.
+
+        Parameters
+        ----------
+        request_url : str
+            The url of the Github contents API.
+        headers : Dict[str, str]
+            The request headers.
+        parse : Callable[[httpx.Response], Any]
+            Turns a successful response into the parsed result. It runs in the threadpool.
+        parser_key : Optional[Hashable]
+            Identifies the parser in the cache and among concurrent fetches, defaults to
+            `parse` itself. Callers that build a new `parse` per call pass a stable key to
+            be cached and coalesced.
+
+        Returns
+        -------
+        Any
+            The parsed result.
+
+        Raises
+        ------
+        GithubError
+            If Github answers with a non successful status code.
+        """
+        request_key = _request_key(
+            request_url, headers, parse if parser_key is None else parser_key
+        )
+        return await self._single_flight(
+            request_key,
+            lambda: self._fetch_with_cache(request_key, headers, parse),
+        )
+
+    async def fetch_streamed(
+        self,
+        request_url: str,
+        headers: Dict[str, str],
+        stream_parser: Callable[[], StreamParser],
+        parser_key: Optional[Hashable] = None,
+    ) -> Any:
+        """
+        Fetch a file and feed its body to a stream parser without buffering the whole body.
+
+        Parameters
+        ----------
+        request_url : str
+            The url of the Github contents API.
+        headers : Dict[str, str]
+            The request headers.
+        stream_parser : Callable[[], StreamParser]
+            Creates the parser the body is fed to. Feeding runs in the threadpool.
+        parser_key : Optional[Hashable]
+            Identifies the parser in the cache and among concurrent fetches, defaults to
+            `stream_parser` itself.
+
+        Returns
+        -------
+        Any
+            The result of closing the stream parser.
+
+        Raises
+        ------
+        GithubError
+            If Github answers with a non successful status code.
+        """
+        request_key = _request_key(
+            request_url,
+            headers,
+            stream_parser if parser_key is None else parser_key,
+        )
+        return await self._single_flight(
+            request_key,
+            lambda: self._fetch_streamed_with_cache(
+                request_key, headers, stream_parser
+            ),
+        )
+
+    async def _single_flight(
+        self,
+        request_key: _RequestKey,
+        fetch: Callable[[], Awaitable[Any]],
+    ) -> Any:
+        in_flight = self._in_flight.get(request_key)
+        if in_flight is None:
+            in_flight = asyncio.ensure_future(fetch())
+            self._in_flight[request_key] = in_flight
+            in_flight.add_done_callback(
+                lambda done: self._forget_in_flight(request_key, done)
+            )
+        # shield the shared fetch, so a cancelled caller does not cancel it for the others
+        return await asyncio.shield(in_flight)
+
+    def _forget_in_flight(
+        self,
+        request_key: _RequestKey,
+        done: "asyncio.Future[Any]",
+    ) -> None:
+        if self._in_flight.get(request_key) is done:
+            del self._in_flight[request_key]
+
+    async def _fetch_with_cache(
+        self,
+        request_key: _RequestKey,
+        headers: Dict[str, str],
+        parse: Callable[[httpx.Response], Any],
+    ) -> Any:
+        request_url = request_key[0]
+        cached = self.fetch_cache.get(request_key)
+        if cached is not None:
+            headers = {**headers, "If-None-Match": cached.etag}
+        with STAGE_SECONDS.time(stage="github_fetch"):
+            res = await self.client.get(request_url, headers=headers)
+        _record_response(res)
+
+        if res.status_code == httpx.codes.NOT_MODIFIED and cached is not None:
+            self.fetch_cache.touch(request_key)
+            return cached.value
+        if res.is_success:
+            value = await run_in_threadpool(parse, res)
+            etag = res.headers.get("ETag")
+            if etag:
+                self.fetch_cache.put(request_key, etag, res.content, value)
+            return value
+        raise GithubError(res.status_code, res.text)
+
+    async def _fetch_streamed_with_cache(
+        self,
+        request_key: _RequestKey,
+        headers: Dict[str, str],
+        stream_parser: Callable[[], StreamParser],
+    ) -> Any:
+        request_url = request_key[0]
+        cached = self.fetch_cache.get(request_key)
+        if cached is not None:
+            headers = {**headers, "If-None-Match": cached.etag}
+        request = self.client.build_request("GET", request_url, headers=headers)
+        with STAGE_SECONDS.time(stage="github_fetch"):
+            res = await self.client.send(request, stream=True)
+        try:
+            _record_response(res)
+            if res.status_code == httpx.codes.NOT_MODIFIED and cached is not None:
+                self.fetch_cache.touch(request_key)
+                return cached.value
+            if not res.is_success:
+                await res.aread()
+                raise GithubError(res.status_code, res.text)
+
+            parser = stream_parser()
+            async for chunk in res.aiter_bytes(STREAM_CHUNK_SIZE):
+                await run_in_threadpool(parser.feed, chunk)
+            value = await run_in_threadpool(parser.close)
+        finally:
+            await res.aclose()
+
+        etag = res.headers.get("ETag")
+        if etag:
+            # the body is not kept, the point of streaming is to never hold all of it
+            self.fetch_cache.put(request_key, etag, None, value)
+        return value
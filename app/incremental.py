@@ -0,0 +1,267 @@
+import hashlib
+import threading
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Tuple
+
+from .metrics import (
+    STAGE_SECONDS,
+    UDF_PARSE_CACHE_HITS,
+    UDF_PARSE_CACHE_MISSES,
+    Accumulator,
+)
+from .models import UserDefinedFunction, UserDefinedFunctionLibrary
+from .parallel import ParallelUDFParser
+from .parse import (
+    UDFLibraryStreamParser,
+    _parse_function_tokens,
+    _resource_name,
+    _script_lines,
+    _tokenize_script_lines,
+    parse_udf_functions_with_comments,
+)
+
+
+def _content_hash(*parts: str) -> str:
+    digest = hashlib.blake2b(digest_size=16)
+    for part in parts:
+        digest.update(part.encode("utf-8"))
+        # separate the parts, so ("ab", "c") and ("a", "bc") do not collide
+        digest.update(b"\0")
+    return digest.hexdigest()
+
+
+@dataclass
+class _ParsedLibrary:
+    library: UserDefinedFunctionLibrary
+    function_hashes: List[str]
+
+
+@dataclass
+class _StageTimers:
+    split: Accumulator
+    function_content: Accumulator
+    model_construction: Accumulator
+
+    @classmethod
+    def create(cls) -> "_StageTimers":
+        return cls(
+            split=STAGE_SECONDS.accumulate(stage="udf_split"),
+            function_content=STAGE_SECONDS.accumulate(stage="udf_function_content"),
+            model_construction=STAGE_SECONDS.accumulate(stage="model_construction"),
+        )
+
+    def observe(self) -> None:
+        self.split.observe()
+        self.function_content.observe()
+        self.model_construction.observe()
+
+
+@dataclass
+class ParseStats:
+    library_hits: int = 0
+    library_misses: int = 0
+    function_hits: int = 0
+    function_misses: int = 0
+
+    def add(self, other: "ParseStats") -> None:
+        self.library_hits += other.library_hits
+        self.library_misses += other.library_misses
+        self.function_hits += other.function_hits
+        self.function_misses += other.function_misses
+
+    def record(self) -> None:
+        UDF_PARSE_CACHE_HITS.inc(self.library_hits, level="library")
+        UDF_PARSE_CACHE_MISSES.inc(self.library_misses, level="library")
+        UDF_PARSE_CACHE_HITS.inc(self.function_hits, level="function")
+        UDF_PARSE_CACHE_MISSES.inc(self.function_misses, level="function")
+
+
+class IncrementalUDFParser:
+    """
+    Parses UDF libraries and reuses the results of unchanged libraries and functions.
+
+    Every library is keyed by a hash of its name, description and script lines and every
+    function by a hash of its isolated function string. Only libraries and functions with
+    a new hash are parsed. Entries that are not part of the latest parse are dropped, so
+    the memory held by the parser is bounded by the size of one template.
+
+    With a parallel parser, the cold parse of a large template, when no previous results
+    exist, is spread across its worker processes.
+
+    Parameters
+    ----------
+    parallel_parser : Optional[ParallelUDFParser]
+        The process pool used for cold parses.
+    """
+
+    def __init__(self, parallel_parser: Optional[ParallelUDFParser] = None) -> None:
+        self.parallel_parser = parallel_parser
+        self.stats = ParseStats()
+        self._libraries: Dict[str, _ParsedLibrary] = {}
+        self._functions: Dict[str, UserDefinedFunction] = {}
+        self._lock = threading.Lock()
+
+    def parse(self, file_content: Dict[str, Any]) -> List[UserDefinedFunctionLibrary]:
+        """
+        Parses UDF functions with comments from an ARM template.
+
+        Parameters
+        ----------
+        file_content : Dict[str, Any]
+            ARM template content.
+
+        Returns
+        -------
+        List[UserDefinedFunctionLibrary]
+        """
+        return parse_udf_functions_with_comments(file_content, self.parse_libraries)
+
+    def stream_parser(self) -> UDFLibraryStreamParser:
+        """
+        Create a stream parser that parses the collected libraries incrementally.
+
+        Returns
+        -------
+        UDFLibraryStreamParser
+        """
+        return UDFLibraryStreamParser(parse_libraries=self.parse_libraries)
+
+    def parse_libraries(
+        self, udf_library: List[Dict[str, Any]]
+    ) -> List[UserDefinedFunctionLibrary]:
+        """
+        Parses the functions of UDFLibrary resources.
+
+        Parameters
+        ----------
+        udf_library : List[Dict[str, Any]]
+            The UDFLibrary resources of an ARM template.
+
+        Returns
+        -------
+        List[UserDefinedFunctionLibrary]
+        """
+        with self._lock:
+            if (
+                not self._libraries
+                and self.parallel_parser is not None
+                and self.parallel_parser.should_parallelize(udf_library)
+            ):
+                udf_libraries, stats = self._parse_cold_in_parallel(
+                    udf_library, self.parallel_parser
+                )
+            else:
+                udf_libraries, stats = self._parse_serially(udf_library)
+            self.stats.add(stats)
+        # recorded here and not per chunk, the counters of a worker process are lost
+        stats.record()
+        return udf_libraries
+
+    def _parse_serially(
+        self, udf_library: List[Dict[str, Any]]
+    ) -> Tuple[List[UserDefinedFunctionLibrary], ParseStats]:
+        libraries: Dict[str, _ParsedLibrary] = {}
+        functions: Dict[str, UserDefinedFunction] = {}
+        stats = ParseStats()
+        timers = _StageTimers.create()
+        udf_libraries = [
+            self._parse_library(lib, libraries, functions, stats, timers)
+            for lib in udf_library
+        ]
+        self._libraries = libraries
+        self._functions = functions
+        timers.observe()
+        return udf_libraries, stats
+
+    def _parse_cold_in_parallel(
+        self, udf_library: List[Dict[str, Any]], parallel_parser: ParallelUDFParser
+    ) -> Tuple[List[UserDefinedFunctionLibrary], ParseStats]:
+        udf_libraries: List[UserDefinedFunctionLibrary] = []
+        libraries: Dict[str, _ParsedLibrary] = {}
+        functions: Dict[str, UserDefinedFunction] = {}
+        stats = ParseStats()
+        for (
+            chunk_libraries,
+            chunk_parsed_libraries,
+            chunk_functions,
+            chunk_stats,
+        ) in parallel_parser.map_chunks(_parse_cold_chunk, udf_library):
+            udf_libraries.extend(chunk_libraries)
+            libraries.update(chunk_parsed_libraries)
+            functions.update(chunk_functions)
+            stats.add(chunk_stats)
+        self._libraries = libraries
+        self._functions = functions
+        return udf_libraries, stats
+
+    def _parse_library(
+        self,
+        lib: Dict[str, Any],
+        libraries: Dict[str, _ParsedLibrary],
+        functions: Dict[str, UserDefinedFunction],
+        stats: ParseStats,
+        timers: _StageTimers,
+    ) -> UserDefinedFunctionLibrary:
+        name = _resource_name(lib)
+        description = lib.get("description", "")
+        script_lines = _script_lines(lib)
+        library_hash = _content_hash(name, description, *script_lines)
+
+        parsed = self._libraries.get(library_hash)
+        if parsed is not None:
+            stats.library_hits += 1
+            libraries[library_hash] = parsed
+            # keep the functions of the library for the next partial change
+            for function_hash, function in zip(
+                parsed.function_hashes, parsed.library.functions
+            ):
+                functions[function_hash] = function
+            return parsed.library
+
+        stats.library_misses += 1
+        function_hashes = []
+        library_functions = []
+        with timers.split:
+            library_tokens = _tokenize_script_lines(script_lines)
+        for function_tokens in library_tokens:
+            function_hash = _content_hash(*function_tokens.parts)
+            function = self._functions.get(function_hash) or functions.get(
+                function_hash
+            )
+            if function is None:
+                stats.function_misses += 1
+                with timers.function_content:
+                    function_content = _parse_function_tokens(function_tokens)
+                with timers.model_construction:
+                    function = UserDefinedFunction.trusted(**function_content)
+            else:
+                stats.function_hits += 1
+            functions[function_hash] = function
+            function_hashes.append(function_hash)
+            library_functions.append(function)
+
+        with timers.model_construction:
+            library = UserDefinedFunctionLibrary(
+                name=name, description=description, functions=library_functions
+            )
+        libraries[library_hash] = _ParsedLibrary(library, function_hashes)
+        return library
+
+
+def _parse_cold_chunk(
+    udf_library: List[Dict[str, Any]]
+) -> Tuple[
+    List[UserDefinedFunctionLibrary],
+    Dict[str, _ParsedLibrary],
+    Dict[str, UserDefinedFunction],
+    ParseStats,
+]:
+    """
+    Parse a chunk of libraries without previous results in a worker process.
+
+    The results are returned with the hashes they are kept under, so the next parse in the
+    main process can reuse them.
+    """
+    parser = IncrementalUDFParser()
+    udf_libraries, stats = parser._parse_serially(udf_library)
+    return udf_libraries, parser._libraries, parser._functions, stats
@@ -1,17 +1,81 @@
+import asyncio
+import hashlib
+import json
+from contextlib import asynccontextmanager
 from functools import lru_cache
-from typing import List
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Literal, Optional, Tuple, Union
 
-import requests
-from fastapi import Depends, FastAPI, status
-from fastapi.responses import JSONResponse
+import httpx
+from fastapi import (
+    BackgroundTasks,
+    Depends,
+    FastAPI,
+    Query,
+    Request,
+    Response,
+    status,
+)
+from fastapi.responses import JSONResponse, StreamingResponse
+from pydantic import TypeAdapter
+from starlette.concurrency import run_in_threadpool
 from typing_extensions import Annotated
 
 
+from .cache import FetchCache
 from .config import GithubSettings
-from .models import GlobalParameters, UserDefinedFunctionLibrary
-from .parse import parse_global_parameters, parse_udf_functions_with_comments
+from .diff import diff_documents
+from .documents import (
+    GLOBAL_PARAMETERS,
+    USER_DEFINED_FUNCTIONS,
+    DocumentService,
+    Snapshot,
+    UnknownFactoryError,
+    gather_snapshots,
+)
+from .github import GithubClient, GithubError
+from .incremental import IncrementalUDFParser
+from .metrics import REGISTRY
+from .mirror import GitMirror, git_mirror_path, git_remote_url
+from .models import (
+    DocumentBundle,
+    DocumentDiff,
+    FactoryError,
+    FailedFactory,
+    GlobalParameter,
+    GlobalParameters,
+    SnapshotVersion,
+    UserDefinedFunction,
+    UserDefinedFunctionLibrary,
+    UserDefinedFunctionSearchResult,
+)
+from .parallel import ParallelUDFParser
+from .responses import (
+    cached_response,
+    choose_encoding,
+    encoded_response,
+    entity_tag,
+    is_not_modified,
+    join_json_object,
+    not_modified_response,
+    serialized_response,
+    validator_headers,
+)
+from .shared import SharedSnapshotCache
+from .store import SnapshotStore
+from .webhook import changed_documents, parse_push_payload, verify_signature
 
-app = FastAPI()
+SNAPSHOT_AGE_HEADER = "X-Snapshot-Age"
+
+_SEARCH_RESULTS_ADAPTER = TypeAdapter(List[UserDefinedFunctionSearchResult])
+_DIFF_ADAPTER = TypeAdapter(DocumentDiff)
+_GLOBAL_PARAMETER_ADAPTER = TypeAdapter(GlobalParameter)
+_LIBRARY_ADAPTER = TypeAdapter(UserDefinedFunctionLibrary)
+_FUNCTION_ADAPTER = TypeAdapter(UserDefinedFunction)
+
+UserDefinedFunctionField = Literal[
+    "declaration", "definition", "documentation", "params", "examples"
+]
 
 
 @lru_cache
@@ -27,90 +91,978 @@ def get_settings():
     return GithubSettings()
 
 
+@lru_cache
+def get_fetch_cache():
+    """
+    Create a singleton cache for conditional Github requests.
+
+    Returns
+    -------
+    FetchCache
+        The cache shared by all endpoints.
+    """
+    github_settings = get_settings()
+    return FetchCache(
+        ttl_seconds=github_settings.cache_ttl_seconds,
+        max_entries=github_settings.cache_max_entries,
+    )
+
+
+def _create_document_services(
+    github_settings: GithubSettings,
+    github_client: GithubClient,
+    parallel_parser: Optional[ParallelUDFParser] = None,
+    snapshot_store: Optional[SnapshotStore] = None,
+    shared_cache: Optional[SharedSnapshotCache] = None,
+) -> Dict[str, DocumentService]:
+    # factories in the same repository share a mirror
+    git_mirrors: Dict[str, GitMirror] = {}
+    document_services = {}
+    for factory_name, factory_settings in github_settings.factory_settings().items():
+        git_mirror = None
+        if github_settings.source == "git_mirror":
+            path = git_mirror_path(factory_settings)
+            if path not in git_mirrors:
+                git_mirrors[path] = GitMirror(
+                    git_remote_url(factory_settings),
+                    path,
+                    github_settings.github_adf_token,
+                )
+            git_mirror = git_mirrors[path]
+        document_services[factory_name] = DocumentService(
+            factory_settings,
+            github_client,
+            (
+                IncrementalUDFParser(parallel_parser)
+                if github_settings.incremental_parse
+                else None
+            ),
+            git_mirror,
+            parallel_parser,
+            snapshot_store,
+            shared_cache,
+        )
+    return document_services
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """
+    Open a pooled Github client and, if configured, a pool of parser processes for the
+    lifetime of the app.
+
+    Recording metrics is switched on here if they are enabled in the settings. With a
+    snapshot store, the latest stored snapshots are restored before the first request.
+    With a shared snapshot directory, the worker processes share their snapshots.
+
+    If Github push webhooks or a refresh interval are configured, the documents are loaded
+    in the background on startup, so the first reads are already answered from a warm
+    snapshot, and then reloaded on the refresh interval.
+
+    Parameters
+    ----------
+    app : FastAPI
+        The application.
+    """
+    github_settings = get_settings()
+    REGISTRY.enabled = github_settings.metrics_enabled
+    limits = httpx.Limits(
+        max_connections=github_settings.github_max_connections,
+        max_keepalive_connections=github_settings.github_max_connections,
+    )
+    async with httpx.AsyncClient(limits=limits, timeout=30) as client:
+        github_client = GithubClient(client, get_fetch_cache())
+        parallel_parser = None
+        if github_settings.parse_workers > 1:
+            parallel_parser = ParallelUDFParser(
+                github_settings.parse_workers,
+                github_settings.parallel_parse_min_script_lines,
+            )
+        snapshot_store = None
+        if github_settings.snapshot_store_path:
+            snapshot_store = SnapshotStore(github_settings.snapshot_store_path)
+        shared_cache = None
+        if github_settings.shared_snapshot_directory:
+            shared_cache = SharedSnapshotCache(
+                github_settings.shared_snapshot_directory
+            )
+        document_services = _create_document_services(
+            github_settings,
+            github_client,
+            parallel_parser,
+            snapshot_store,
+            shared_cache,
+        )
+        for document_service in document_services.values():
+            await run_in_threadpool(document_service.restore)
+        app.state.github_client = github_client
+        app.state.document_services = document_services
+        refreshers = []
+        if (
+            github_settings.github_webhook_secret
+            or github_settings.refresh_interval_seconds
+        ):
+            refreshers = [
+                asyncio.create_task(
+                    document_service.run_refresher(
+                        github_settings.refresh_interval_seconds
+                    )
+                )
+                for document_service in document_services.values()
+            ]
+        yield
+        for refresher in refreshers:
+            refresher.cancel()
+        if parallel_parser is not None:
+            parallel_parser.close()
+        if snapshot_store is not None:
+            snapshot_store.close()
+
+
+app = FastAPI(lifespan=lifespan)
+
+
+def _not_found(message: str) -> JSONResponse:
+    return JSONResponse(
+        status_code=status.HTTP_404_NOT_FOUND, content={"message": message}
+    )
+
+
+@app.exception_handler(UnknownFactoryError)
+async def unknown_factory_handler(request: Request, exc: UnknownFactoryError):
+    return _not_found(f"Unknown factory '{exc.factory_name}'.")
+
+
+def get_github_client(request: Request) -> GithubClient:
+    """
+    Return the Github client owned by the app lifespan.
+
+    Parameters
+    ----------
+    request : Request
+        The incoming request.
+
+    Returns
+    -------
+    GithubClient
+        The shared Github client.
+    """
+    return request.app.state.github_client
+
+
+def get_document_services(request: Request) -> Dict[str, DocumentService]:
+    """
+    Return the document services of all factories owned by the app lifespan.
+
+    Parameters
+    ----------
+    request : Request
+        The incoming request.
+
+    Returns
+    -------
+    Dict[str, DocumentService]
+        The document services by factory name.
+    """
+    return request.app.state.document_services
+
+
+def get_document_service(
+    document_services: Annotated[
+        Dict[str, DocumentService], Depends(get_document_services)
+    ],
+    factory: Optional[str] = None,
+) -> DocumentService:
+    """
+    Return the document service of the requested factory.
+
+    Parameters
+    ----------
+    document_services : Annotated[Dict[str, DocumentService], Depends]
+        The document services by factory name.
+    factory : Optional[str]
+        The name of the factory, defaults to the first configured factory.
+
+    Returns
+    -------
+    DocumentService
+        The document service of the factory.
+
+    Raises
+    ------
+    UnknownFactoryError
+        If no factory with the name is configured.
+    """
+    if factory is None:
+        return next(iter(document_services.values()))
+    if factory not in document_services:
+        raise UnknownFactoryError(factory)
+    return document_services[factory]
+
+
+def _snapshot_response(
+    request: Request, document_service: DocumentService, snapshot: Snapshot
+) -> Response:
+    return cached_response(
+        snapshot.body,
+        request.headers,
+        snapshot.source_sha,
+        snapshot.modified_at,
+        document_service.github_settings.http_cache_control,
+        {SNAPSHOT_AGE_HEADER: str(int(snapshot.age))},
+    )
+
+
+def _lookup_response(
+    request: Request,
+    document_service: DocumentService,
+    snapshot: Snapshot,
+    value: Any,
+    adapter: TypeAdapter,
+) -> Response:
+    # a part of a snapshot changes with the snapshot, its url tells the parts apart
+    etag = entity_tag(snapshot.source_sha)
+    headers = {
+        SNAPSHOT_AGE_HEADER: str(int(snapshot.age)),
+        **validator_headers(
+            etag,
+            snapshot.modified_at,
+            document_service.github_settings.http_cache_control,
+        ),
+    }
+    if is_not_modified(request.headers, etag, snapshot.modified_at):
+        return not_modified_response(headers)
+    return serialized_response(value, adapter, headers)
+
+
+def _joined_validators(
+    snapshots: Dict[str, Snapshot], coding: str, cache_control: str
+) -> Tuple[str, float, Dict[str, str]]:
+    entity_id = hashlib.sha256(
+        json.dumps(
+            {name: snapshot.source_sha for name, snapshot in snapshots.items()}
+        ).encode("utf-8")
+    ).hexdigest()
+    etag = entity_tag(entity_id, coding)
+    last_modified = max(snapshot.modified_at for snapshot in snapshots.values())
+    headers = {
+        SNAPSHOT_AGE_HEADER: str(
+            int(max(snapshot.age for snapshot in snapshots.values()))
+        ),
+        **validator_headers(etag, last_modified, cache_control),
+    }
+    return etag, last_modified, headers
+
+
+def _joined_response(
+    request: Request, github_settings: GithubSettings, snapshots: Dict[str, Snapshot]
+) -> Response:
+    etag, last_modified, headers = _joined_validators(
+        snapshots, "identity", github_settings.http_cache_control
+    )
+    if is_not_modified(request.headers, etag, last_modified):
+        return not_modified_response(headers)
+    return Response(
+        content=join_json_object(
+            {name: snapshot.body.identity for name, snapshot in snapshots.items()}
+        ),
+        media_type="application/json",
+        headers=headers,
+    )
+
+
+def _factories_response(
+    request: Request,
+    github_settings: GithubSettings,
+    results: Dict[str, Union[Snapshot, Exception]],
+) -> Response:
+    snapshots = {
+        name: result for name, result in results.items() if isinstance(result, Snapshot)
+    }
+    if len(snapshots) == len(results):
+        return _joined_response(request, github_settings, snapshots)
+    if not snapshots:
+        # nothing to show, answered like the failure of a single factory
+        raise next(iter(results.values()))
+    bodies = {}
+    for name, result in results.items():
+        if isinstance(result, Snapshot):
+            bodies[name] = result.body.identity
+        else:
+            if isinstance(result, GithubError):
+                error = FactoryError(
+                    status_code=result.status_code, message=result.message
+                )
+            else:
+                error = FactoryError(
+                    status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                    message=str(result),
+                )
+            bodies[name] = FailedFactory(error=error).model_dump_json().encode("utf-8")
+    # a partial result is not cached, the failed factories are retried with the next read
+    return Response(
+        content=join_json_object(bodies),
+        media_type="application/json",
+        headers={"Cache-Control": "no-store"},
+    )
+
+
 @app.get("/docs/datafactory/global-parameters")
-def read_global_parameters(
-    github_settings: Annotated[GithubSettings, Depends(get_settings)]
+async def read_global_parameters(
+    request: Request,
+    document_service: Annotated[DocumentService, Depends(get_document_service)],
 ) -> GlobalParameters:
     """
     Read the global parameters from the Data Factory repository on Github and return it as json.
 
+    The body is served as serialized and compressed once per snapshot, in the encoding
+    negotiated with the 'Accept-Encoding' header. The ETag is derived from the source
+    file, a request with a matching 'If-None-Match' is answered with '304 Not Modified'
+    from the snapshot.
+
     Parameters
     ----------
-    github_settings : Annotated[GithubSettings, Depends]
-        The configuration object for this app.
+    request : Request
+        The incoming request.
+    document_service : Annotated[DocumentService, Depends]
+        The service loading the documents of the factory requested with the 'factory'
+        query parameter from Github.
 
     Returns
     -------
     GlobalParameters
         The global parameters stored in the Azure Data Factory.
     """
-    headers = {
-        "Authorization": f"Token {github_settings.github_adf_token}",
-        "Accept": "application/vnd.github.json",
-        "X-GitHub-Api-Version": "2022-11-28",
-    }
     try:
-        branch_suffix = (
-            "?ref=" + github_settings.branch_name if github_settings.branch_name else ""
+        snapshot = await document_service.get(GLOBAL_PARAMETERS)
+        return _snapshot_response(request, document_service, snapshot)
+    except GithubError as e:
+        return JSONResponse(status_code=e.status_code, content={"message": e.message})
+    except httpx.HTTPError as e:
+        return JSONResponse(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            content={"message": str(e)},
         )
-        request_url = f"{github_settings.base_url}/{github_settings.organization_name}/{github_settings.repository_name}/contents/{github_settings.factory_name}/globalParameters/{github_settings.factory_name}_GlobalParameters.json{branch_suffix}"
-        res = requests.get(request_url, headers=headers, timeout=30)
 
-        if res.ok:
-            data = res.json()
-            global_parameters = parse_global_parameters(data["content"])
-            return global_parameters
-        else:
-            return JSONResponse(
-                status_code=res.status_code, content={"message": res.text}
-            )
 
-    except requests.HTTPError as e:
+@app.get("/docs/datafactory/global-parameters/{name}")
+async def read_global_parameter(
+    request: Request,
+    name: str,
+    document_service: Annotated[DocumentService, Depends(get_document_service)],
+) -> GlobalParameter:
+    """
+    Read a single global parameter by name.
+
+    Parameters
+    ----------
+    request : Request
+        The incoming request.
+    name : str
+        The name of the global parameter.
+    document_service : Annotated[DocumentService, Depends]
+        The service loading the documents of the factory requested with the 'factory'
+        query parameter from Github.
+
+    Returns
+    -------
+    GlobalParameter
+        The type and value of the global parameter.
+    """
+    try:
+        snapshot = await document_service.get(GLOBAL_PARAMETERS)
+        global_parameter = snapshot.value.root.get(name)
+        if global_parameter is None:
+            return _not_found(f"Unknown global parameter '{name}'.")
+        return _lookup_response(
+            request,
+            document_service,
+            snapshot,
+            global_parameter,
+            _GLOBAL_PARAMETER_ADAPTER,
+        )
+    except GithubError as e:
+        return JSONResponse(status_code=e.status_code, content={"message": e.message})
+    except httpx.HTTPError as e:
         return JSONResponse(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            content={"message": e.strerror},
+            content={"message": str(e)},
         )
 
 
 @app.get("/docs/datafactory/user-defined-functions")
-def read_user_defined_functions(
-    github_settings: Annotated[GithubSettings, Depends(get_settings)]
+async def read_user_defined_functions(
+    request: Request,
+    document_service: Annotated[DocumentService, Depends(get_document_service)],
 ) -> List[UserDefinedFunctionLibrary]:
     """
     Read the user defined functions from the Data Factory on Github and return it as json.
 
+    The body is served as serialized and compressed once per snapshot, in the encoding
+    negotiated with the 'Accept-Encoding' header. The ETag is derived from the source
+    file, a request with a matching 'If-None-Match' is answered with '304 Not Modified'
+    from the snapshot.
+
     Parameters
     ----------
-    github_settings : Annotated[GithubSettings, Depends]
-        The configuration object for this app.
+    request : Request
+        The incoming request.
+    document_service : Annotated[DocumentService, Depends]
+        The service loading the documents of the factory requested with the 'factory'
+        query parameter from Github.
 
     Returns
     -------
     List[UserDefinedFunctionLibrary]
         The list of user defined function libraries stored in the Azure Data Factory.
     """
-    headers = {
-        "Authorization": f"Token {github_settings.github_adf_token}",
-        "Accept": "application/vnd.github.raw",
-        "X-GitHub-Api-Version": "2022-11-28",
-    }
     try:
-        branch_suffix = (
-            "?ref=" + github_settings.branch_name if github_settings.branch_name else ""
+        snapshot = await document_service.get(USER_DEFINED_FUNCTIONS)
+        return _snapshot_response(request, document_service, snapshot)
+    except GithubError as e:
+        return JSONResponse(status_code=e.status_code, content={"message": e.message})
+    except httpx.HTTPError as e:
+        return JSONResponse(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            content={"message": str(e)},
         )
-        request_url = f"{github_settings.base_url}/{github_settings.organization_name}/{github_settings.repository_name}/contents/{github_settings.factory_name}/ARMTemplateForFactory.json{branch_suffix}"
-        res = requests.get(request_url, headers=headers, timeout=30)
 
-        if res.ok:
-            data = res.json()
-            udf_libraries = parse_udf_functions_with_comments(data)
-            return udf_libraries
-        else:
-            return JSONResponse(
-                status_code=res.status_code, content={"message": res.text}
-            )
-    except requests.HTTPError as e:
+
+@app.get("/docs/datafactory/user-defined-functions/search")
+async def search_user_defined_functions(
+    document_service: Annotated[DocumentService, Depends(get_document_service)],
+    q: str,
+    limit: Annotated[int, Query(ge=1, le=1000)] = 20,
+) -> List[UserDefinedFunctionSearchResult]:
+    """
+    Search the names, declarations and documentation of the user defined functions.
+
+    Parameters
+    ----------
+    document_service : Annotated[DocumentService, Depends]
+        The service loading the documents of the factory requested with the 'factory'
+        query parameter from Github.
+    q : str
+        The search query. The last word also matches as a prefix.
+    limit : int
+        The maximum number of results.
+
+    Returns
+    -------
+    List[UserDefinedFunctionSearchResult]
+        The best matching functions, best match first.
+    """
+    try:
+        snapshot = await document_service.get(USER_DEFINED_FUNCTIONS)
+        return serialized_response(
+            document_service.search_index.search(q, limit),
+            _SEARCH_RESULTS_ADAPTER,
+            {SNAPSHOT_AGE_HEADER: str(int(snapshot.age))},
+        )
+    except GithubError as e:
+        return JSONResponse(status_code=e.status_code, content={"message": e.message})
+    except httpx.HTTPError as e:
         return JSONResponse(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            content={"message": e.strerror},
+            content={"message": str(e)},
         )
+
+
+@app.get("/docs/datafactory/user-defined-functions/diff")
+async def diff_user_defined_functions(
+    document_service: Annotated[DocumentService, Depends(get_document_service)],
+    head: str,
+    base: Optional[str] = None,
+) -> DocumentDiff:
+    """
+    Compare the user defined functions and global parameters of two branches or commits.
+
+    Both documents of both sides are loaded concurrently. The configured branch is served
+    from its snapshots, other refs with a conditional request, so a diff costs at most
+    two revalidations per document.
+
+    Parameters
+    ----------
+    document_service : Annotated[DocumentService, Depends]
+        The service loading the documents of the factory requested with the 'factory'
+        query parameter from Github.
+    head : str
+        The branch or full commit SHA of the newer version.
+    base : Optional[str]
+        The branch or full commit SHA of the older version, defaults to the configured
+        branch.
+
+    Returns
+    -------
+    DocumentDiff
+        The added, removed and changed functions with the changed fields and the added,
+        removed and changed global parameters.
+    """
+    if base is None:
+        base = document_service.github_settings.branch_name
+    try:
+        (
+            base_parameters,
+            head_parameters,
+            base_libraries,
+            head_libraries,
+        ) = await asyncio.gather(
+            document_service.get_at(GLOBAL_PARAMETERS, base),
+            document_service.get_at(GLOBAL_PARAMETERS, head),
+            document_service.get_at(USER_DEFINED_FUNCTIONS, base),
+            document_service.get_at(USER_DEFINED_FUNCTIONS, head),
+        )
+        diff = await run_in_threadpool(
+            diff_documents,
+            base_parameters,
+            head_parameters,
+            base_libraries,
+            head_libraries,
+        )
+        return serialized_response(diff, _DIFF_ADAPTER)
+    except GithubError as e:
+        return JSONResponse(status_code=e.status_code, content={"message": e.message})
+    except httpx.HTTPError as e:
+        return JSONResponse(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            content={"message": str(e)},
+        )
+
+
+@app.get("/docs/datafactory/user-defined-functions/{library}")
+async def read_user_defined_function_library(
+    request: Request,
+    library: str,
+    document_service: Annotated[DocumentService, Depends(get_document_service)],
+) -> UserDefinedFunctionLibrary:
+    """
+    Read a single user defined function library by name.
+
+    Parameters
+    ----------
+    request : Request
+        The incoming request.
+    library : str
+        The name of the library.
+    document_service : Annotated[DocumentService, Depends]
+        The service loading the documents of the factory requested with the 'factory'
+        query parameter from Github.
+
+    Returns
+    -------
+    UserDefinedFunctionLibrary
+        The library with all its functions.
+    """
+    try:
+        snapshot = await document_service.get(USER_DEFINED_FUNCTIONS)
+        udf_library = snapshot.udf_index.libraries.get(library)
+        if udf_library is None:
+            return _not_found(f"Unknown library '{library}'.")
+        return _lookup_response(
+            request, document_service, snapshot, udf_library, _LIBRARY_ADAPTER
+        )
+    except GithubError as e:
+        return JSONResponse(status_code=e.status_code, content={"message": e.message})
+    except httpx.HTTPError as e:
+        return JSONResponse(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            content={"message": str(e)},
+        )
+
+
+@app.get("/docs/datafactory/user-defined-functions/{library}/{function}")
+async def read_user_defined_function(
+    request: Request,
+    library: str,
+    function: str,
+    document_service: Annotated[DocumentService, Depends(get_document_service)],
+) -> UserDefinedFunction:
+    """
+    Read a single user defined function by the names of its library and itself.
+
+    Parameters
+    ----------
+    request : Request
+        The incoming request.
+    library : str
+        The name of the library.
+    function : str
+        The name of the function.
+    document_service : Annotated[DocumentService, Depends]
+        The service loading the documents of the factory requested with the 'factory'
+        query parameter from Github.
+
+    Returns
+    -------
+    UserDefinedFunction
+        The function.
+    """
+    try:
+        snapshot = await document_service.get(USER_DEFINED_FUNCTIONS)
+        udf = snapshot.udf_index.functions.get((library, function))
+        if udf is None:
+            return _not_found(f"Unknown function '{function}' in library '{library}'.")
+        return _lookup_response(
+            request, document_service, snapshot, udf, _FUNCTION_ADAPTER
+        )
+    except GithubError as e:
+        return JSONResponse(status_code=e.status_code, content={"message": e.message})
+    except httpx.HTTPError as e:
+        return JSONResponse(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            content={"message": str(e)},
+        )
+
+
+@app.get("/docs/datafactory/factories/global-parameters")
+async def read_all_global_parameters(
+    request: Request,
+    github_settings: Annotated[GithubSettings, Depends(get_settings)],
+    document_services: Annotated[
+        Dict[str, DocumentService], Depends(get_document_services)
+    ],
+) -> Dict[str, Union[GlobalParameters, FailedFactory]]:
+    """
+    Read the global parameters of all configured factories concurrently.
+
+    The serialized snapshots are joined without validating or serializing them again.
+    Factories that cannot be loaded are returned as an error entry, unless all fail.
+
+    Parameters
+    ----------
+    request : Request
+        The incoming request.
+    github_settings : Annotated[GithubSettings, Depends]
+        The configuration object for this app.
+    document_services : Annotated[Dict[str, DocumentService], Depends]
+        The document services by factory name.
+
+    Returns
+    -------
+    Dict[str, Union[GlobalParameters, FailedFactory]]
+        The global parameters or the error by factory name.
+    """
+    try:
+        results = await gather_snapshots(
+            document_services, GLOBAL_PARAMETERS, github_settings.max_concurrent_fetches
+        )
+        return _factories_response(request, github_settings, results)
+    except GithubError as e:
+        return JSONResponse(status_code=e.status_code, content={"message": e.message})
+    except httpx.HTTPError as e:
+        return JSONResponse(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            content={"message": str(e)},
+        )
+
+
+@app.get("/docs/datafactory/factories/user-defined-functions")
+async def read_all_user_defined_functions(
+    request: Request,
+    github_settings: Annotated[GithubSettings, Depends(get_settings)],
+    document_services: Annotated[
+        Dict[str, DocumentService], Depends(get_document_services)
+    ],
+) -> Dict[str, Union[List[UserDefinedFunctionLibrary], FailedFactory]]:
+    """
+    Read the user defined functions of all configured factories concurrently.
+
+    The serialized snapshots are joined without validating or serializing them again.
+    Factories that cannot be loaded are returned as an error entry, unless all fail.
+
+    Parameters
+    ----------
+    request : Request
+        The incoming request.
+    github_settings : Annotated[GithubSettings, Depends]
+        The configuration object for this app.
+    document_services : Annotated[Dict[str, DocumentService], Depends]
+        The document services by factory name.
+
+    Returns
+    -------
+    Dict[str, Union[List[UserDefinedFunctionLibrary], FailedFactory]]
+        The user defined function libraries or the error by factory name.
+    """
+    try:
+        results = await gather_snapshots(
+            document_services,
+            USER_DEFINED_FUNCTIONS,
+            github_settings.max_concurrent_fetches,
+        )
+        return _factories_response(request, github_settings, results)
+    except GithubError as e:
+        return JSONResponse(status_code=e.status_code, content={"message": e.message})
+    except httpx.HTTPError as e:
+        return JSONResponse(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            content={"message": str(e)},
+        )
+
+
+@app.get("/docs/datafactory/history/{document}")
+async def read_document_history(
+    document: Literal["global-parameters", "user-defined-functions"],
+    document_service: Annotated[DocumentService, Depends(get_document_service)],
+    until: Optional[datetime] = None,
+    limit: Annotated[int, Query(ge=1, le=1000)] = 100,
+) -> List[SnapshotVersion]:
+    """
+    List the stored versions of a document, newest first.
+
+    Parameters
+    ----------
+    document : Literal["global-parameters", "user-defined-functions"]
+        The document.
+    document_service : Annotated[DocumentService, Depends]
+        The service of the factory requested with the 'factory' query parameter.
+    until : Optional[datetime]
+        Only list versions fetched at or before this time.
+    limit : int
+        The maximum number of versions.
+
+    Returns
+    -------
+    List[SnapshotVersion]
+        The SHA-256 of the source file and the fetch time of every version.
+    """
+    snapshot_store = document_service.snapshot_store
+    if snapshot_store is None:
+        return _not_found("The snapshot store is not configured.")
+    versions = await run_in_threadpool(
+        snapshot_store.versions,
+        document_service.github_settings.factory_name,
+        document,
+        until.timestamp() if until is not None else None,
+        limit,
+    )
+    return [
+        SnapshotVersion(
+            source_sha=version.source_sha,
+            stored_at=datetime.fromtimestamp(version.stored_at, timezone.utc),
+        )
+        for version in versions
+    ]
+
+
+@app.get("/docs/datafactory/history/{document}/{source_sha}")
+async def read_document_version(
+    request: Request,
+    document: Literal["global-parameters", "user-defined-functions"],
+    source_sha: str,
+    document_service: Annotated[DocumentService, Depends(get_document_service)],
+) -> Response:
+    """
+    Read a stored version of a document.
+
+    Parameters
+    ----------
+    request : Request
+        The incoming request.
+    document : Literal["global-parameters", "user-defined-functions"]
+        The document.
+    source_sha : str
+        The SHA-256 of the source file of the version.
+    document_service : Annotated[DocumentService, Depends]
+        The service of the factory requested with the 'factory' query parameter.
+
+    Returns
+    -------
+    Response
+        The document as it was parsed from the source file.
+    """
+    snapshot_store = document_service.snapshot_store
+    if snapshot_store is None:
+        return _not_found("The snapshot store is not configured.")
+    version = await run_in_threadpool(
+        snapshot_store.version,
+        document_service.github_settings.factory_name,
+        document,
+        source_sha,
+    )
+    if version is None:
+        return _not_found(f"Unknown version '{source_sha}'.")
+    return cached_response(
+        version.body,
+        request.headers,
+        version.source_sha,
+        version.stored_at,
+        document_service.github_settings.http_cache_control,
+    )
+
+
+@app.get("/docs/datafactory/bundle")
+async def read_document_bundle(
+    request: Request,
+    document_service: Annotated[DocumentService, Depends(get_document_service)],
+    exclude: Annotated[List[UserDefinedFunctionField], Query()] = [],
+) -> DocumentBundle:
+    """
+    Read the global parameters and the user defined functions of a factory at once.
+
+    Both documents are loaded concurrently, so a page waits for the slower fetch instead
+    of both. The functions can be projected, e.g. '?exclude=definition&exclude=examples'.
+    A bundle is serialized and compressed once per pair of snapshots and projection, a
+    request with a matching 'If-None-Match' is answered with '304 Not Modified' before
+    the bundle is built.
+
+    Parameters
+    ----------
+    request : Request
+        The incoming request.
+    document_service : Annotated[DocumentService, Depends]
+        The service loading the documents of the factory requested with the 'factory'
+        query parameter from Github.
+    exclude : Annotated[List[UserDefinedFunctionField], Query]
+        The fields left out of every function.
+
+    Returns
+    -------
+    DocumentBundle
+        The global parameters and the user defined function libraries.
+    """
+    try:
+        global_parameters, user_defined_functions = await asyncio.gather(
+            document_service.get(GLOBAL_PARAMETERS),
+            document_service.get(USER_DEFINED_FUNCTIONS),
+        )
+        accept_encoding = request.headers.get("Accept-Encoding")
+        # the projection is part of the url, the snapshots alone identify the entity
+        etag, last_modified, headers = _joined_validators(
+            {
+                GLOBAL_PARAMETERS: global_parameters,
+                USER_DEFINED_FUNCTIONS: user_defined_functions,
+            },
+            choose_encoding(accept_encoding),
+            document_service.github_settings.http_cache_control,
+        )
+        if is_not_modified(request.headers, etag, last_modified):
+            return not_modified_response({"Vary": "Accept-Encoding", **headers})
+        body = await run_in_threadpool(
+            document_service.bundle_body,
+            global_parameters,
+            user_defined_functions,
+            frozenset(exclude),
+        )
+        return encoded_response(body, accept_encoding, headers)
+    except GithubError as e:
+        return JSONResponse(status_code=e.status_code, content={"message": e.message})
+    except httpx.HTTPError as e:
+        return JSONResponse(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            content={"message": str(e)},
+        )
+
+
+@app.get("/docs/datafactory/events")
+async def stream_document_changes(
+    request: Request,
+    document_service: Annotated[DocumentService, Depends(get_document_service)],
+) -> StreamingResponse:
+    """
+    Push a Server-Sent Event whenever a reload changes the parsed documents.
+
+    Every 'change' event names the changed libraries, functions or global parameters and
+    the new snapshot ID, the SHA-256 of the source file. Reconnecting clients send the
+    'Last-Event-ID' header and receive the events they missed, or a 'resync' event if
+    they missed too many.
+
+    Parameters
+    ----------
+    request : Request
+        The incoming request.
+    document_service : Annotated[DocumentService, Depends]
+        The service of the factory requested with the 'factory' query parameter.
+
+    Returns
+    -------
+    StreamingResponse
+        The event stream, open until the client disconnects.
+    """
+    return StreamingResponse(
+        document_service.changes.subscribe(request.headers.get("Last-Event-ID")),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@app.post("/webhooks/github", status_code=status.HTTP_202_ACCEPTED)
+async def receive_github_webhook(
+    request: Request,
+    background_tasks: BackgroundTasks,
+    github_settings: Annotated[GithubSettings, Depends(get_settings)],
+    document_services: Annotated[
+        Dict[str, DocumentService], Depends(get_document_services)
+    ],
+) -> Dict[str, Dict[str, List[str]]]:
+    """
+    Receive Github push events and reload the touched documents in the background.
+
+    Parameters
+    ----------
+    request : Request
+        The webhook delivery.
+    background_tasks : BackgroundTasks
+        The tasks run after the response was sent.
+    github_settings : Annotated[GithubSettings, Depends]
+        The configuration object for this app.
+    document_services : Annotated[Dict[str, DocumentService], Depends]
+        The document services by factory name.
+
+    Returns
+    -------
+    Dict[str, Dict[str, List[str]]]
+        The documents that are reloaded by factory name.
+    """
+    if not github_settings.github_webhook_secret:
+        return _not_found("Webhooks are not configured.")
+    body = await request.body()
+    if not verify_signature(
+        github_settings.github_webhook_secret,
+        body,
+        request.headers.get("X-Hub-Signature-256"),
+    ):
+        return JSONResponse(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            content={"message": "Invalid signature."},
+        )
+
+    refreshing = {}
+    if request.headers.get("X-GitHub-Event") == "push":
+        try:
+            payload = parse_push_payload(body)
+        except ValueError as e:
+            return JSONResponse(
+                status_code=status.HTTP_400_BAD_REQUEST, content={"message": str(e)}
+            )
+        for factory_name, document_service in document_services.items():
+            documents = changed_documents(payload, document_service.github_settings)
+            if documents:
+                background_tasks.add_task(document_service.refresh, documents)
+                refreshing[factory_name] = documents
+    return {"refreshing": refreshing}
+
+
+@app.get("/metrics")
+async def read_metrics(
+    github_settings: Annotated[GithubSettings, Depends(get_settings)],
+) -> Response:
+    """
+    Expose stage latencies, Github status codes and the Github rate limit to Prometheus.
+
+    Parameters
+    ----------
+    github_settings : Annotated[GithubSettings, Depends]
+        The configuration object for this app.
+
+    Returns
+    -------
+    Response
+        The metrics in the Prometheus text format.
+    """
+    if not github_settings.metrics_enabled:
+        return _not_found("Metrics are not enabled.")
+    return Response(
+        content=REGISTRY.expose(),
+        media_type="text/plain; version=0.0.4",
+    )
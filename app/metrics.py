@@ -0,0 +1,259 @@
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager, nullcontext
+from typing import ContextManager, Dict, Iterator, List, Optional, Sequence, Tuple
+
+DEFAULT_BUCKETS = (
+    0.0005,
+    0.001,
+    0.0025,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+)
+
+_Labels = Tuple[Tuple[str, str], ...]
+
+
+def _format_labels(labels: _Labels, extra: Sequence[Tuple[str, str]] = ()) -> str:
+    pairs = [*labels, *extra]
+    if not pairs:
+        return ""
+    formatted = ",".join(
+        '{}="{}"'.format(
+            name, value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+        )
+        for name, value in pairs
+    )
+    return "{" + formatted + "}"
+
+
+class _Metric:
+    type_name = ""
+
+    def __init__(self, registry: "Registry", name: str, documentation: str) -> None:
+        self.registry = registry
+        self.name = name
+        self.documentation = documentation
+        self._lock = threading.Lock()
+        registry.register(self)
+
+    def expose(self) -> List[str]:
+        return [
+            f"# HELP {self.name} {self.documentation}",
+            f"# TYPE {self.name} {self.type_name}",
+            *self._samples(),
+        ]
+
+    def _samples(self) -> List[str]:
+        raise NotImplementedError
+
+
+class Counter(_Metric):
+    type_name = "counter"
+
+    def __init__(self, registry: "Registry", name: str, documentation: str) -> None:
+        super().__init__(registry, name, documentation)
+        self._values: Dict[_Labels, float] = {}
+
+    def inc(self, amount: float = 1.0, **labels: str) -> None:
+        if not self.registry.enabled:
+            return
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def _samples(self) -> List[str]:
+        with self._lock:
+            values = dict(self._values)
+        return [
+            f"{self.name}{_format_labels(labels)} {value}"
+            for labels, value in sorted(values.items())
+        ]
+
+
+class Gauge(_Metric):
+    type_name = "gauge"
+
+    def __init__(self, registry: "Registry", name: str, documentation: str) -> None:
+        super().__init__(registry, name, documentation)
+        self._values: Dict[_Labels, float] = {}
+
+    def set(self, value: float, **labels: str) -> None:
+        if not self.registry.enabled:
+            return
+        with self._lock:
+            self._values[tuple(sorted(labels.items()))] = value
+
+    def _samples(self) -> List[str]:
+        with self._lock:
+            values = dict(self._values)
+        return [
+            f"{self.name}{_format_labels(labels)} {value}"
+            for labels, value in sorted(values.items())
+        ]
+
+
+class Histogram(_Metric):
+    type_name = "histogram"
+
+    def __init__(
+        self,
+        registry: "Registry",
+        name: str,
+        documentation: str,
+        buckets: Sequence[float] = DEFAULT_BUCKETS,
+    ) -> None:
+        super().__init__(registry, name, documentation)
+        self.buckets = tuple(buckets)
+        self._values: Dict[_Labels, Tuple[List[int], List[float]]] = {}
+
+    def observe(self, value: float, **labels: str) -> None:
+        if not self.registry.enabled:
+            return
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            counts, total = self._values.setdefault(
+                key, ([0] * (len(self.buckets) + 1), [0.0])
+            )
+            counts[bisect_left(self.buckets, value)] += 1
+            total[0] += value
+
+    def time(self, **labels: str) -> ContextManager[None]:
+        """
+        Observe the duration of a block in seconds.
+
+        Returns a no-op context manager while the registry is disabled.
+        """
+        if not self.registry.enabled:
+            return nullcontext()
+        return self._time(labels)
+
+    @contextmanager
+    def _time(self, labels: Dict[str, str]) -> Iterator[None]:
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def accumulate(self, **labels: str) -> "Accumulator":
+        """
+        Sum the durations of a stage that runs in many small steps, to observe it once.
+        """
+        return Accumulator(self, labels)
+
+    def _samples(self) -> List[str]:
+        with self._lock:
+            values = {
+                labels: (list(counts), total[0])
+                for labels, (counts, total) in self._values.items()
+            }
+        samples = []
+        for labels, (counts, total) in sorted(values.items()):
+            cumulative = 0
+            for bound, count in zip([*self.buckets, float("inf")], counts):
+                cumulative += count
+                le = "+Inf" if bound == float("inf") else repr(bound)
+                samples.append(
+                    f"{self.name}_bucket{_format_labels(labels, [('le', le)])} {cumulative}"
+                )
+            samples.append(f"{self.name}_sum{_format_labels(labels)} {total}")
+            samples.append(f"{self.name}_count{_format_labels(labels)} {cumulative}")
+        return samples
+
+
+class Accumulator:
+    """
+    A reusable context manager that sums the time spent inside it.
+
+    Call observe() once the stage is complete to record the total.
+    """
+
+    __slots__ = ("histogram", "labels", "seconds", "_start")
+
+    def __init__(self, histogram: Histogram, labels: Dict[str, str]) -> None:
+        self.histogram = histogram
+        self.labels = labels
+        self.seconds = 0.0
+        self._start: Optional[float] = None
+
+    def __enter__(self) -> None:
+        if self.histogram.registry.enabled:
+            self._start = time.perf_counter()
+
+    def __exit__(self, *exc_info: object) -> None:
+        if self._start is not None:
+            self.seconds += time.perf_counter() - self._start
+            self._start = None
+
+    def observe(self) -> None:
+        self.histogram.observe(self.seconds, **self.labels)
+
+
+class Registry:
+    """
+    A minimal registry of metrics exposed in the Prometheus text format.
+
+    Recording is off until the registry is enabled, so instrumented code only pays for a
+    flag check while metrics are not scraped.
+    """
+
+    def __init__(self) -> None:
+        self.enabled = False
+        self._metrics: List[_Metric] = []
+
+    def register(self, metric: _Metric) -> None:
+        self._metrics.append(metric)
+
+    def expose(self) -> str:
+        """
+        Render all metrics in the Prometheus text format.
+
+        Returns
+        -------
+        str
+            The exposition of all metrics.
+        """
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.expose())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+STAGE_SECONDS = Histogram(
+    REGISTRY,
+    "adf_docs_stage_duration_seconds",
+    "Duration of the stages of loading a document.",
+)
+GITHUB_RESPONSES = Counter(
+    REGISTRY,
+    "adf_docs_github_responses_total",
+    "Responses of the Github contents API by status code.",
+)
+GITHUB_RATE_LIMIT_REMAINING = Gauge(
+    REGISTRY,
+    "adf_docs_github_rate_limit_remaining",
+    "Requests left in the current Github rate limit window.",
+)
+UDF_PARSE_CACHE_HITS = Counter(
+    REGISTRY,
+    "adf_docs_udf_parse_cache_hits_total",
+    "Libraries and functions reused from the previous parse by level.",
+)
+UDF_PARSE_CACHE_MISSES = Counter(
+    REGISTRY,
+    "adf_docs_udf_parse_cache_misses_total",
+    "Libraries and functions parsed because their content changed by level.",
+)
@@ -0,0 +1,253 @@
+import asyncio
+import base64
+import os
+import subprocess
+import threading
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+from starlette.concurrency import run_in_threadpool
+
+from .config import GithubSettings
+from .github import GithubError
+from .metrics import STAGE_SECONDS
+
+# parsed files kept for reuse, the documents of the configured branch and a few refs
+# requested for comparisons
+MAX_PARSED_FILES = 8
+
+
+class GitMirrorError(GithubError):
+    """
+    Raised when the mirror cannot be updated or a file does not exist at the branch head.
+    """
+
+
+def git_remote_url(github_settings: GithubSettings) -> str:
+    """
+    Build the url of the repository of a factory from the 'git_remote_url' template.
+
+    Parameters
+    ----------
+    github_settings : GithubSettings
+        The configuration object for this app.
+
+    Returns
+    -------
+    str
+        The url of the repository.
+    """
+    return github_settings.git_remote_url.format(
+        organization_name=github_settings.organization_name,
+        repository_name=github_settings.repository_name,
+    )
+
+
+def git_mirror_path(github_settings: GithubSettings) -> str:
+    """
+    Build the directory of the bare mirror of the repository of a factory.
+
+    Parameters
+    ----------
+    github_settings : GithubSettings
+        The configuration object for this app.
+
+    Returns
+    -------
+    str
+        The directory of the mirror.
+    """
+    return os.path.join(
+        github_settings.git_mirror_directory,
+        github_settings.organization_name,
+        f"{github_settings.repository_name}.git",
+    )
+
+
+def is_commit_sha(ref: str) -> bool:
+    """
+    Check if a ref is the full SHA of a commit rather than the name of a branch.
+
+    Parameters
+    ----------
+    ref : str
+        A branch name or a commit SHA.
+
+    Returns
+    -------
+    bool
+        True for 40 hexadecimal characters.
+    """
+    return len(ref) == 40 and all(char in "0123456789abcdef" for char in ref.lower())
+
+
+class GitMirror:
+    """
+    A local bare mirror of a repository that files are read from instead of the contents API.
+
+    Branches are fetched incrementally, so an update only transfers the objects of new
+    commits. Files are read straight from the object store at the head of a branch and
+    only parsed again when their blob SHA changed, the results of the most recently read
+    files are kept. Concurrent updates of a branch and
+    concurrent reads of a file are coalesced like the requests of the GithubClient.
+
+    Parameters
+    ----------
+    remote_url : str
+        The url of the repository, any url 'git fetch' understands.
+    path : str
+        The directory of the bare mirror, it is created on the first update.
+    token : Optional[str]
+        A token sent as basic authorization to https remotes.
+    """
+
+    def __init__(self, remote_url: str, path: str, token: Optional[str] = None) -> None:
+        self.remote_url = remote_url
+        self.path = path
+        self._env = self._git_env(remote_url, token)
+        self._parsed: "OrderedDict[Tuple[str, str], Tuple[str, Any]]" = OrderedDict()
+        self._in_flight: Dict[Tuple[str, ...], "asyncio.Future[Any]"] = {}
+        # git takes file locks while fetching, fetches into one mirror must not overlap
+        self._fetch_lock = threading.Lock()
+
+    @staticmethod
+    def _git_env(remote_url: str, token: Optional[str]) -> Dict[str, str]:
+        env = {**os.environ, "GIT_TERMINAL_PROMPT": "0"}
+        if token and remote_url.startswith("https://"):
+            # passed through the environment to keep the token out of the process list
+            credentials = base64.b64encode(f"x-access-token:{token}".encode("utf-8"))
+            env.update(
+                {
+                    "GIT_CONFIG_COUNT": "1",
+                    "GIT_CONFIG_KEY_0": "http.extraHeader",
+                    "GIT_CONFIG_VALUE_0": f"Authorization: Basic {credentials.decode()}",
+                }
+            )
+        return env
+
+    async def update(self, branch_name: str) -> None:
+        """
+        Fetch the new commits of a branch into the mirror.
+
+        Parameters
+        ----------
+        branch_name : str
+            The branch to fetch.
+
+        Raises
+        ------
+        GitMirrorError
+            If the branch cannot be fetched.
+        """
+        await self._single_flight(
+            ("update", branch_name),
+            lambda: run_in_threadpool(self._fetch, branch_name),
+        )
+
+    async def read(self, ref: str, path: str, parse: Callable[[bytes], Any]) -> Any:
+        """
+        Update a branch and parse a file at its head, reusing the result of an unchanged blob.
+
+        A full commit SHA is read without updating a branch, the commit is only fetched
+        if it is not in the mirror yet.
+
+        Parameters
+        ----------
+        ref : str
+            The branch or the full SHA of the commit to read from.
+        path : str
+            The path of the file in the repository.
+        parse : Callable[[bytes], Any]
+            Turns the content of the file into the parsed result. It runs in the threadpool.
+
+        Returns
+        -------
+        Any
+            The parsed result, the identical object as long as the blob did not change.
+
+        Raises
+        ------
+        GitMirrorError
+            If the ref cannot be fetched or the file does not exist at its head.
+        """
+        if is_commit_sha(ref):
+            await self._single_flight(
+                ("update", ref), lambda: run_in_threadpool(self._fetch_commit, ref)
+            )
+            revision = ref
+        else:
+            await self.update(ref)
+            revision = f"refs/heads/{ref}"
+        return await self._single_flight(
+            ("read", ref, path),
+            lambda: self._read_with_cache(ref, revision, path, parse),
+        )
+
+    async def _read_with_cache(
+        self, ref: str, revision: str, path: str, parse: Callable[[bytes], Any]
+    ) -> Any:
+        blob_sha = await run_in_threadpool(self._blob_sha, revision, path)
+        key = (ref, path)
+        parsed = self._parsed.get(key)
+        if parsed is not None and parsed[0] == blob_sha:
+            self._parsed.move_to_end(key)
+            return parsed[1]
+        content = await run_in_threadpool(self._git, "cat-file", "blob", blob_sha)
+        value = await run_in_threadpool(parse, content)
+        self._parsed[key] = (blob_sha, value)
+        self._parsed.move_to_end(key)
+        while len(self._parsed) > MAX_PARSED_FILES:
+            self._parsed.popitem(last=False)
+        return value
+
+    async def _single_flight(
+        self, key: Tuple[str, ...], work: Callable[[], Awaitable[Any]]
+    ) -> Any:
+        in_flight = self._in_flight.get(key)
+        if in_flight is None:
+            in_flight = asyncio.ensure_future(work())
+            self._in_flight[key] = in_flight
+            in_flight.add_done_callback(lambda done: self._forget_in_flight(key, done))
+        return await asyncio.shield(in_flight)
+
+    def _forget_in_flight(
+        self, key: Tuple[str, ...], done: "asyncio.Future[Any]"
+    ) -> None:
+        if self._in_flight.get(key) is done:
+            del self._in_flight[key]
+
+    def _fetch(self, branch_name: str) -> None:
+        self._fetch_refspec(f"+refs/heads/{branch_name}:refs/heads/{branch_name}")
+
+    def _fetch_commit(self, commit_sha: str) -> None:
+        try:
+            self._git("cat-file", "-e", f"{commit_sha}^{{commit}}")
+        except GitMirrorError:
+            self._fetch_refspec(commit_sha)
+
+    def _fetch_refspec(self, refspec: str) -> None:
+        with self._fetch_lock, STAGE_SECONDS.time(stage="git_fetch"):
+            if not os.path.isfile(os.path.join(self.path, "HEAD")):
+                os.makedirs(self.path, exist_ok=True)
+                self._git("init", "--quiet", "--bare")
+            self._git("fetch", "--quiet", "--no-tags", self.remote_url, refspec)
+
+    def _blob_sha(self, revision: str, path: str) -> str:
+        try:
+            return (
+                self._git("rev-parse", "--verify", f"{revision}:{path}")
+                .decode("ascii")
+                .strip()
+            )
+        except GitMirrorError:
+            raise GitMirrorError(404, f"'{path}' does not exist at '{revision}'.")
+
+    def _git(self, *args: str) -> bytes:
+        result = subprocess.run(
+            ["git", "--git-dir", self.path, *args],
+            env=self._env,
+            capture_output=True,
+        )
+        if result.returncode != 0:
+            raise GitMirrorError(502, result.stderr.decode("utf-8", "replace").strip())
+        return result.stdout
@@ -1,6 +1,8 @@
+from datetime import datetime
 from typing import Any, Dict, List
 
 from pydantic import BaseModel, RootModel
+from pydantic.dataclasses import dataclass
 
 
 class GlobalParameter(BaseModel):
@@ -12,7 +14,17 @@ class GlobalParameters(RootModel):
     root: Dict[str, GlobalParameter]
 
 
-class UserDefinedFunction(BaseModel):
+@dataclass(slots=True)
+class UserDefinedFunction:
+    """
+    A parsed function, a slotted record instead of a model.
+
+    Templates hold tens of thousands of functions, a slotted record takes a tenth of the
+    memory of a model with its '__dict__' and set of fields. Pydantic validates and
+    serializes it as a field of a model or with a TypeAdapter, it has no model methods
+    such as 'model_dump'.
+    """
+
     name: str
     declaration: str
     definition: str
@@ -20,8 +32,115 @@ class UserDefinedFunction(BaseModel):
     params: str
     examples: str
 
+    @classmethod
+    def trusted(
+        cls,
+        name: str,
+        declaration: str,
+        definition: str,
+        documentation: str,
+        params: str,
+        examples: str,
+    ) -> "UserDefinedFunction":
+        """
+        Create a function from trusted strings without validating them.
+
+        Only the parser's own output is constructed this way.
+        """
+        function = object.__new__(cls)
+        function.name = name
+        function.declaration = declaration
+        function.definition = definition
+        function.documentation = documentation
+        function.params = params
+        function.examples = examples
+        return function
+
 
 class UserDefinedFunctionLibrary(BaseModel):
     name: str
     description: str
     functions: List[UserDefinedFunction]
+
+
+class UserDefinedFunctionSearchResult(BaseModel):
+    library: str
+    score: float
+    function: UserDefinedFunction
+
+
+class DocumentBundle(BaseModel):
+    global_parameters: GlobalParameters
+    user_defined_functions: List[UserDefinedFunctionLibrary]
+
+
+class FactoryError(BaseModel):
+    status_code: int
+    message: str
+
+
+class FailedFactory(BaseModel):
+    error: FactoryError
+
+
+class SnapshotVersion(BaseModel):
+    source_sha: str
+    stored_at: datetime
+
+
+class FieldChange(BaseModel):
+    field: str
+    base: str
+    head: str
+
+
+class UserDefinedFunctionReference(BaseModel):
+    library: str
+    function: UserDefinedFunction
+
+
+class UserDefinedFunctionChange(BaseModel):
+    library: str
+    name: str
+    changes: List[FieldChange]
+
+
+class UserDefinedFunctionDiff(BaseModel):
+    added: List[UserDefinedFunctionReference]
+    removed: List[UserDefinedFunctionReference]
+    changed: List[UserDefinedFunctionChange]
+
+
+class GlobalParameterReference(BaseModel):
+    name: str
+    parameter: GlobalParameter
+
+
+class GlobalParameterChange(BaseModel):
+    name: str
+    base: GlobalParameter
+    head: GlobalParameter
+
+
+class GlobalParameterDiff(BaseModel):
+    added: List[GlobalParameterReference]
+    removed: List[GlobalParameterReference]
+    changed: List[GlobalParameterChange]
+
+
+class DocumentDiff(UserDefinedFunctionDiff):
+    global_parameters: GlobalParameterDiff
+
+
+class ChangedFunction(BaseModel):
+    library: str
+    name: str
+
+
+class DocumentChangeEvent(BaseModel):
+    factory: str
+    document: str
+    snapshot_id: str
+    libraries: List[str] = []
+    functions: List[ChangedFunction] = []
+    global_parameters: List[str] = []
@@ -0,0 +1,147 @@
+import multiprocessing
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Callable, Dict, List, Optional, TypeVar
+
+from .models import UserDefinedFunctionLibrary
+from .parse import _parse_udf_libraries, _script_lines
+
+T = TypeVar("T")
+
+# more chunks than workers even out libraries of very different sizes
+CHUNKS_PER_WORKER = 4
+
+
+def _chunk_libraries(
+    udf_library: List[Dict[str, Any]], chunks: int
+) -> List[List[Dict[str, Any]]]:
+    """
+    Split libraries into contiguous chunks of about the same number of script lines.
+
+    The chunks keep the order of the libraries, so concatenating the results of the chunks
+    gives the result of the serial parse.
+    """
+    line_counts = [len(_script_lines(lib)) for lib in udf_library]
+    target_lines = max(sum(line_counts) / chunks, 1)
+    chunked: List[List[Dict[str, Any]]] = [[]]
+    chunk_lines = 0
+    for lib, line_count in zip(udf_library, line_counts):
+        if chunk_lines >= target_lines:
+            chunked.append([])
+            chunk_lines = 0
+        chunked[-1].append(lib)
+        chunk_lines += line_count
+    return chunked
+
+
+class ParallelUDFParser:
+    """
+    Parses the UDF libraries of large templates in a pool of worker processes.
+
+    Templates with fewer script lines than the threshold are parsed serially, starting and
+    feeding the workers would take longer than the parse itself. The pool is started with
+    the first parallel parse and kept for later ones.
+
+    Parameters
+    ----------
+    max_workers : int
+        The number of worker processes.
+    min_script_lines : int
+        The number of script lines from which on a template is parsed in parallel.
+    """
+
+    def __init__(self, max_workers: int, min_script_lines: int) -> None:
+        self.max_workers = max_workers
+        self.min_script_lines = min_script_lines
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._lock = threading.Lock()
+
+    def parse_libraries(
+        self, udf_library: List[Dict[str, Any]]
+    ) -> List[UserDefinedFunctionLibrary]:
+        """
+        Parses the functions of UDFLibrary resources.
+
+        Parameters
+        ----------
+        udf_library : List[Dict[str, Any]]
+            The UDFLibrary resources of an ARM template.
+
+        Returns
+        -------
+        List[UserDefinedFunctionLibrary]
+            The same libraries in the same order as the serial parse.
+        """
+        return [
+            library
+            for libraries in self.map_chunks(_parse_udf_libraries, udf_library)
+            for library in libraries
+        ]
+
+    def map_chunks(
+        self,
+        parse_chunk: Callable[[List[Dict[str, Any]]], T],
+        udf_library: List[Dict[str, Any]],
+    ) -> List[T]:
+        """
+        Apply a parse function to contiguous chunks of libraries in the worker processes.
+
+        Below the threshold, the parse function is applied to all libraries at once in the
+        calling process.
+
+        Parameters
+        ----------
+        parse_chunk : Callable[[List[Dict[str, Any]]], T]
+            Parses a list of libraries. It must be a module level function, so it can be
+            sent to the worker processes.
+        udf_library : List[Dict[str, Any]]
+            The UDFLibrary resources of an ARM template.
+
+        Returns
+        -------
+        List[T]
+            The results of the chunks in the order of the libraries.
+        """
+        if len(udf_library) < 2 or not self.should_parallelize(udf_library):
+            return [parse_chunk(udf_library)]
+        chunks = _chunk_libraries(udf_library, self.max_workers * CHUNKS_PER_WORKER)
+        return list(self._get_executor().map(parse_chunk, chunks))
+
+    def should_parallelize(self, udf_library: List[Dict[str, Any]]) -> bool:
+        """
+        Decide if a parse is large enough to be worth spreading across processes.
+
+        Parameters
+        ----------
+        udf_library : List[Dict[str, Any]]
+            The UDFLibrary resources of an ARM template.
+
+        Returns
+        -------
+        bool
+            True if the libraries have at least 'min_script_lines' script lines.
+        """
+        if self.max_workers < 2:
+            return False
+        return (
+            sum(len(_script_lines(lib)) for lib in udf_library) >= self.min_script_lines
+        )
+
+    def close(self) -> None:
+        """
+        Shut down the worker processes.
+        """
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown()
+                self._executor = None
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        with self._lock:
+            if self._executor is None:
+                # workers are spawned, forking a process that runs threads is unsafe
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.max_workers,
+                    mp_context=multiprocessing.get_context("spawn"),
+                )
+            return self._executor
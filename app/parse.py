@@ -1,27 +1,141 @@
 import base64
 import re
-from typing import Any, List, Dict
+from dataclasses import dataclass
+from typing import Any, Callable, List, Dict, Iterable, Optional, Sequence, Tuple
 
-from .models import GlobalParameters, UserDefinedFunctionLibrary
+import ijson
+from ijson.common import ObjectBuilder
 
+from .metrics import STAGE_SECONDS
+from .models import GlobalParameters, UserDefinedFunction, UserDefinedFunctionLibrary
 
-def _get_content_for_tag(search_text: str, tag: str) -> str:
+
+DOCUMENTATION_TAG = ":Documentation:"
+PARAMS_TAG = ":Params:"
+EXAMPLE_TAG = ":Example:"
+_TAGS = (DOCUMENTATION_TAG, PARAMS_TAG, EXAMPLE_TAG)
+
+DATAFLOW_RESOURCE_TYPE = "Microsoft.DataFactory/factories/dataflows"
+
+# the key of the result of the UDF library extractor
+USER_DEFINED_FUNCTIONS = "user_defined_functions"
+
+# match strings of the form:
+# CustomAdd(double, double) as double = add(i1, i2)
+# CustomAdd(double, double) as double = /*
+#                                       ^ start of a comment
+_FUNCTION_PATTERN = re.compile(
+    r"[A-Za-z]+\(.*\)\sas\s[A-Za-z]+\s=\s([A-Za-z]+)?(\/\*)?"
+)
+
+
+class _FunctionTokens:
+    """
+    Positions of the markers of a single function, collected while its text is scanned.
+
+    None of the markers contain a line break, so every marker is found within a single
+    line and the text of a function is scanned exactly once, line by line.
+    """
+
+    __slots__ = (
+        "parts",
+        "length",
+        "assign_index",
+        "comment_start_index",
+        "comment_end_index",
+        "first_tag_indices",
+        "last_tag_indices",
+    )
+
+    def __init__(self) -> None:
+        self.parts: List[str] = []
+        self.length = 0
+        self.assign_index = -1
+        self.comment_start_index = -1
+        self.comment_end_index = -1
+        self.first_tag_indices = [-1] * len(_TAGS)
+        self.last_tag_indices = [-1] * len(_TAGS)
+
+    def add(self, text: str) -> None:
+        """
+        Scans the next piece of text of the function for markers.
+
+        Parameters:
+        - text (str): The text to append.
+        """
+        offset = self.length
+        if self.assign_index < 0:
+            index = text.find("=")
+            if index >= 0:
+                self.assign_index = offset + index
+        if self.comment_start_index < 0:
+            index = text.find("= /*")
+            if index >= 0:
+                self.comment_start_index = offset + index
+        if self.comment_end_index < 0:
+            index = text.find("*/")
+            if index >= 0:
+                self.comment_end_index = offset + index
+        if ":" in text:
+            for tag_number, tag in enumerate(_TAGS):
+                index = text.rfind(tag)
+                if index >= 0:
+                    self.last_tag_indices[tag_number] = offset + index
+                    if self.first_tag_indices[tag_number] < 0:
+                        self.first_tag_indices[tag_number] = offset + text.find(tag)
+        self.parts.append(text)
+        self.length += len(text)
+
+    def text(self) -> str:
+        return "".join(self.parts)
+
+    def ends_with_comma(self) -> bool:
+        for part in reversed(self.parts):
+            stripped = part.rstrip()
+            if stripped:
+                return stripped.endswith(",")
+        return False
+
+    def tag_content(self, text: str, tag_number: int) -> str:
+        """
+        Extracts the content between the first and the last occurrence of a tag.
+
+        Parameters:
+        - text (str): The text of the function.
+        - tag_number (int): The index of the tag in _TAGS.
+
+        Returns:
+        str: The content between the tags.
+        """
+        start_index = self.first_tag_indices[tag_number] + len(_TAGS[tag_number])
+        end_index = self.last_tag_indices[tag_number]
+        if start_index >= 0 and end_index > start_index:
+            return text[start_index:end_index]
+        else:
+            return ""
+
+
+def _tokenize_script_lines(function_strings: Iterable[str]) -> List[_FunctionTokens]:
     """
-    Extracts content between the given tag in the search_text.
+    Splits the script lines of a library into functions in a single pass.
 
     Parameters:
-    - search_text (str): The text to search within.
-    - tag (str): The tag to extract content for.
+    - function_strings (Iterable[str]): The script lines of a library.
 
     Returns:
-    str: The content between the tags.
+    List[_FunctionTokens]: The scanned functions.
     """
-    start_index = search_text.find(tag) + len(tag)
-    end_index = search_text.rfind(tag)
-    if start_index >= 0 and end_index > start_index:
-        return search_text[start_index:end_index]
-    else:
-        return ""
+    tokens = _FunctionTokens()
+    functions = [tokens]
+    search_function = _FUNCTION_PATTERN.search
+    for line in function_strings:
+        if tokens.length and "as" in line and search_function(line) is not None:
+            tokens = _FunctionTokens()
+            functions.append(tokens)
+        tokens.add(line)
+        tokens.parts.append("\n")
+        tokens.length += 1
+    return functions
 
 
 def _parse_isolated_function_strings(function_strings: List[str]) -> List[str]:
@@ -34,53 +148,32 @@ def _parse_isolated_function_strings(function_strings: List[str]) -> List[str]:
     Returns:
     List[str]: List of isolated function strings.
     """
-    single_function_string = ""
-    isolated_function_strings = []
-    for line in function_strings:
-        function_pattern = r"[A-Za-z]+\(.*\)\sas\s[A-Za-z]+\s=\s([A-Za-z]+)?(\/\*)?"
-        # match strings of the form:
-        # CustomAdd(double, double) as double = add(i1, i2)
-        # CustomAdd(double, double) as double = /*
-        #                                       ^ start of a comment
-        if (
-            re.search(function_pattern, line) is not None
-            and single_function_string != ""
-        ):
-            isolated_function_strings.append(single_function_string)
-            single_function_string = ""
-        line += "\n"
-        single_function_string += line
-    isolated_function_strings.append(single_function_string)  # append final string
-    return isolated_function_strings
+    return [tokens.text() for tokens in _tokenize_script_lines(function_strings)]
 
 
-def _parse_function_content(single_function_string: str) -> Dict[str, str]:
+def _parse_function_tokens(tokens: _FunctionTokens) -> Dict[str, str]:
     """
-    Parses function content from a single function string.
+    Parses function content from a scanned function.
 
     Parameters:
-    - single_function_string (str): The function string to parse.
+    - tokens (_FunctionTokens): The scanned function.
 
     Returns:
     Dict[str, str]: Dictionary containing function information.
     """
-    documentation_tags = ":Documentation:"
-    params_tag = ":Params:"
-    example_tags = ":Example:"
+    single_function_string = tokens.text()
 
     declaration_start_index = 0
-    declaration_end_index = single_function_string.find("=")
+    declaration_end_index = tokens.assign_index
     definition_start_index = declaration_end_index + 1
     definition_end_index = len(single_function_string) - 1
-    comment_start_index = single_function_string.find("= /*")
-    comment_end_index = single_function_string.find("*/") + len("*/")
 
-    if comment_start_index != -1:
+    if tokens.comment_start_index != -1:
         # assume user wrote a comment
-        declaration_end_index = comment_start_index
-        definition_start_index = comment_end_index
+        declaration_end_index = tokens.comment_start_index
+        definition_start_index = tokens.comment_end_index + len("*/")
 
-    if single_function_string.strip().endswith(","):
+    if tokens.ends_with_comma():
         # this is valid for every function that is not the last one of a library
         definition_end_index = -2
 
@@ -92,25 +185,36 @@ def _parse_function_content(single_function_string: str) -> Dict[str, str]:
         definition_start_index:definition_end_index
     ].strip()
 
-    documentation_content = _get_content_for_tag(
-        single_function_string, documentation_tags
-    ).strip()
-    params_content = _get_content_for_tag(single_function_string, params_tag).strip()
-    example_content = _get_content_for_tag(single_function_string, example_tags).strip()
-
     return {
         "name": function_name,
         "declaration": declaration_content,
         "definition": definition_content,
-        "documentation": documentation_content,
-        "params": params_content,
-        "examples": example_content,
+        "documentation": tokens.tag_content(single_function_string, 0).strip(),
+        "params": tokens.tag_content(single_function_string, 1).strip(),
+        "examples": tokens.tag_content(single_function_string, 2).strip(),
     }
 
 
+def _parse_function_content(single_function_string: str) -> Dict[str, str]:
+    """
+    Parses function content from a single function string.
+
+    Parameters:
+    - single_function_string (str): The function string to parse.
+
+    Returns:
+    Dict[str, str]: Dictionary containing function information.
+    """
+    tokens = _FunctionTokens()
+    tokens.add(single_function_string)
+    return _parse_function_tokens(tokens)
+
+
 def parse_global_parameters(file_content: str) -> GlobalParameters:
     """
-    Parses Global Parameters from 'YOUR_DATA_FACTORY_GlobalParameters.json'.
+    Parses Global Parameters from the base64 content of
+    'YOUR_DATA_FACTORY_GlobalParameters.json', as returned by the json media type of the
+    contents API and by the git blobs API.
 
     Parameters
     ----------
@@ -120,63 +224,361 @@ def parse_global_parameters(file_content: str) -> GlobalParameters:
     -------
     GlobalParameters
     """
-    decoded_bytes = base64.b64decode(file_content)
-    decoded_str = str(decoded_bytes, "utf-8")
-    global_parameters = GlobalParameters.model_validate_json(decoded_str)
+    with STAGE_SECONDS.time(stage="base64_decode"):
+        decoded_bytes = base64.b64decode(file_content)
+    # validated from the bytes, decoding them into a str first would copy the file again
+    with STAGE_SECONDS.time(stage="model_construction"):
+        global_parameters = GlobalParameters.model_validate_json(decoded_bytes)
     return global_parameters
 
 
+def parse_global_parameters_json(file_content: bytes) -> GlobalParameters:
+    """
+    Parses Global Parameters from the raw bytes of 'YOUR_DATA_FACTORY_GlobalParameters.json'.
+
+    The bytes are validated as they are, without a base64 round-trip or an intermediate
+    str.
+
+    Parameters
+    ----------
+    - file_content (bytes): Content of the json file.
+
+    Returns
+    -------
+    GlobalParameters
+    """
+    with STAGE_SECONDS.time(stage="model_construction"):
+        return GlobalParameters.model_validate_json(file_content)
+
+
+def _script_lines(udf_library: Dict[str, Any]) -> List[str]:
+    return (
+        udf_library.get("properties", {})
+        .get("typeProperties", {})
+        .get("scriptLines", [])
+    )
+
+
+def _resource_name(resource: Dict[str, Any]) -> str:
+    return (
+        resource.get("name", "")
+        .replace("[concat(parameters('factoryName'), '/", "")
+        .replace("')]", "")
+    )
+
+
+def _parse_udf_libraries(
+    udf_library: List[Dict[str, Any]]
+) -> List[UserDefinedFunctionLibrary]:
+    """
+    Parses the functions of UDFLibrary resources.
+
+    Parameters:
+    - udf_library (List[dict]): The UDFLibrary resources of an ARM template.
+
+    Returns:
+    -------
+    List[UserDefinedFunctionLibrary]
+    """
+    functions_strings = [_script_lines(lib) for lib in udf_library]
+    with STAGE_SECONDS.time(stage="udf_split"):
+        function_tokens_by_library = [
+            _tokenize_script_lines(strings) for strings in functions_strings
+        ]
+
+    with STAGE_SECONDS.time(stage="udf_function_content"):
+        functions = [
+            [
+                _parse_function_tokens(function_tokens)
+                for function_tokens in library_tokens
+            ]
+            for library_tokens in function_tokens_by_library
+        ]
+
+    with STAGE_SECONDS.time(stage="model_construction"):
+        # the functions are the parser's own strings and skip validation, the few
+        # libraries carry names and descriptions of the template and are validated
+        udf_libraries = [
+            UserDefinedFunctionLibrary(
+                name=_resource_name(lib),
+                description=lib.get("description", ""),
+                functions=[
+                    UserDefinedFunction.trusted(**function)
+                    for function in functions[index]
+                ],
+            )
+            for index, lib in enumerate(udf_library)
+        ]
+    return udf_libraries
+
+
+@dataclass(frozen=True)
+class ResourceExtractor:
+    """
+    Turns one kind of resources of an ARM template into a part of the documentation.
+
+    Parameters:
+    - name (str): The key of the result of the extractor.
+    - resource_type (str): The 'type' of the resources it handles.
+    - properties_type (Optional[str]): The 'properties.type' of the resources it handles,
+      None for the resources of 'resource_type' no other extractor handles.
+    - extract (Callable): Turns the handled resources, in the order of the template,
+      into the result.
+    """
+
+    name: str
+    resource_type: str
+    properties_type: Optional[str]
+    extract: Callable[[List[Dict[str, Any]]], Any]
+
+
+def udf_library_extractor(
+    parse_libraries: Callable[
+        [List[Dict[str, Any]]], List[UserDefinedFunctionLibrary]
+    ] = _parse_udf_libraries,
+) -> ResourceExtractor:
+    """
+    Creates the extractor of the functions of UDFLibrary resources.
+
+    Parameters:
+    - parse_libraries (Callable): Turns the UDFLibrary resources into the result.
+
+    Returns:
+    -------
+    ResourceExtractor
+    """
+    return ResourceExtractor(
+        USER_DEFINED_FUNCTIONS, DATAFLOW_RESOURCE_TYPE, "UDFLibrary", parse_libraries
+    )
+
+
+class ResourceDispatcher:
+    """
+    Hands every resource of an ARM template to the extractor of its kind.
+
+    A resource goes to the extractor of its 'type' and 'properties.type' or, if there is
+    none, to the extractor of its 'type' alone. Resources without an extractor are
+    skipped. All extractors are served by a single walk over the resources.
+
+    Parameters:
+    - extractors (Sequence[ResourceExtractor]): The extractors, one per kind of resources.
+    """
+
+    def __init__(self, extractors: Sequence[ResourceExtractor]) -> None:
+        self.extractors = tuple(extractors)
+        self._by_kind: Dict[Tuple[str, Optional[str]], ResourceExtractor] = {}
+        for extractor in self.extractors:
+            kind = (extractor.resource_type, extractor.properties_type)
+            if kind in self._by_kind:
+                raise ValueError(f"Resources of the kind {kind} are already extracted.")
+            self._by_kind[kind] = extractor
+        self.resource_types = frozenset(e.resource_type for e in self.extractors)
+
+    def extractor_for(self, resource: Dict[str, Any]) -> Optional[ResourceExtractor]:
+        """
+        Finds the extractor of a resource.
+
+        Parameters:
+        - resource (dict): A resource of an ARM template.
+
+        Returns:
+        -------
+        Optional[ResourceExtractor]: The extractor or None if the resource is skipped.
+        """
+        resource_type = resource.get("type")
+        if resource_type not in self.resource_types:
+            return None
+        properties = resource.get("properties")
+        properties_type = (
+            properties.get("type") if isinstance(properties, dict) else None
+        )
+        extractor = self._by_kind.get((resource_type, properties_type))
+        if extractor is None:
+            extractor = self._by_kind.get((resource_type, None))
+        return extractor
+
+    def extract(self, resources: Iterable[Dict[str, Any]]) -> Dict[str, Any]:
+        """
+        Collects the resources of every extractor in one walk and extracts them.
+
+        Parameters:
+        - resources (Iterable[dict]): The resources of an ARM template.
+
+        Returns:
+        -------
+        Dict[str, Any]: The results by the name of the extractor.
+        """
+        collected: Dict[str, List[Dict[str, Any]]] = {
+            extractor.name: [] for extractor in self.extractors
+        }
+        for resource in resources:
+            extractor = self.extractor_for(resource)
+            if extractor is not None:
+                collected[extractor.name].append(resource)
+        return self.finish(collected)
+
+    def finish(self, collected: Dict[str, List[Dict[str, Any]]]) -> Dict[str, Any]:
+        """
+        Extracts the collected resources of every extractor.
+
+        Parameters:
+        - collected (Dict[str, List[dict]]): The resources by the name of the extractor.
+
+        Returns:
+        -------
+        Dict[str, Any]: The results by the name of the extractor.
+        """
+        return {
+            extractor.name: extractor.extract(collected.get(extractor.name, []))
+            for extractor in self.extractors
+        }
+
+
 def parse_udf_functions_with_comments(
-    file_content: Dict[str, Any]
+    file_content: Dict[str, Any],
+    parse_libraries: Callable[
+        [List[Dict[str, Any]]], List[UserDefinedFunctionLibrary]
+    ] = _parse_udf_libraries,
 ) -> List[UserDefinedFunctionLibrary]:
     """
     Parses UDF functions with comments from an ARM template.
 
     Parameters:
     - file_content (dict): ARM template content.
+    - parse_libraries (Callable): Turns the UDFLibrary resources into the result.
 
     Returns:
     -------
     List[UserDefinedFunctionLibrary]
     """
-    resources = file_content.get("resources", [])
-    udf_library = [
-        res
-        for res in resources
-        if res.get("properties", {}).get("type") == "UDFLibrary"
-    ]
-
-    functions_strings = [
-        lib.get("properties", {}).get("typeProperties", {}).get("scriptLines", [])
-        for lib in udf_library
-    ]
-    function_strings_by_library = [
-        _parse_isolated_function_strings(strings) for strings in functions_strings
-    ]
-
-    functions = [
-        [
-            _parse_function_content(isolated_function_string)
-            for isolated_function_string in isolated_function_strings
-        ]
-        for isolated_function_strings in function_strings_by_library
-    ]
-
-    libraries = [
-        {
-            "name": lib.get("name", "")
-            .replace("[concat(parameters('factoryName'), '/", "")
-            .replace("')]", ""),
-            "description": lib.get("description", ""),
-            "functions": functions[index],
+    dispatcher = ResourceDispatcher([udf_library_extractor(parse_libraries)])
+    return dispatcher.extract(file_content.get("resources", []))[USER_DEFINED_FUNCTIONS]
+
+
+class ARMTemplateStreamParser:
+    """
+    Incrementally parses the resources of an ARM template from its bytes.
+
+    Only resources of a type that one of the extractors handles are materialized while
+    the template is fed, all other resources are skipped on the token level. Peak memory
+    therefore depends on the size of the extracted resources and not on the size of the
+    template.
+
+    Parameters:
+    - extractors (Sequence[ResourceExtractor]): The extractors, one per kind of resources.
+    """
+
+    def __init__(self, extractors: Sequence[ResourceExtractor]) -> None:
+        self._dispatcher = ResourceDispatcher(extractors)
+        self._events = ijson.sendable_list()
+        self._coro = ijson.parse_coro(self._events, use_float=True)
+        self._builder: Optional[ObjectBuilder] = None
+        self._in_resource = False
+        self._collected: Dict[str, List[Dict[str, Any]]] = {
+            extractor.name: [] for extractor in self._dispatcher.extractors
         }
-        for index, lib in enumerate(udf_library)
-    ]
+        self._decode_seconds = STAGE_SECONDS.accumulate(stage="body_decode")
 
-    udf_libraries = list(
-        map(
-            lambda lib: UserDefinedFunctionLibrary(**lib),
-            libraries,
-        )
-    )
-    return udf_libraries
+    def feed(self, chunk: bytes) -> None:
+        """
+        Feeds the next chunk of the ARM template.
+
+        Parameters:
+        - chunk (bytes): The next bytes of the template.
+        """
+        with self._decode_seconds:
+            self._coro.send(chunk)
+            self._consume_events()
+
+    def close(self) -> Dict[str, Any]:
+        """
+        Finishes the stream and extracts the collected resources.
+
+        Returns:
+        -------
+        Dict[str, Any]: The results by the name of the extractor.
+        """
+        with self._decode_seconds:
+            self._coro.close()
+            self._consume_events()
+        self._decode_seconds.observe()
+        return self._dispatcher.finish(self._collected)
+
+    def _consume_events(self) -> None:
+        for prefix, event, value in self._events:
+            if not self._in_resource:
+                if prefix == "resources.item" and event == "start_map":
+                    self._in_resource = True
+                    self._builder = ObjectBuilder()
+                    self._builder.event(event, value)
+                continue
+
+            if prefix == "resources.item" and event == "end_map":
+                self._in_resource = False
+                if self._builder is not None:
+                    self._builder.event(event, value)
+                    resource = self._builder.value
+                    extractor = self._dispatcher.extractor_for(resource)
+                    if extractor is not None:
+                        self._collected[extractor.name].append(resource)
+                self._builder = None
+            elif self._builder is None:
+                # skipping a resource that no extractor handles
+                continue
+            elif (
+                prefix == "resources.item.type"
+                and value not in self._dispatcher.resource_types
+            ):
+                self._builder = None
+            else:
+                self._builder.event(event, value)
+        del self._events[:]
+
+
+class UDFLibraryStreamParser(ARMTemplateStreamParser):
+    """
+    Incrementally parses UDF functions with comments from the bytes of an ARM template.
+
+    Only resources of the data flow type are materialized while the template is fed, all
+    other resources (pipelines, datasets, ...) are skipped on the token level.
+
+    Parameters:
+    - parse_libraries (Callable): Turns the collected UDFLibrary resources into the result.
+    """
+
+    def __init__(
+        self,
+        parse_libraries: Callable[
+            [List[Dict[str, Any]]], List[UserDefinedFunctionLibrary]
+        ] = _parse_udf_libraries,
+    ) -> None:
+        super().__init__([udf_library_extractor(parse_libraries)])
+
+    def close(self) -> List[UserDefinedFunctionLibrary]:  # type: ignore[override]
+        """
+        Finishes the stream and parses the collected UDFLibrary resources.
+
+        Returns:
+        -------
+        List[UserDefinedFunctionLibrary]
+        """
+        return super().close()[USER_DEFINED_FUNCTIONS]
+
+
+def parse_udf_functions_from_stream(
+    chunks: Iterable[bytes],
+) -> List[UserDefinedFunctionLibrary]:
+    """
+    Parses UDF functions with comments from the chunked bytes of an ARM template.
+
+    Parameters:
+    - chunks (Iterable[bytes]): The bytes of the ARM template.
+
+    Returns:
+    -------
+    List[UserDefinedFunctionLibrary]
+    """
+    parser = UDFLibraryStreamParser()
+    for chunk in chunks:
+        parser.feed(chunk)
+    return parser.close()
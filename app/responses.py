@@ -0,0 +1,318 @@
+import gzip
+import json
+from dataclasses import dataclass
+from email.utils import formatdate, parsedate_to_datetime
+from typing import Any, Dict, Mapping, Optional
+
+import brotli
+from fastapi import Response
+from pydantic import TypeAdapter
+
+GZIP_LEVEL = 9
+BROTLI_QUALITY = 6
+
+# part of every ETag, increase it with every release that changes the parse result or
+# the serialization of an unchanged source file
+REPRESENTATION_VERSION = 2
+
+
+@dataclass(frozen=True)
+class EncodedBody:
+    identity: bytes
+    gzip: bytes
+    br: bytes
+
+
+def encode_body(body: bytes) -> EncodedBody:
+    """
+    Compress a serialized response body once, so it can be served many times.
+
+    Parameters
+    ----------
+    body : bytes
+        The serialized json body.
+
+    Returns
+    -------
+    EncodedBody
+        The body with its gzip and brotli variants.
+    """
+    return EncodedBody(
+        identity=body,
+        gzip=gzip.compress(body, compresslevel=GZIP_LEVEL, mtime=0),
+        br=brotli.compress(body, quality=BROTLI_QUALITY),
+    )
+
+
+def _accepted_encodings(accept_encoding: Optional[str]) -> Dict[str, float]:
+    accepted = {}
+    for item in (accept_encoding or "").split(","):
+        coding, _, parameters = item.strip().partition(";")
+        quality = 1.0
+        parameter = parameters.strip()
+        if parameter.startswith("q="):
+            try:
+                quality = float(parameter[2:])
+            except ValueError:
+                quality = 0.0
+        if coding:
+            accepted[coding.strip().lower()] = quality
+    return accepted
+
+
+def choose_encoding(accept_encoding: Optional[str]) -> str:
+    """
+    Choose the content coding the client accepts with the highest quality.
+
+    Brotli is preferred over gzip, and both over identity, only between equal qualities.
+    Identity is the fallback if no coding is acceptable.
+
+    Parameters
+    ----------
+    accept_encoding : Optional[str]
+        The 'Accept-Encoding' request header.
+
+    Returns
+    -------
+    str
+        One of 'br', 'gzip' and 'identity'.
+    """
+    accepted = _accepted_encodings(accept_encoding)
+    qualities = [
+        (coding, accepted.get(coding, accepted.get("*", 0.0)))
+        for coding in ("br", "gzip")
+    ]
+    # identity only competes if it is listed, it is the fallback anyway
+    qualities.append(("identity", accepted.get("identity", 0.0)))
+    # max keeps the first of equal qualities, the order of preference
+    coding, quality = max(qualities, key=lambda item: item[1])
+    return coding if quality > 0 else "identity"
+
+
+def encoded_response(
+    body: EncodedBody,
+    accept_encoding: Optional[str],
+    headers: Optional[Dict[str, str]] = None,
+) -> Response:
+    """
+    Answer with the pre-encoded variant of a body the client accepts.
+
+    Parameters
+    ----------
+    body : EncodedBody
+        The pre-encoded body.
+    accept_encoding : Optional[str]
+        The 'Accept-Encoding' request header.
+    headers : Optional[Dict[str, str]]
+        Additional response headers.
+
+    Returns
+    -------
+    Response
+        The json response.
+    """
+    coding = choose_encoding(accept_encoding)
+    response_headers = {"Vary": "Accept-Encoding", **(headers or {})}
+    if coding != "identity":
+        response_headers["Content-Encoding"] = coding
+    return Response(
+        content=getattr(body, coding),
+        media_type="application/json",
+        headers=response_headers,
+    )
+
+
+def serialized_response(
+    value: Any, adapter: TypeAdapter, headers: Optional[Dict[str, str]] = None
+) -> Response:
+    """
+    Answer with a value serialized by its type adapter.
+
+    Values returned from an endpoint are validated against the return type before they
+    are serialized. The values built by this app are trusted, so they are only serialized.
+
+    Parameters
+    ----------
+    value : Any
+        The value of the type of the adapter.
+    adapter : TypeAdapter
+        The adapter of the return type of the endpoint.
+    headers : Optional[Dict[str, str]]
+        Additional response headers.
+
+    Returns
+    -------
+    Response
+        The json response.
+    """
+    return Response(
+        content=adapter.dump_json(value), media_type="application/json", headers=headers
+    )
+
+
+def entity_tag(entity_id: str, coding: str = "identity") -> str:
+    """
+    Build the strong ETag of a representation.
+
+    Every content coding is a different representation and gets its own tag. The tag
+    includes REPRESENTATION_VERSION, so a release that serves the same source differently
+    does not confirm the bodies cached by clients before it.
+
+    Parameters
+    ----------
+    entity_id : str
+        Identifies the content, e.g. the SHA-256 of the source file of a snapshot.
+    coding : str
+        One of 'br', 'gzip' and 'identity'.
+
+    Returns
+    -------
+    str
+        The quoted entity tag.
+    """
+    if coding == "identity":
+        return f'"v{REPRESENTATION_VERSION}-{entity_id}"'
+    return f'"v{REPRESENTATION_VERSION}-{entity_id}-{coding}"'
+
+
+def is_not_modified(
+    request_headers: Mapping[str, str], etag: str, last_modified: Optional[float]
+) -> bool:
+    """
+    Evaluate the 'If-None-Match' and 'If-Modified-Since' headers of a request.
+
+    'If-Modified-Since' is only evaluated without 'If-None-Match'. Tags are compared
+    weakly, as proxies that compress responses mark the tags they pass on as weak.
+
+    Parameters
+    ----------
+    request_headers : Mapping[str, str]
+        The request headers.
+    etag : str
+        The entity tag of the current representation.
+    last_modified : Optional[float]
+        The time the content last changed, in seconds since the epoch.
+
+    Returns
+    -------
+    bool
+        True if the client has the current representation.
+    """
+    if_none_match = request_headers.get("If-None-Match")
+    if if_none_match is not None:
+        tags = [tag.strip() for tag in if_none_match.split(",")]
+        return "*" in tags or etag in [tag.removeprefix("W/") for tag in tags]
+    if_modified_since = request_headers.get("If-Modified-Since")
+    if if_modified_since is None or last_modified is None:
+        return False
+    try:
+        since = parsedate_to_datetime(if_modified_since).timestamp()
+    except (TypeError, ValueError):
+        return False
+    # the header has a precision of seconds
+    return int(last_modified) <= since
+
+
+def validator_headers(
+    etag: str, last_modified: Optional[float], cache_control: str
+) -> Dict[str, str]:
+    """
+    Build the caching headers of a response.
+
+    Parameters
+    ----------
+    etag : str
+        The entity tag of the representation.
+    last_modified : Optional[float]
+        The time the content last changed, in seconds since the epoch.
+    cache_control : str
+        The 'Cache-Control' header.
+
+    Returns
+    -------
+    Dict[str, str]
+        The 'ETag', 'Last-Modified' and 'Cache-Control' headers.
+    """
+    headers = {"ETag": etag, "Cache-Control": cache_control}
+    if last_modified is not None:
+        headers["Last-Modified"] = formatdate(last_modified, usegmt=True)
+    return headers
+
+
+def not_modified_response(headers: Dict[str, str]) -> Response:
+    """
+    Answer a conditional request of a client that has the current representation.
+
+    Parameters
+    ----------
+    headers : Dict[str, str]
+        The caching headers of the representation.
+
+    Returns
+    -------
+    Response
+        A '304 Not Modified' response without a body.
+    """
+    return Response(status_code=304, headers=headers)
+
+
+def cached_response(
+    body: EncodedBody,
+    request_headers: Mapping[str, str],
+    entity_id: str,
+    last_modified: Optional[float],
+    cache_control: str,
+    headers: Optional[Dict[str, str]] = None,
+) -> Response:
+    """
+    Answer with a pre-encoded body and validators, or with '304 Not Modified'.
+
+    Parameters
+    ----------
+    body : EncodedBody
+        The pre-encoded body.
+    request_headers : Mapping[str, str]
+        The request headers.
+    entity_id : str
+        Identifies the content of the body.
+    last_modified : Optional[float]
+        The time the content last changed, in seconds since the epoch.
+    cache_control : str
+        The 'Cache-Control' header.
+    headers : Optional[Dict[str, str]]
+        Additional response headers.
+
+    Returns
+    -------
+    Response
+        The json response.
+    """
+    accept_encoding = request_headers.get("Accept-Encoding")
+    etag = entity_tag(entity_id, choose_encoding(accept_encoding))
+    response_headers = {
+        **(headers or {}),
+        **validator_headers(etag, last_modified, cache_control),
+    }
+    if is_not_modified(request_headers, etag, last_modified):
+        return not_modified_response({"Vary": "Accept-Encoding", **response_headers})
+    return encoded_response(body, accept_encoding, response_headers)
+
+
+def join_json_object(bodies: Dict[str, bytes]) -> bytes:
+    """
+    Join serialized json values into a serialized json object without parsing them.
+
+    Parameters
+    ----------
+    bodies : Dict[str, bytes]
+        The serialized values by key.
+
+    Returns
+    -------
+    bytes
+        The serialized json object.
+    """
+    members = [
+        json.dumps(key).encode("utf-8") + b":" + body for key, body in bodies.items()
+    ]
+    return b"{" + b",".join(members) + b"}"
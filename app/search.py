@@ -0,0 +1,237 @@
+import heapq
+import re
+import threading
+from bisect import bisect_left
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Dict, Iterable, List, Tuple
+
+from .models import (
+    UserDefinedFunction,
+    UserDefinedFunctionLibrary,
+    UserDefinedFunctionSearchResult,
+)
+
+_WORD_PATTERN = re.compile(r"[A-Za-z0-9]+")
+_WORD_PART_PATTERN = re.compile(r"[A-Z]+(?![a-z])|[A-Z]?[a-z]+|[0-9]+")
+
+# matches in the name of a function rank higher than matches in its documentation
+FIELD_WEIGHTS = (
+    ("name", 5.0),
+    ("declaration", 2.0),
+    ("documentation", 1.0),
+    ("params", 1.0),
+    ("examples", 1.0),
+)
+PREFIX_MATCH_FACTOR = 0.5
+# shorter prefixes match a large part of the vocabulary and only match whole words
+MIN_PREFIX_LENGTH = 3
+# bounds the work of a prefix that is shared by many tokens
+MAX_PREFIX_EXPANSIONS = 64
+
+
+@lru_cache(maxsize=4096)
+def _tokenize(text: str) -> Tuple[str, ...]:
+    """
+    Split a text into lower case words and the parts of camel case words.
+
+    'CustomDivide(double, double)' is split into 'customdivide', 'custom', 'divide' and
+    'double'.
+    """
+    tokens = []
+    for word in _WORD_PATTERN.findall(text):
+        tokens.append(word.lower())
+        if not word[1:].islower():
+            parts = _WORD_PART_PATTERN.findall(word)
+            if len(parts) > 1:
+                tokens.extend([part.lower() for part in parts])
+    return tuple(tokens)
+
+
+def _token_weights(function: UserDefinedFunction) -> Dict[str, float]:
+    weights: Dict[str, float] = {}
+    for field, weight in FIELD_WEIGHTS:
+        for token in _tokenize(getattr(function, field)):
+            weights[token] = weights.get(token, 0.0) + weight
+    return weights
+
+
+_EntryKey = Tuple[str, str, str, str, str, str, str]
+
+
+@dataclass
+class _Entry:
+    library: str
+    function: UserDefinedFunction
+    token_weights: Dict[str, float]
+
+
+@dataclass
+class _IndexState:
+    keys: Dict[_EntryKey, int]
+    entries: Dict[int, _Entry]
+    postings: Dict[str, Dict[int, float]]
+    vocabulary: List[str]
+
+
+class UDFSearchIndex:
+    """
+    An in-memory inverted index over the user defined functions of a factory.
+
+    The index is updated incrementally: only functions that were added, removed or changed
+    since the last update are tokenized. Updates are copy-on-write, so searches are never
+    blocked and always see a consistent state.
+    """
+
+    def __init__(self) -> None:
+        self._state = _IndexState(keys={}, entries={}, postings={}, vocabulary=[])
+        self._next_entry_id = 0
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._state.entries)
+
+    def update(self, libraries: Iterable[UserDefinedFunctionLibrary]) -> None:
+        """
+        Synchronize the index with the user defined function libraries of a snapshot.
+
+        Parameters
+        ----------
+        libraries : Iterable[UserDefinedFunctionLibrary]
+            The libraries of the latest snapshot.
+        """
+        with self._lock:
+            state = self._state
+            functions = {
+                (
+                    library.name,
+                    function.name,
+                    function.declaration,
+                    function.definition,
+                    function.documentation,
+                    function.params,
+                    function.examples,
+                ): (library.name, function)
+                for library in libraries
+                for function in library.functions
+            }
+            removed_keys = [key for key in state.keys if key not in functions]
+            added_keys = [key for key in functions if key not in state.keys]
+            if not removed_keys and not added_keys:
+                return
+
+            keys = dict(state.keys)
+            entries = dict(state.entries)
+            postings = dict(state.postings)
+            copied_postings: Dict[str, Dict[int, float]] = {}
+
+            def mutable_posting(token: str) -> Dict[int, float]:
+                posting = copied_postings.get(token)
+                if posting is None:
+                    posting = dict(state.postings.get(token, ()))
+                    copied_postings[token] = posting
+                    postings[token] = posting
+                return posting
+
+            for key in removed_keys:
+                entry_id = keys.pop(key)
+                entry = entries.pop(entry_id)
+                for token in entry.token_weights:
+                    del mutable_posting(token)[entry_id]
+
+            for key in added_keys:
+                library_name, function = functions[key]
+                entry_id = self._next_entry_id
+                self._next_entry_id += 1
+                token_weights = _token_weights(function)
+                keys[key] = entry_id
+                entries[entry_id] = _Entry(library_name, function, token_weights)
+                for token, weight in token_weights.items():
+                    mutable_posting(token)[entry_id] = weight
+
+            for token, posting in copied_postings.items():
+                if not posting:
+                    del postings[token]
+
+            vocabulary = state.vocabulary
+            if any(
+                (token in postings) != (token in state.postings)
+                for token in copied_postings
+            ):
+                vocabulary = sorted(postings)
+            self._state = _IndexState(keys, entries, postings, vocabulary)
+
+    def search(
+        self, query: str, limit: int = 20
+    ) -> List[UserDefinedFunctionSearchResult]:
+        """
+        Find the functions that contain every word of the query, ranked by relevance.
+
+        The last word of the query also matches as a prefix of up to MAX_PREFIX_EXPANSIONS
+        tokens if it has at least MIN_PREFIX_LENGTH characters, so results can be shown
+        while the query is typed.
+
+        Parameters
+        ----------
+        query : str
+            The search query.
+        limit : int
+            The maximum number of results.
+
+        Returns
+        -------
+        List[UserDefinedFunctionSearchResult]
+            The best matching functions, best match first.
+        """
+        state = self._state
+        words = [word.lower() for word in _WORD_PATTERN.findall(query)]
+        if not words:
+            return []
+
+        scores = None
+        for position, word in enumerate(words):
+            word_scores = dict(state.postings.get(word, {}))
+            if position == len(words) - 1 and len(word) >= MIN_PREFIX_LENGTH:
+                self._add_prefix_matches(state, word, word_scores)
+            if scores is None:
+                scores = word_scores
+            else:
+                scores = {
+                    entry_id: score + word_scores[entry_id]
+                    for entry_id, score in scores.items()
+                    if entry_id in word_scores
+                }
+            if not scores:
+                return []
+
+        ranked = heapq.nsmallest(
+            limit,
+            scores.items(),
+            key=lambda item: (-item[1], state.entries[item[0]].function.name),
+        )
+        return [
+            UserDefinedFunctionSearchResult(
+                library=state.entries[entry_id].library,
+                score=score,
+                function=state.entries[entry_id].function,
+            )
+            for entry_id, score in ranked
+        ]
+
+    @staticmethod
+    def _add_prefix_matches(
+        state: _IndexState, prefix: str, word_scores: Dict[int, float]
+    ) -> None:
+        vocabulary = state.vocabulary
+        index = bisect_left(vocabulary, prefix)
+        if index < len(vocabulary) and vocabulary[index] == prefix:
+            # the whole word is matched already
+            index += 1
+        end = min(index + MAX_PREFIX_EXPANSIONS, len(vocabulary))
+        while index < end and vocabulary[index].startswith(prefix):
+            token = vocabulary[index]
+            index += 1
+            for entry_id, weight in state.postings[token].items():
+                score = weight * PREFIX_MATCH_FACTOR
+                if score > word_scores.get(entry_id, 0.0):
+                    word_scores[entry_id] = score
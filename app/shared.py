@@ -0,0 +1,203 @@
+import fcntl
+import json
+import os
+import threading
+from typing import Dict, Optional, Tuple
+
+from .responses import EncodedBody
+from .store import StoredVersion
+
+# the header line of a snapshot file, followed by the three bodies
+_HEADER_END = b"\n"
+
+
+class SharedLock:
+    """
+    An exclusive lock on a file, held by one worker process at a time.
+
+    The lock is released when it is released explicitly or the process exits, so a
+    crashed worker never blocks the others.
+    """
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self._file = None
+
+    def try_acquire(self) -> bool:
+        """
+        Take the lock if no other process holds it, without blocking.
+
+        Returns
+        -------
+        bool
+            True if the lock is held now.
+        """
+        f = open(self.path, "a+b")
+        try:
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            f.close()
+            return False
+        self._file = f
+        return True
+
+    def release(self) -> None:
+        """
+        Release the lock, it is safe to call it if the lock was never acquired.
+        """
+        if self._file is not None:
+            # closing the file releases the lock
+            self._file.close()
+            self._file = None
+
+
+class SharedSnapshotCache:
+    """
+    A directory of the latest serialized snapshots, shared by the app worker processes.
+
+    Every document of every factory is one file holding the pre-encoded response bodies.
+    Files are replaced atomically, so a reader sees either the old or the new snapshot.
+    Every worker reads a new snapshot into its own memory once. Workers notice a new
+    snapshot by the changed status of its file, so a snapshot written by one worker is
+    visible to the others with their next read.
+
+    Parameters
+    ----------
+    directory : str
+        The shared directory, it is created if it does not exist.
+    """
+
+    def __init__(self, directory: str) -> None:
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+        self._seen: Dict[str, Tuple[int, int, int]] = {}
+        self._lock = threading.Lock()
+
+    def _path(self, factory_name: str, document: str) -> str:
+        return os.path.join(self.directory, f"{factory_name}.{document}.snapshot")
+
+    def lock(self, factory_name: str, document: str) -> SharedLock:
+        """
+        Create the lock that allows one worker at a time to refresh a document.
+
+        The documents of a factory have a lock each, so they are loaded concurrently.
+
+        Parameters
+        ----------
+        factory_name : str
+            The name of the factory.
+        document : str
+            One of GLOBAL_PARAMETERS and USER_DEFINED_FUNCTIONS.
+
+        Returns
+        -------
+        SharedLock
+            The lock, not acquired yet.
+        """
+        return SharedLock(
+            os.path.join(self.directory, f"{factory_name}.{document}.lock")
+        )
+
+    def changed(self, factory_name: str, document: str) -> bool:
+        """
+        Check if a snapshot was written since this process read or wrote it last.
+
+        Parameters
+        ----------
+        factory_name : str
+            The name of the factory.
+        document : str
+            One of GLOBAL_PARAMETERS and USER_DEFINED_FUNCTIONS.
+
+        Returns
+        -------
+        bool
+            True if the file changed, False if it did not or does not exist.
+        """
+        path = self._path(factory_name, document)
+        try:
+            status = os.stat(path)
+        except FileNotFoundError:
+            return False
+        with self._lock:
+            return self._seen.get(path) != _identity(status)
+
+    def latest(self, factory_name: str, document: str) -> Optional[StoredVersion]:
+        """
+        Read the latest snapshot of a document.
+
+        Parameters
+        ----------
+        factory_name : str
+            The name of the factory.
+        document : str
+            One of GLOBAL_PARAMETERS and USER_DEFINED_FUNCTIONS.
+
+        Returns
+        -------
+        Optional[StoredVersion]
+            The snapshot or None if no worker wrote one yet.
+        """
+        path = self._path(factory_name, document)
+        try:
+            f = open(path, "rb")
+        except FileNotFoundError:
+            return None
+        with f:
+            status = os.fstat(f.fileno())
+            header = json.loads(f.readline())
+            bodies = [f.read(length) for length in header["lengths"]]
+        with self._lock:
+            self._seen[path] = _identity(status)
+        return StoredVersion(
+            header["source_sha"], header["fetched_at"], EncodedBody(*bodies)
+        )
+
+    def save(
+        self,
+        factory_name: str,
+        document: str,
+        source_sha: str,
+        fetched_at: float,
+        body: EncodedBody,
+    ) -> None:
+        """
+        Replace the snapshot of a document.
+
+        Parameters
+        ----------
+        factory_name : str
+            The name of the factory.
+        document : str
+            One of GLOBAL_PARAMETERS and USER_DEFINED_FUNCTIONS.
+        source_sha : str
+            The SHA-256 of the source file.
+        fetched_at : float
+            The time the snapshot was fetched, in seconds since the epoch.
+        body : EncodedBody
+            The pre-encoded response bodies.
+        """
+        path = self._path(factory_name, document)
+        bodies = (body.identity, body.gzip, body.br)
+        header = json.dumps(
+            {
+                "source_sha": source_sha,
+                "fetched_at": fetched_at,
+                "lengths": [len(b) for b in bodies],
+            }
+        ).encode("utf-8")
+        temporary_path = f"{path}.{os.getpid()}.tmp"
+        with open(temporary_path, "wb") as f:
+            f.write(header + _HEADER_END)
+            for b in bodies:
+                f.write(b)
+            f.flush()
+            status = os.fstat(f.fileno())
+        os.replace(temporary_path, path)
+        with self._lock:
+            # the own write is not a change for this process
+            self._seen[path] = _identity(status)
+
+
+def _identity(status: os.stat_result) -> Tuple[int, int, int]:
+    return (status.st_ino, status.st_mtime_ns, status.st_size)
@@ -0,0 +1,301 @@
+import json
+import sqlite3
+import threading
+from dataclasses import dataclass
+from typing import Any, List, Optional
+
+from .models import GlobalParameters, UserDefinedFunctionLibrary
+from .responses import EncodedBody
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS versions (
+    id INTEGER PRIMARY KEY,
+    factory_name TEXT NOT NULL,
+    document TEXT NOT NULL,
+    source_sha TEXT NOT NULL,
+    stored_at REAL NOT NULL,
+    body BLOB NOT NULL,
+    body_gzip BLOB NOT NULL,
+    body_br BLOB NOT NULL,
+    UNIQUE (factory_name, document, source_sha)
+);
+CREATE INDEX IF NOT EXISTS versions_by_time
+    ON versions (factory_name, document, stored_at);
+CREATE TABLE IF NOT EXISTS global_parameters (
+    version_id INTEGER NOT NULL REFERENCES versions (id) ON DELETE CASCADE,
+    name TEXT NOT NULL,
+    type TEXT NOT NULL,
+    value TEXT NOT NULL,
+    PRIMARY KEY (version_id, name)
+);
+CREATE TABLE IF NOT EXISTS udf_libraries (
+    version_id INTEGER NOT NULL REFERENCES versions (id) ON DELETE CASCADE,
+    position INTEGER NOT NULL,
+    name TEXT NOT NULL,
+    description TEXT NOT NULL,
+    PRIMARY KEY (version_id, position)
+);
+CREATE TABLE IF NOT EXISTS udf_functions (
+    version_id INTEGER NOT NULL REFERENCES versions (id) ON DELETE CASCADE,
+    library_position INTEGER NOT NULL,
+    position INTEGER NOT NULL,
+    name TEXT NOT NULL,
+    declaration TEXT NOT NULL,
+    definition TEXT NOT NULL,
+    documentation TEXT NOT NULL,
+    params TEXT NOT NULL,
+    examples TEXT NOT NULL,
+    PRIMARY KEY (version_id, library_position, position)
+);
+CREATE INDEX IF NOT EXISTS udf_functions_by_name ON udf_functions (name);
+"""
+
+
+@dataclass
+class StoredVersion:
+    source_sha: str
+    stored_at: float
+    body: EncodedBody
+
+
+class SnapshotStore:
+    """
+    A SQLite database of every parsed version of the documents of all factories.
+
+    Every version is keyed by the SHA-256 of its source file and stored twice: as the
+    pre-encoded response bodies, so the latest version is served after a restart with a
+    single indexed read, and as rows of global parameters, libraries and functions, so
+    historical versions can be queried with SQL. Several app workers can share a database.
+
+    Parameters
+    ----------
+    path : str
+        The path of the database file, ':memory:' keeps it in memory.
+    """
+
+    def __init__(self, path: str) -> None:
+        self._connection = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        self._lock = threading.Lock()
+        with self._lock, self._connection:
+            self._connection.execute("PRAGMA journal_mode=WAL")
+            self._connection.execute("PRAGMA foreign_keys=ON")
+            self._connection.executescript(_SCHEMA)
+
+    def close(self) -> None:
+        with self._lock:
+            self._connection.close()
+
+    def save(
+        self,
+        factory_name: str,
+        document: str,
+        source_sha: str,
+        stored_at: float,
+        value: Any,
+        body: EncodedBody,
+    ) -> bool:
+        """
+        Store a parsed version of a document.
+
+        If a version of the same source file exists, for example after a revert, only its
+        time is updated, so it is the latest version again.
+
+        Parameters
+        ----------
+        factory_name : str
+            The name of the factory.
+        document : str
+            One of GLOBAL_PARAMETERS and USER_DEFINED_FUNCTIONS.
+        source_sha : str
+            The SHA-256 of the source file.
+        stored_at : float
+            The time the version was fetched, in seconds since the epoch.
+        value : Any
+            The parsed document.
+        body : EncodedBody
+            The pre-encoded response bodies of the document.
+
+        Returns
+        -------
+        bool
+            True if the version was new.
+        """
+        with self._lock, self._connection:
+            existing = self._connection.execute(
+                "SELECT id FROM versions"
+                " WHERE factory_name = ? AND document = ? AND source_sha = ?",
+                (factory_name, document, source_sha),
+            ).fetchone()
+            if existing is not None:
+                self._connection.execute(
+                    "UPDATE versions SET stored_at = ? WHERE id = ?",
+                    (stored_at, existing[0]),
+                )
+                return False
+            cursor = self._connection.execute(
+                "INSERT INTO versions (factory_name, document, source_sha,"
+                " stored_at, body, body_gzip, body_br) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (
+                    factory_name,
+                    document,
+                    source_sha,
+                    stored_at,
+                    body.identity,
+                    body.gzip,
+                    body.br,
+                ),
+            )
+            version_id = cursor.lastrowid
+            if isinstance(value, GlobalParameters):
+                self._insert_global_parameters(version_id, value)
+            else:
+                self._insert_udf_libraries(version_id, value)
+            return True
+
+    def _insert_global_parameters(
+        self, version_id: int, global_parameters: GlobalParameters
+    ) -> None:
+        self._connection.executemany(
+            "INSERT INTO global_parameters (version_id, name, type, value)"
+            " VALUES (?, ?, ?, ?)",
+            [
+                (version_id, name, parameter.type, json.dumps(parameter.value))
+                for name, parameter in global_parameters.root.items()
+            ],
+        )
+
+    def _insert_udf_libraries(
+        self, version_id: int, libraries: List[UserDefinedFunctionLibrary]
+    ) -> None:
+        self._connection.executemany(
+            "INSERT INTO udf_libraries (version_id, position, name, description)"
+            " VALUES (?, ?, ?, ?)",
+            [
+                (version_id, position, library.name, library.description)
+                for position, library in enumerate(libraries)
+            ],
+        )
+        self._connection.executemany(
+            "INSERT INTO udf_functions (version_id, library_position, position, name,"
+            " declaration, definition, documentation, params, examples)"
+            " VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            [
+                (
+                    version_id,
+                    library_position,
+                    position,
+                    function.name,
+                    function.declaration,
+                    function.definition,
+                    function.documentation,
+                    function.params,
+                    function.examples,
+                )
+                for library_position, library in enumerate(libraries)
+                for position, function in enumerate(library.functions)
+            ],
+        )
+
+    def latest(self, factory_name: str, document: str) -> Optional[StoredVersion]:
+        """
+        Return the most recently stored version of a document.
+
+        Parameters
+        ----------
+        factory_name : str
+            The name of the factory.
+        document : str
+            One of GLOBAL_PARAMETERS and USER_DEFINED_FUNCTIONS.
+
+        Returns
+        -------
+        Optional[StoredVersion]
+            The version or None if the document was never stored.
+        """
+        return self._select_version(
+            "factory_name = ? AND document = ? ORDER BY stored_at DESC, id DESC",
+            (factory_name, document),
+        )
+
+    def version(
+        self, factory_name: str, document: str, source_sha: str
+    ) -> Optional[StoredVersion]:
+        """
+        Return the version of a document parsed from a source file.
+
+        Parameters
+        ----------
+        factory_name : str
+            The name of the factory.
+        document : str
+            One of GLOBAL_PARAMETERS and USER_DEFINED_FUNCTIONS.
+        source_sha : str
+            The SHA-256 of the source file.
+
+        Returns
+        -------
+        Optional[StoredVersion]
+            The version or None if no version of the source file was stored.
+        """
+        return self._select_version(
+            "factory_name = ? AND document = ? AND source_sha = ?",
+            (factory_name, document, source_sha),
+        )
+
+    def versions(
+        self,
+        factory_name: str,
+        document: str,
+        until: Optional[float] = None,
+        limit: int = 100,
+    ) -> List[StoredVersion]:
+        """
+        List the stored versions of a document, newest first, without their bodies.
+
+        Parameters
+        ----------
+        factory_name : str
+            The name of the factory.
+        document : str
+            One of GLOBAL_PARAMETERS and USER_DEFINED_FUNCTIONS.
+        until : Optional[float]
+            Only list versions stored at or before this time, in seconds since the epoch.
+        limit : int
+            The maximum number of versions.
+
+        Returns
+        -------
+        List[StoredVersion]
+            The versions with empty bodies.
+        """
+        with self._lock:
+            rows = self._connection.execute(
+                "SELECT source_sha, stored_at FROM versions"
+                " WHERE factory_name = ? AND document = ? AND stored_at <= ?"
+                " ORDER BY stored_at DESC, id DESC LIMIT ?",
+                (
+                    factory_name,
+                    document,
+                    until if until is not None else float("inf"),
+                    limit,
+                ),
+            ).fetchall()
+        empty = EncodedBody(b"", b"", b"")
+        return [
+            StoredVersion(source_sha, stored_at, empty)
+            for source_sha, stored_at in rows
+        ]
+
+    def _select_version(
+        self, condition: str, parameters: tuple
+    ) -> Optional[StoredVersion]:
+        with self._lock:
+            row = self._connection.execute(
+                "SELECT source_sha, stored_at, body, body_gzip, body_br FROM versions"
+                f" WHERE {condition} LIMIT 1",
+                parameters,
+            ).fetchone()
+        if row is None:
+            return None
+        source_sha, stored_at, identity, gzip, br = row
+        return StoredVersion(source_sha, stored_at, EncodedBody(identity, gzip, br))
@@ -0,0 +1,29 @@
+from .cache import FetchCache
+
+
+def test_fetch_cache_returns_stored_entry():
+    cache = FetchCache(ttl_seconds=60, max_entries=2)
+    cache.put("url", '"abc"', b"{}", {"parsed": True})
+    entry = cache.get("url")
+    assert entry is not None
+    assert entry.etag == '"abc"'
+    assert entry.value == {"parsed": True}
+
+
+def test_fetch_cache_evicts_least_recently_used():
+    cache = FetchCache(ttl_seconds=60, max_entries=2)
+    cache.put("a", "1", b"", 1)
+    cache.put("b", "2", b"", 2)
+    cache.get("a")
+    cache.put("c", "3", b"", 3)
+    assert cache.get("b") is None
+    assert cache.get("a") is not None
+    assert cache.get("c") is not None
+
+
+def test_fetch_cache_expires_entries_after_ttl():
+    cache = FetchCache(ttl_seconds=0, max_entries=2)
+    cache.put("url", "1", b"", 1)
+    cache._entries["url"].stored_at -= 1
+    assert cache.get("url") is None
+    assert len(cache) == 0
@@ -0,0 +1,121 @@
+import json
+import os
+
+from . import cli
+from .cli import main
+from .conftest import arm_template
+
+GLOBAL_PARAMETERS = b'{"SomeParameter": {"type": "string", "value": "a"}}'
+
+
+def _write_repository(
+    path, definition: str = "add(i1, i2)", factory_name: str = "some-factory"
+) -> None:
+    factory = path / factory_name
+    (factory / "globalParameters").mkdir(parents=True, exist_ok=True)
+    (factory / "ARMTemplateForFactory.json").write_bytes(arm_template(definition))
+    (
+        factory / "globalParameters" / f"{factory_name}_GlobalParameters.json"
+    ).write_bytes(GLOBAL_PARAMETERS)
+
+
+def test_cli_writes_json_artifacts_and_skips_unchanged_inputs(tmp_path, capsys):
+    _write_repository(tmp_path / "repository")
+    output = tmp_path / "dist"
+    argv = [str(tmp_path / "repository"), "--output", str(output), "--workers", "1"]
+
+    assert main(argv) == 0
+    assert main(argv) == 0
+    _write_repository(tmp_path / "repository", "subtract(i1, i2)")
+    assert main(argv) == 0
+
+    summaries = capsys.readouterr().out.splitlines()
+    assert summaries == [
+        "Parsed 2, skipped 0, failed 0 inputs.",
+        "Parsed 0, skipped 2, failed 0 inputs.",
+        "Parsed 1, skipped 1, failed 0 inputs.",
+    ]
+    user_defined_functions = json.loads(
+        (output / "some-factory" / "user-defined-functions.json").read_text()
+    )
+    assert user_defined_functions[0]["functions"][0]["definition"] == "subtract(i1, i2)"
+    global_parameters = json.loads(
+        (output / "some-factory" / "global-parameters.json").read_text()
+    )
+    assert global_parameters == json.loads(GLOBAL_PARAMETERS)
+
+
+def test_cli_skips_inputs_of_another_checkout_but_not_of_another_parser(
+    tmp_path, capsys, monkeypatch
+):
+    output = tmp_path / "dist"
+    for checkout in ("first-checkout", "second-checkout"):
+        _write_repository(tmp_path / checkout)
+        assert main([str(tmp_path / checkout), "--output", str(output)]) == 0
+    monkeypatch.setattr(cli, "REPRESENTATION_VERSION", cli.REPRESENTATION_VERSION + 1)
+    assert main([str(tmp_path / "second-checkout"), "--output", str(output)]) == 0
+
+    assert capsys.readouterr().out.splitlines() == [
+        "Parsed 2, skipped 0, failed 0 inputs.",
+        "Parsed 0, skipped 2, failed 0 inputs.",
+        "Parsed 2, skipped 0, failed 0 inputs.",
+    ]
+
+
+def test_cli_keeps_the_manifest_entries_of_inputs_it_did_not_process(tmp_path, capsys):
+    repository = tmp_path / "repository"
+    _write_repository(repository, factory_name="first-factory")
+    _write_repository(repository, factory_name="second-factory")
+    output = tmp_path / "dist"
+
+    assert main([str(repository), "--output", str(output)]) == 0
+    assert main([str(repository / "first-factory"), "--output", str(output)]) == 0
+    manifest = json.loads((output / "manifest.json").read_text())
+    assert main([str(repository), "--output", str(output)]) == 0
+
+    assert sorted(manifest) == [
+        os.path.join(factory_name, f"{document}.json")
+        for factory_name in ("first-factory", "second-factory")
+        for document in ("global-parameters", "user-defined-functions")
+    ]
+    assert capsys.readouterr().out.splitlines() == [
+        "Parsed 4, skipped 0, failed 0 inputs.",
+        "Parsed 0, skipped 2, failed 0 inputs.",
+        "Parsed 0, skipped 4, failed 0 inputs.",
+    ]
+
+
+def test_cli_writes_ndjson_artifacts_of_globbed_inputs(tmp_path):
+    _write_repository(tmp_path / "repository")
+    output = tmp_path / "dist"
+
+    exit_code = main(
+        [
+            str(tmp_path / "repository" / "**" / "*.json"),
+            "--output",
+            str(output),
+            "--format",
+            "ndjson",
+            "--workers",
+            "1",
+        ]
+    )
+
+    assert exit_code == 0
+    lines = (output / "some-factory" / "global-parameters.ndjson").read_text()
+    assert [json.loads(line) for line in lines.splitlines()] == [
+        {"name": "SomeParameter", "type": "string", "value": "a"}
+    ]
+    lines = (output / "some-factory" / "user-defined-functions.ndjson").read_text()
+    assert [json.loads(line)["name"] for line in lines.splitlines()] == ["SomeLibrary"]
+
+
+def test_cli_reports_inputs_that_cannot_be_parsed(tmp_path):
+    factory = tmp_path / "some-factory"
+    factory.mkdir()
+    (factory / "ARMTemplateForFactory.json").write_text("not json")
+
+    exit_code = main([str(tmp_path), "--output", str(tmp_path / "dist")])
+
+    assert exit_code == 1
+    assert json.loads((tmp_path / "dist" / "manifest.json").read_text()) == {}
@@ -0,0 +1,185 @@
+from fastapi.testclient import TestClient
+
+from .conftest import (
+    ARM_TEMPLATE_PATH,
+    BRANCH_NAME,
+    GLOBAL_PARAMETERS_PATH,
+    arm_template,
+)
+from .diff import diff_global_parameters, diff_udf_libraries
+from .main import app
+from .models import GlobalParameters, UserDefinedFunction, UserDefinedFunctionLibrary
+
+
+def _function(
+    name: str, definition: str, documentation: str = "", params: str = ""
+) -> UserDefinedFunction:
+    return UserDefinedFunction(
+        name=name,
+        declaration=f"{name}(double) as double",
+        definition=definition,
+        documentation=documentation,
+        params=params,
+        examples="",
+    )
+
+
+def _library(name: str, *functions: UserDefinedFunction) -> UserDefinedFunctionLibrary:
+    return UserDefinedFunctionLibrary(
+        name=name, description="", functions=list(functions)
+    )
+
+
+def test_diff_reports_added_removed_and_changed_functions():
+    base = [
+        _library("Unchanged", _function("Same", "i1")),
+        _library("Changed", _function("Kept", "i1"), _function("Dropped", "i1")),
+        _library("Removed", _function("Gone", "i1")),
+    ]
+    head = [
+        _library("Unchanged", _function("Same", "i1")),
+        _library("Changed", _function("Kept", "i2", "Doubles"), _function("New", "i1")),
+        _library("Added", _function("Fresh", "i1")),
+    ]
+
+    diff = diff_udf_libraries(base, head)
+
+    assert [(a.library, a.function.name) for a in diff.added] == [
+        ("Changed", "New"),
+        ("Added", "Fresh"),
+    ]
+    assert [(r.library, r.function.name) for r in diff.removed] == [
+        ("Changed", "Dropped"),
+        ("Removed", "Gone"),
+    ]
+    assert len(diff.changed) == 1
+    assert diff.changed[0].library == "Changed"
+    assert diff.changed[0].name == "Kept"
+    assert [change.model_dump() for change in diff.changed[0].changes] == [
+        {"field": "definition", "base": "i1", "head": "i2"},
+        {"field": "documentation", "base": "", "head": "Doubles"},
+    ]
+
+
+def test_diff_reports_changes_of_the_params():
+    base = [_library("Some", _function("Kept", "i1", params="i1=double"))]
+    head = [_library("Some", _function("Kept", "i1", params="i1=integer"))]
+
+    diff = diff_udf_libraries(base, head)
+
+    assert [change.model_dump() for change in diff.changed[0].changes] == [
+        {"field": "params", "base": "i1=double", "head": "i1=integer"}
+    ]
+
+
+def test_diff_reports_added_removed_and_changed_global_parameters():
+    base = GlobalParameters.model_validate(
+        {
+            "Same": {"type": "string", "value": "a"},
+            "Retyped": {"type": "string", "value": "1"},
+            "Revalued": {"type": "int", "value": 1},
+            "Gone": {"type": "bool", "value": True},
+        }
+    )
+    head = GlobalParameters.model_validate(
+        {
+            "Same": {"type": "string", "value": "a"},
+            "Retyped": {"type": "int", "value": "1"},
+            "Revalued": {"type": "int", "value": 2},
+            "Fresh": {"type": "string", "value": "b"},
+        }
+    )
+
+    diff = diff_global_parameters(base, head)
+
+    assert diff.model_dump() == {
+        "added": [{"name": "Fresh", "parameter": {"type": "string", "value": "b"}}],
+        "removed": [{"name": "Gone", "parameter": {"type": "bool", "value": True}}],
+        "changed": [
+            {
+                "name": "Retyped",
+                "base": {"type": "string", "value": "1"},
+                "head": {"type": "int", "value": "1"},
+            },
+            {
+                "name": "Revalued",
+                "base": {"type": "int", "value": 1},
+                "head": {"type": "int", "value": 2},
+            },
+        ],
+    }
+
+
+def test_diff_of_identical_versions_is_empty():
+    libraries = [_library("Some", _function("Same", "i1"), _function("Same", "i2"))]
+
+    diff = diff_udf_libraries(libraries, [lib.model_copy() for lib in libraries])
+
+    assert diff.added == diff.removed == diff.changed == []
+
+
+def test_diff_endpoint_compares_a_commit_with_the_branch(
+    app_settings, local_repository, tmp_path
+):
+    app_settings.setenv("SOURCE", "git_mirror")
+    app_settings.setenv("GIT_REMOTE_URL", local_repository.path)
+    app_settings.setenv("GIT_MIRROR_DIRECTORY", str(tmp_path / "mirrors"))
+    local_repository.commit(
+        {
+            ARM_TEMPLATE_PATH: arm_template("add(i1, i2)"),
+            GLOBAL_PARAMETERS_PATH: b'{"SomeParameter": {"type": "int", "value": 1}}',
+        }
+    )
+    base = local_repository.head()
+    local_repository.commit(
+        {
+            ARM_TEMPLATE_PATH: arm_template("add(i2, i1)"),
+            GLOBAL_PARAMETERS_PATH: b'{"SomeParameter": {"type": "int", "value": 2}}',
+        }
+    )
+
+    with TestClient(app) as client:
+        res = client.get(
+            "/docs/datafactory/user-defined-functions/diff",
+            params={"base": base, "head": BRANCH_NAME},
+        )
+        unchanged = client.get(
+            "/docs/datafactory/user-defined-functions/diff",
+            params={"head": BRANCH_NAME},
+        )
+
+    assert res.status_code == 200
+    assert res.json() == {
+        "added": [],
+        "removed": [],
+        "changed": [
+            {
+                "library": "SomeLibrary",
+                "name": "CustomAdd",
+                "changes": [
+                    {
+                        "field": "definition",
+                        "base": "add(i1, i2)",
+                        "head": "add(i2, i1)",
+                    }
+                ],
+            }
+        ],
+        "global_parameters": {
+            "added": [],
+            "removed": [],
+            "changed": [
+                {
+                    "name": "SomeParameter",
+                    "base": {"type": "int", "value": 1},
+                    "head": {"type": "int", "value": 2},
+                }
+            ],
+        },
+    }
+    assert unchanged.json() == {
+        "added": [],
+        "removed": [],
+        "changed": [],
+        "global_parameters": {"added": [], "removed": [], "changed": []},
+    }
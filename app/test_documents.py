@@ -0,0 +1,160 @@
+import time
+
+from fastapi.testclient import TestClient
+
+from .conftest import ARM_TEMPLATE_PATH, GLOBAL_PARAMETERS_PATH, arm_template
+from .main import app
+
+
+def _definition(client: TestClient) -> str:
+    res = client.get("/docs/datafactory/user-defined-functions")
+    assert res.status_code == 200
+    assert "X-Snapshot-Age" in res.headers
+    return res.json()[0]["functions"][0]["definition"]
+
+
+def test_stale_snapshot_is_served_and_revalidated_in_background(
+    stand_in_github, app_settings
+):
+    app_settings.setenv("SNAPSHOT_SOFT_TTL_SECONDS", "0")
+    stand_in_github.files[ARM_TEMPLATE_PATH] = arm_template("add(i1, i2)")
+
+    with TestClient(app) as client:
+        assert _definition(client) == "add(i1, i2)"
+
+        stand_in_github.files[ARM_TEMPLATE_PATH] = arm_template("add(i2, i1)")
+        time.sleep(0.01)
+        assert _definition(client) == "add(i1, i2)"
+
+        for _ in range(200):
+            if _definition(client) == "add(i2, i1)":
+                break
+            time.sleep(0.01)
+        else:
+            raise AssertionError("the snapshot was not revalidated")
+
+
+def test_snapshot_within_soft_ttl_is_served_without_github(
+    stand_in_github, app_settings
+):
+    stand_in_github.files[ARM_TEMPLATE_PATH] = arm_template("add(i1, i2)")
+
+    with TestClient(app) as client:
+        _definition(client)
+        _definition(client)
+        assert len(stand_in_github.requests) == 1
+
+
+def test_factories_are_selected_by_query_and_aggregated(stand_in_github, app_settings):
+    app_settings.delenv("FACTORY_NAME")
+    app_settings.setenv(
+        "FACTORIES",
+        '[{"factory_name": "first-factory"}, {"factory_name": "second-factory"}]',
+    )
+    for factory_name, definition in [
+        ("first-factory", "add(i1, i2)"),
+        ("second-factory", "subtract(i1, i2)"),
+    ]:
+        stand_in_github.files[
+            f"{factory_name}/ARMTemplateForFactory.json"
+        ] = arm_template(definition)
+
+    with TestClient(app) as client:
+        res = client.get(
+            "/docs/datafactory/user-defined-functions",
+            params={"factory": "second-factory"},
+        )
+        assert res.json()[0]["functions"][0]["definition"] == "subtract(i1, i2)"
+
+        res = client.get("/docs/datafactory/factories/user-defined-functions")
+        assert res.status_code == 200
+        assert {
+            factory_name: libraries[0]["functions"][0]["definition"]
+            for factory_name, libraries in res.json().items()
+        } == {"first-factory": "add(i1, i2)", "second-factory": "subtract(i1, i2)"}
+
+        res = client.get(
+            "/docs/datafactory/user-defined-functions",
+            params={"factory": "unknown-factory"},
+        )
+        assert res.status_code == 404
+
+
+def test_aggregate_returns_the_loaded_factories_and_errors_of_the_others(
+    stand_in_github, app_settings
+):
+    app_settings.delenv("FACTORY_NAME")
+    app_settings.setenv(
+        "FACTORIES",
+        '[{"factory_name": "first-factory"}, {"factory_name": "missing-factory"}]',
+    )
+    stand_in_github.files["first-factory/ARMTemplateForFactory.json"] = arm_template(
+        "add(i1, i2)"
+    )
+
+    with TestClient(app) as client:
+        res = client.get("/docs/datafactory/factories/user-defined-functions")
+
+    assert res.status_code == 200
+    assert res.headers["Cache-Control"] == "no-store"
+    assert res.json()["first-factory"][0]["functions"][0]["definition"] == (
+        "add(i1, i2)"
+    )
+    assert res.json()["missing-factory"]["error"]["status_code"] == 404
+
+
+def test_point_lookups_of_libraries_functions_and_global_parameters(
+    stand_in_github, app_settings
+):
+    stand_in_github.files[ARM_TEMPLATE_PATH] = arm_template("add(i1, i2)")
+    stand_in_github.files[
+        GLOBAL_PARAMETERS_PATH
+    ] = b'{"SomeParameter": {"type": "string", "value": "a"}}'
+    prefix = "/docs/datafactory"
+
+    with TestClient(app) as client:
+        library = client.get(f"{prefix}/user-defined-functions/SomeLibrary")
+        function = client.get(f"{prefix}/user-defined-functions/SomeLibrary/CustomAdd")
+        global_parameter = client.get(f"{prefix}/global-parameters/SomeParameter")
+        search = client.get(f"{prefix}/user-defined-functions/search?q=add")
+        unknown = [
+            client.get(f"{prefix}/user-defined-functions/OtherLibrary"),
+            client.get(f"{prefix}/user-defined-functions/SomeLibrary/CustomSubtract"),
+            client.get(f"{prefix}/global-parameters/OtherParameter"),
+        ]
+
+    assert library.json()["name"] == "SomeLibrary"
+    assert "X-Snapshot-Age" in library.headers
+    assert function.json()["definition"] == "add(i1, i2)"
+    assert global_parameter.json() == {"type": "string", "value": "a"}
+    assert search.json()[0]["function"]["name"] == "CustomAdd"
+    assert [res.status_code for res in unknown] == [404, 404, 404]
+    assert unknown[1].json() == {
+        "message": "Unknown function 'CustomSubtract' in library 'SomeLibrary'."
+    }
+
+
+def test_aggregate_reports_a_factory_whose_document_does_not_parse(
+    stand_in_github, app_settings
+):
+    app_settings.delenv("FACTORY_NAME")
+    app_settings.setenv(
+        "FACTORIES",
+        '[{"factory_name": "first-factory"}, {"factory_name": "broken-factory"}]',
+    )
+    stand_in_github.files[
+        "first-factory/globalParameters/first-factory_GlobalParameters.json"
+    ] = b'{"SomeParameter": {"type": "string", "value": "a"}}'
+    stand_in_github.files[
+        "broken-factory/globalParameters/broken-factory_GlobalParameters.json"
+    ] = b'{"SomeParameter": '
+
+    with TestClient(app) as client:
+        res = client.get("/docs/datafactory/factories/global-parameters")
+
+    assert res.status_code == 200
+    assert res.headers["Cache-Control"] == "no-store"
+    assert res.json()["first-factory"] == {
+        "SomeParameter": {"type": "string", "value": "a"}
+    }
+    assert res.json()["broken-factory"]["error"]["status_code"] == 500
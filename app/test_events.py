@@ -0,0 +1,156 @@
+import asyncio
+import json
+
+import httpx
+
+from .cache import FetchCache
+from .config import GithubSettings
+from .conftest import (
+    ARM_TEMPLATE_PATH,
+    FACTORY_NAME,
+    ORGANIZATION_NAME,
+    REPOSITORY_NAME,
+    arm_template,
+)
+from .documents import USER_DEFINED_FUNCTIONS, DocumentService
+from .events import EVENT_HISTORY, ChangeBroadcaster, udf_change_event
+from .github import GithubClient
+from .models import (
+    ChangedFunction,
+    DocumentChangeEvent,
+    UserDefinedFunction,
+    UserDefinedFunctionLibrary,
+)
+
+
+def _event(snapshot_id: str) -> DocumentChangeEvent:
+    return DocumentChangeEvent(
+        factory=FACTORY_NAME,
+        document=USER_DEFINED_FUNCTIONS,
+        snapshot_id=snapshot_id,
+        libraries=["SomeLibrary"],
+    )
+
+
+async def _frames(subscription, count: int):
+    return [await asyncio.wait_for(subscription.__anext__(), 1) for _ in range(count)]
+
+
+def test_subscribers_receive_published_events_and_missed_ones_on_reconnect():
+    async def subscribe():
+        broadcaster = ChangeBroadcaster(keepalive_seconds=0.01)
+        subscription = broadcaster.subscribe()
+        assert await _frames(subscription, 1) == [b"retry: 5000\n\n"]
+        assert await _frames(subscription, 1) == [b": keepalive\n\n"]
+
+        broadcaster.publish(_event("first"))
+        broadcaster.publish(_event("second"))
+        received = await _frames(subscription, 2)
+        subscribers = broadcaster.subscribers
+        await subscription.aclose()
+
+        reconnected = broadcaster.subscribe(last_event_id="first")
+        missed = await _frames(reconnected, 2)
+        await reconnected.aclose()
+        return received, subscribers, missed, broadcaster.subscribers
+
+    received, subscribers, missed, subscribers_after_close = asyncio.run(subscribe())
+
+    assert received[0].startswith(b"id: first\nevent: change\ndata: ")
+    assert json.loads(received[1].split(b"data: ")[1]) == {
+        "factory": FACTORY_NAME,
+        "document": USER_DEFINED_FUNCTIONS,
+        "snapshot_id": "second",
+        "libraries": ["SomeLibrary"],
+    }
+    assert subscribers == 1
+    assert missed == [b"retry: 5000\n\n", received[1]]
+    assert subscribers_after_close == 0
+
+
+def test_reconnect_after_the_history_is_told_to_resync():
+    async def subscribe():
+        broadcaster = ChangeBroadcaster()
+        for index in range(EVENT_HISTORY + 2):
+            broadcaster.publish(_event(str(index)))
+        subscription = broadcaster.subscribe(last_event_id="0")
+        frames = await _frames(subscription, 2)
+        await subscription.aclose()
+        return frames
+
+    frames = asyncio.run(subscribe())
+
+    assert (
+        frames[0] == f"id: {EVENT_HISTORY + 1}\nevent: resync\ndata: {{}}\n\n".encode()
+    )
+
+
+def test_reload_with_a_different_parse_result_publishes_the_changed_names(
+    stand_in_github,
+):
+    stand_in_github.files[ARM_TEMPLATE_PATH] = arm_template("add(i1, i2)")
+    github_settings = GithubSettings(
+        base_url=stand_in_github.base_url,
+        organization_name=ORGANIZATION_NAME,
+        repository_name=REPOSITORY_NAME,
+        factory_name=FACTORY_NAME,
+        github_adf_token="some-token",
+    )
+
+    async def reload():
+        async with httpx.AsyncClient() as client:
+            document_service = DocumentService(
+                github_settings,
+                GithubClient(client, FetchCache(ttl_seconds=60, max_entries=8)),
+            )
+            await document_service.load(USER_DEFINED_FUNCTIONS)
+            subscription = document_service.changes.subscribe()
+            await _frames(subscription, 1)
+
+            # a reload of the same file publishes nothing
+            await document_service.load(USER_DEFINED_FUNCTIONS)
+            stand_in_github.files[ARM_TEMPLATE_PATH] = arm_template("add(i2, i1)")
+            snapshot = await document_service.load(USER_DEFINED_FUNCTIONS)
+            frames = await _frames(subscription, 1)
+            await subscription.aclose()
+            return snapshot, frames
+
+    snapshot, frames = asyncio.run(reload())
+
+    assert frames[0].startswith(f"id: {snapshot.source_sha}\n".encode())
+    assert json.loads(frames[0].split(b"data: ")[1]) == {
+        "factory": FACTORY_NAME,
+        "document": USER_DEFINED_FUNCTIONS,
+        "snapshot_id": snapshot.source_sha,
+        "libraries": ["SomeLibrary"],
+        "functions": [{"library": "SomeLibrary", "name": "CustomAdd"}],
+    }
+
+
+def test_a_change_of_the_params_only_is_an_event():
+    def libraries(params: str):
+        function = UserDefinedFunction(
+            name="CustomAdd",
+            declaration="CustomAdd(double, double) as double",
+            definition="add(i1, i2)",
+            documentation="Adds two numbers.",
+            params=params,
+            examples="",
+        )
+        return [
+            UserDefinedFunctionLibrary(
+                name="SomeLibrary", description="", functions=[function]
+            )
+        ]
+
+    event = udf_change_event(
+        FACTORY_NAME,
+        USER_DEFINED_FUNCTIONS,
+        "new",
+        libraries("i1: the first number"),
+        libraries("i1: the first summand"),
+    )
+
+    assert event is not None
+    assert event.libraries == ["SomeLibrary"]
+    assert event.functions == [ChangedFunction(library="SomeLibrary", name="CustomAdd")]
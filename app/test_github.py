@@ -0,0 +1,183 @@
+import asyncio
+
+import httpx
+
+from .cache import FetchCache
+from .config import GithubSettings
+from .github import GithubClient, GithubError, arm_template_url
+
+
+def _client(handler) -> GithubClient:
+    return GithubClient(
+        httpx.AsyncClient(transport=httpx.MockTransport(handler)),
+        FetchCache(ttl_seconds=60, max_entries=8),
+    )
+
+
+def test_github_client_coalesces_concurrent_fetches():
+    calls = []
+
+    async def handler(request: httpx.Request) -> httpx.Response:
+        calls.append(request.url)
+        await asyncio.sleep(0.01)
+        return httpx.Response(200, json={"value": 1}, headers={"ETag": '"a"'})
+
+    def parse(res: httpx.Response):
+        return res.json()
+
+    async def run():
+        github_client = _client(handler)
+        return await asyncio.gather(
+            *[
+                github_client.fetch("https://github.test/file", {}, parse)
+                for _ in range(50)
+            ]
+        )
+
+    results = asyncio.run(run())
+    assert len(calls) == 1
+    assert all(result == {"value": 1} for result in results)
+
+
+def test_github_client_does_not_coalesce_other_accept_headers_or_parsers():
+    calls = []
+
+    async def handler(request: httpx.Request) -> httpx.Response:
+        calls.append(request.headers["Accept"])
+        await asyncio.sleep(0.01)
+        return httpx.Response(200, json={"value": 1})
+
+    def parse(res: httpx.Response):
+        return res.json()
+
+    async def run():
+        github_client = _client(handler)
+        raw = {"Accept": "application/vnd.github.raw"}
+        return await asyncio.gather(
+            github_client.fetch("https://github.test/file", raw, parse),
+            github_client.fetch("https://github.test/file", raw, parse),
+            github_client.fetch(
+                "https://github.test/file", {"Accept": "application/json"}, parse
+            ),
+            github_client.fetch("https://github.test/file", raw, lambda r: r.content),
+            # a new callable per call is coalesced by its stable key
+            github_client.fetch(
+                "https://github.test/file", raw, lambda r: r.text, parser_key="text"
+            ),
+            github_client.fetch(
+                "https://github.test/file", raw, lambda r: r.text, parser_key="text"
+            ),
+        )
+
+    results = asyncio.run(run())
+    assert len(calls) == 4
+    assert results[:3] == [{"value": 1}] * 3
+    assert results[3] == b'{"value": 1}'
+    assert results[4] == results[5] == '{"value": 1}'
+
+
+def test_github_client_reuses_parsed_value_on_not_modified():
+    parsed = []
+
+    async def handler(request: httpx.Request) -> httpx.Response:
+        if request.headers.get("If-None-Match") == '"a"':
+            return httpx.Response(304)
+        return httpx.Response(200, json={"value": 1}, headers={"ETag": '"a"'})
+
+    def parse(res: httpx.Response):
+        parsed.append(res)
+        return res.json()
+
+    async def run():
+        github_client = _client(handler)
+        first = await github_client.fetch("https://github.test/file", {}, parse)
+        second = await github_client.fetch("https://github.test/file", {}, parse)
+        return first, second
+
+    first, second = asyncio.run(run())
+    assert first is second
+    assert len(parsed) == 1
+
+
+def test_github_client_does_not_revalidate_the_value_of_another_parser():
+    async def handler(request: httpx.Request) -> httpx.Response:
+        if request.headers.get("If-None-Match") == '"a"':
+            return httpx.Response(304)
+        return httpx.Response(200, json={"value": 1}, headers={"ETag": '"a"'})
+
+    async def run():
+        github_client = _client(handler)
+        parsed = await github_client.fetch(
+            "https://github.test/file", {}, lambda r: r.json(), parser_key="json"
+        )
+        raw = await github_client.fetch(
+            "https://github.test/file", {}, lambda r: r.content, parser_key="raw"
+        )
+        revalidated = await github_client.fetch(
+            "https://github.test/file", {}, lambda r: r.json(), parser_key="json"
+        )
+        return parsed, raw, revalidated
+
+    parsed, raw, revalidated = asyncio.run(run())
+    assert parsed == {"value": 1}
+    assert raw == b'{"value": 1}'
+    assert revalidated is parsed
+
+
+def test_github_client_raises_on_error_status():
+    async def handler(request: httpx.Request) -> httpx.Response:
+        return httpx.Response(404, text="Not Found")
+
+    async def run():
+        await _client(handler).fetch("https://github.test/file", {}, lambda r: r)
+
+    try:
+        asyncio.run(run())
+    except GithubError as e:
+        assert e.status_code == 404
+    else:
+        raise AssertionError("GithubError was not raised")
+
+
+def test_github_client_feeds_streamed_body_to_parser():
+    body = b'{"resources": []}'
+
+    async def handler(request: httpx.Request) -> httpx.Response:
+        return httpx.Response(200, content=body, headers={"ETag": '"a"'})
+
+    class ChunkCollector:
+        def __init__(self) -> None:
+            self.chunks = []
+
+        def feed(self, chunk: bytes) -> None:
+            self.chunks.append(chunk)
+
+        def close(self) -> bytes:
+            return b"".join(self.chunks)
+
+    async def run():
+        github_client = _client(handler)
+        value = await github_client.fetch_streamed(
+            "https://github.test/file", {}, ChunkCollector
+        )
+        return value, github_client.fetch_cache.get(
+            ("https://github.test/file", None, ChunkCollector)
+        )
+
+    value, cached = asyncio.run(run())
+    assert value == body
+    assert cached.body is None
+    assert cached.value == body
+
+
+def test_contents_url_quotes_the_branch_name():
+    github_settings = GithubSettings(
+        base_url="https://api.github.com/repos",
+        organization_name="some-organization",
+        repository_name="some-repository",
+        factory_name="some-factory",
+        github_adf_token="some-token",
+        branch_name="feature/a&b#c",
+    )
+
+    assert arm_template_url(github_settings).endswith("?ref=feature%2Fa%26b%23c")
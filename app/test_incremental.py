@@ -0,0 +1,60 @@
+from .incremental import IncrementalUDFParser
+from .parse import parse_udf_functions_with_comments
+from unittest import TestCase
+
+
+def _template(*libraries):
+    return {
+        "resources": [
+            {
+                "name": f"[concat(parameters('factoryName'), '/{name}')]",
+                "type": "Microsoft.DataFactory/factories/dataflows",
+                "description": "Some Description",
+                "properties": {
+                    "type": "UDFLibrary",
+                    "typeProperties": {"scriptLines": script_lines},
+                },
+            }
+            for name, script_lines in libraries
+        ]
+    }
+
+
+def test_incremental_parser_matches_full_parse_and_reuses_unchanged_content():
+    first_library = (
+        "FirstLibrary",
+        [
+            "CustomDivide(double, double) as double = divide(i1, i2),",
+            "CustomAdd(double, double) as double = add(i1, i2)",
+        ],
+    )
+    second_library = (
+        "SecondLibrary",
+        ["CustomSubtract(double, double) as double = subtract(i1, i2)"],
+    )
+    changed_first_library = (
+        "FirstLibrary",
+        [
+            "CustomDivide(double, double) as double = divide(i1, i2),",
+            "CustomAdd(double, double) as double = add(i2, i1)",
+        ],
+    )
+    parser = IncrementalUDFParser()
+
+    first = parser.parse(_template(first_library, second_library))
+    changed_template = _template(changed_first_library, second_library)
+    second = parser.parse(changed_template)
+
+    TestCase().assertListEqual(
+        [
+            lib.model_dump()
+            for lib in parse_udf_functions_with_comments(changed_template)
+        ],
+        [lib.model_dump() for lib in second],
+    )
+    assert second[1] is first[1]
+    assert second[0].functions[0] is first[0].functions[0]
+    assert parser.stats.library_hits == 1
+    assert parser.stats.library_misses == 3
+    assert parser.stats.function_hits == 1
+    assert parser.stats.function_misses == 4
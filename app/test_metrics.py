@@ -0,0 +1,115 @@
+from fastapi.testclient import TestClient
+
+from .conftest import ARM_TEMPLATE_PATH, arm_template
+from .incremental import IncrementalUDFParser
+from .main import app
+from .metrics import REGISTRY, Histogram, Registry
+
+
+def test_disabled_registry_records_nothing():
+    registry = Registry()
+    histogram = Histogram(registry, "some_seconds", "Some duration.", buckets=(1.0,))
+
+    with histogram.time(stage="some-stage"):
+        pass
+    histogram.observe(0.5, stage="some-stage")
+
+    assert "some_seconds_count" not in registry.expose()
+
+
+def test_histogram_exposes_cumulative_buckets():
+    registry = Registry()
+    registry.enabled = True
+    histogram = Histogram(
+        registry, "some_seconds", "Some duration.", buckets=(1.0, 2.0)
+    )
+
+    histogram.observe(0.5, stage="some-stage")
+    histogram.observe(1.5, stage="some-stage")
+    histogram.observe(3.0, stage="some-stage")
+
+    lines = registry.expose().splitlines()
+    assert "# TYPE some_seconds histogram" in lines
+    assert 'some_seconds_bucket{stage="some-stage",le="1.0"} 1' in lines
+    assert 'some_seconds_bucket{stage="some-stage",le="2.0"} 2' in lines
+    assert 'some_seconds_bucket{stage="some-stage",le="+Inf"} 3' in lines
+    assert 'some_seconds_sum{stage="some-stage"} 5.0' in lines
+    assert 'some_seconds_count{stage="some-stage"} 3' in lines
+
+
+def test_metrics_endpoint_exposes_stages_and_github_responses(
+    stand_in_github, app_settings
+):
+    app_settings.setenv("METRICS_ENABLED", "true")
+    stand_in_github.files[ARM_TEMPLATE_PATH] = arm_template("add(i1, i2)")
+
+    try:
+        with TestClient(app) as client:
+            client.get("/docs/datafactory/user-defined-functions")
+            metrics = client.get("/metrics")
+    finally:
+        REGISTRY.enabled = False
+
+    assert metrics.status_code == 200
+    for stage in ("github_fetch", "udf_split", "udf_function_content"):
+        assert (
+            f'adf_docs_stage_duration_seconds_count{{stage="{stage}"}}' in metrics.text
+        )
+    assert 'adf_docs_github_responses_total{status="200"}' in metrics.text
+    assert "adf_docs_github_rate_limit_remaining 4999" in metrics.text
+
+
+def test_metrics_endpoint_is_not_found_when_disabled(stand_in_github, app_settings):
+    with TestClient(app) as client:
+        response = client.get("/metrics")
+
+    assert response.status_code == 404
+
+
+def _sample(metric: str, level: str) -> float:
+    prefix = f'{metric}{{level="{level}"}} '
+    for line in REGISTRY.expose().splitlines():
+        if line.startswith(prefix):
+            return float(line[len(prefix) :])
+    return 0.0
+
+
+def test_parse_cache_hits_and_misses_are_counted_by_level():
+    template = {
+        "resources": [
+            {
+                "name": "[concat(parameters('factoryName'), '/SomeLibrary')]",
+                "type": "Microsoft.DataFactory/factories/dataflows",
+                "properties": {
+                    "type": "UDFLibrary",
+                    "typeProperties": {
+                        "scriptLines": [
+                            "CustomAdd(double, double) as double = add(i1, i2)"
+                        ]
+                    },
+                },
+            }
+        ]
+    }
+    parser = IncrementalUDFParser()
+    counters = [
+        (metric, level)
+        for metric in (
+            "adf_docs_udf_parse_cache_hits_total",
+            "adf_docs_udf_parse_cache_misses_total",
+        )
+        for level in ("library", "function")
+    ]
+
+    REGISTRY.enabled = True
+    try:
+        before = [_sample(metric, level) for metric, level in counters]
+        parser.parse(template)
+        parser.parse(template)
+        after = [_sample(metric, level) for metric, level in counters]
+    finally:
+        REGISTRY.enabled = False
+
+    # the cold parse misses the library and its function, the steady state reparse hits
+    # the library and does not look at its functions
+    assert [b - a for a, b in zip(before, after)] == [1, 0, 1, 1]
@@ -0,0 +1,95 @@
+import asyncio
+
+import pytest
+from fastapi.testclient import TestClient
+
+from .conftest import (
+    ARM_TEMPLATE_PATH,
+    BRANCH_NAME,
+    GLOBAL_PARAMETERS_PATH,
+    arm_template,
+)
+from .main import app
+from . import mirror
+from .mirror import GitMirror, GitMirrorError
+
+
+def test_mirror_parses_a_file_only_when_its_blob_changes(local_repository, tmp_path):
+    local_repository.commit({"some-file.json": b"1", "other-file.json": b"a"})
+    git_mirror = GitMirror(local_repository.path, str(tmp_path / "mirror.git"))
+    parsed = []
+
+    def parse(content: bytes):
+        parsed.append(content)
+        return {"content": content}
+
+    async def read():
+        return await git_mirror.read(BRANCH_NAME, "some-file.json", parse)
+
+    first = asyncio.run(read())
+    local_repository.commit({"other-file.json": b"b"})
+    unchanged = asyncio.run(read())
+    local_repository.commit({"some-file.json": b"2"})
+    changed = asyncio.run(read())
+
+    assert unchanged is first
+    assert changed == {"content": b"2"}
+    assert parsed == [b"1", b"2"]
+
+
+def test_mirror_keeps_only_the_most_recently_read_files(
+    local_repository, tmp_path, monkeypatch
+):
+    monkeypatch.setattr(mirror, "MAX_PARSED_FILES", 2)
+    git_mirror = GitMirror(local_repository.path, str(tmp_path / "mirror.git"))
+    commits = []
+    for content in (b"1", b"2", b"3"):
+        local_repository.commit({"some-file.json": content})
+        commits.append(local_repository.head())
+
+    async def read_all():
+        return [await git_mirror.read(sha, "some-file.json", bytes) for sha in commits]
+
+    assert asyncio.run(read_all()) == [b"1", b"2", b"3"]
+    assert list(git_mirror._parsed) == [
+        (commits[1], "some-file.json"),
+        (commits[2], "some-file.json"),
+    ]
+
+
+def test_mirror_raises_not_found_for_a_missing_file(local_repository, tmp_path):
+    local_repository.commit({"some-file.json": b"1"})
+    git_mirror = GitMirror(local_repository.path, str(tmp_path / "mirror.git"))
+
+    with pytest.raises(GitMirrorError) as error:
+        asyncio.run(git_mirror.read(BRANCH_NAME, "missing-file.json", bytes))
+
+    assert error.value.status_code == 404
+
+
+def test_endpoints_read_from_the_git_mirror(
+    stand_in_github, app_settings, local_repository, tmp_path
+):
+    app_settings.setenv("SOURCE", "git_mirror")
+    app_settings.setenv(
+        "GIT_REMOTE_URL",
+        str(tmp_path / "remote" / "{organization_name}" / "{repository_name}"),
+    )
+    app_settings.setenv("GIT_MIRROR_DIRECTORY", str(tmp_path / "mirrors"))
+    local_repository.commit(
+        {
+            ARM_TEMPLATE_PATH: arm_template("add(i1, i2)"),
+            GLOBAL_PARAMETERS_PATH: b'{"SomeParameter": {"type": "string", "value": "a"}}',
+        }
+    )
+
+    with TestClient(app) as client:
+        user_defined_functions = client.get("/docs/datafactory/user-defined-functions")
+        global_parameters = client.get("/docs/datafactory/global-parameters")
+
+    assert user_defined_functions.status_code == 200
+    assert user_defined_functions.json()[0]["functions"][0]["name"] == "CustomAdd"
+    assert global_parameters.json() == {
+        "SomeParameter": {"type": "string", "value": "a"}
+    }
+    assert stand_in_github.requests == []
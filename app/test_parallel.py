@@ -0,0 +1,94 @@
+import pytest
+
+from .incremental import IncrementalUDFParser
+from .parallel import ParallelUDFParser, _chunk_libraries
+from .parse import (
+    USER_DEFINED_FUNCTIONS,
+    ResourceDispatcher,
+    parse_udf_functions_with_comments,
+    udf_library_extractor,
+)
+
+
+def _udf_library(index: int, functions: int):
+    script_lines = []
+    for function in range(functions):
+        script_lines.extend(
+            [
+                f"Custom{index}x{function}(double, double) as double = /*",
+                ":Documentation:",
+                f"Function {function} of library {index}.",
+                ":Documentation:",
+                "*/",
+                f"add(i1, {function})" + ("," if function < functions - 1 else ""),
+            ]
+        )
+    return {
+        "name": f"[concat(parameters('factoryName'), '/Library{index}')]",
+        "type": "Microsoft.DataFactory/factories/dataflows",
+        "description": f"Library {index}",
+        "properties": {
+            "type": "UDFLibrary",
+            "typeProperties": {"scriptLines": script_lines},
+        },
+    }
+
+
+TEMPLATE = {
+    "resources": [
+        {
+            "name": "[concat(parameters('factoryName'), '/SomePipeline')]",
+            "type": "Microsoft.DataFactory/factories/pipelines",
+            "properties": {"activities": []},
+        },
+        # libraries of different sizes, so the chunks are uneven
+        *[_udf_library(index, functions=5 + index * 2) for index in range(12)],
+    ]
+}
+# the UDFLibrary resources as the dispatcher hands them to the UDF library extractor
+UDF_LIBRARY = ResourceDispatcher(
+    [udf_library_extractor(lambda udf_library: udf_library)]
+).extract(TEMPLATE["resources"])[USER_DEFINED_FUNCTIONS]
+
+
+@pytest.fixture
+def parallel_parser():
+    parallel_parser = ParallelUDFParser(max_workers=2, min_script_lines=0)
+    yield parallel_parser
+    parallel_parser.close()
+
+
+def test_chunks_keep_the_order_of_the_libraries():
+    chunks = _chunk_libraries(UDF_LIBRARY, 5)
+
+    assert len(chunks) > 1
+    assert [lib for chunk in chunks for lib in chunk] == UDF_LIBRARY
+
+
+def test_parallel_parse_matches_the_serial_parse(parallel_parser):
+    expected = parse_udf_functions_with_comments(TEMPLATE)
+    actual = parallel_parser.parse_libraries(UDF_LIBRARY)
+
+    assert parallel_parser._executor is not None
+    assert actual == expected
+
+
+def test_small_templates_are_parsed_serially():
+    parallel_parser = ParallelUDFParser(max_workers=2, min_script_lines=1_000_000)
+
+    actual = parallel_parser.parse_libraries(UDF_LIBRARY)
+
+    assert parallel_parser._executor is None
+    assert actual == parse_udf_functions_with_comments(TEMPLATE)
+
+
+def test_incremental_cold_parse_in_parallel_is_reused(parallel_parser):
+    udf_parser = IncrementalUDFParser(parallel_parser)
+
+    cold = udf_parser.parse(TEMPLATE)
+    warm = udf_parser.parse(TEMPLATE)
+
+    assert cold == parse_udf_functions_with_comments(TEMPLATE)
+    assert warm == cold
+    assert udf_parser.stats.library_misses == len(UDF_LIBRARY)
+    assert udf_parser.stats.library_hits == len(UDF_LIBRARY)
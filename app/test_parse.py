@@ -1,4 +1,22 @@
-from .parse import parse_global_parameters, parse_udf_functions_with_comments
+import base64
+import json
+
+from pydantic import TypeAdapter
+
+from .models import UserDefinedFunction
+from .parse import (
+    DATAFLOW_RESOURCE_TYPE,
+    ARMTemplateStreamParser,
+    ResourceDispatcher,
+    ResourceExtractor,
+    _parse_isolated_function_strings,
+    _resource_name,
+    udf_library_extractor,
+    parse_global_parameters,
+    parse_global_parameters_json,
+    parse_udf_functions_from_stream,
+    parse_udf_functions_with_comments,
+)
 from unittest import TestCase
 
 
@@ -12,6 +30,13 @@ def test_parse_global_parameters():
     TestCase().assertDictEqual(expected, actual.model_dump())
 
 
+def test_parse_global_parameters_json_matches_the_base64_path():
+    sample_file_content = b'{"SupportedLanguages": {"type": "array", "value": ["en", "de"]}, "MaxMonthsHistorical": {"type": "int", "value": 24}}'
+    expected = parse_global_parameters(base64.b64encode(sample_file_content))
+    actual = parse_global_parameters_json(sample_file_content)
+    TestCase().assertDictEqual(expected.model_dump(), actual.model_dump())
+
+
 def test_parse_udf_functions_with_single_full_documentation():
     sample_file_content = {
         "resources": [
@@ -500,3 +525,148 @@ def test_parse_udf_functions_with_multiple_no_tags():
     ]
 
     TestCase().assertListEqual(expected, actual)
+
+
+def test_parse_udf_functions_from_stream_matches_dict_parser():
+    udf_library = {
+        "name": "[concat(parameters('factoryName'), '/SomeLibrary')]",
+        "type": "Microsoft.DataFactory/factories/dataflows",
+        "apiVersion": "2018-06-01",
+        "description": "Some Description",
+        "properties": {
+            "type": "UDFLibrary",
+            "typeProperties": {
+                "scriptLines": [
+                    "CustomDivide(double, double) as double = /*",
+                    ":Documentation:\r",
+                    "Divide two values and return the quotient.\r",
+                    ":Documentation:\r",
+                    "*/\r",
+                    "\r",
+                    "divide(i1, i2),",
+                    "CustomAdd(double, double) as double = add(i1, i2)",
+                ],
+            },
+        },
+        "dependsOn": [],
+    }
+    sample_file_content = {
+        "$schema": "http://schema.management.azure.com/schemas/2015-01-01/deploymentTemplate.json#",
+        "parameters": {"factoryName": {"type": "string"}},
+        "resources": [
+            {
+                "name": "[concat(parameters('factoryName'), '/SomePipeline')]",
+                "type": "Microsoft.DataFactory/factories/pipelines",
+                "properties": {
+                    "activities": [{"name": "Copy", "typeProperties": {"x": 1.5}}],
+                    "type": "UDFLibrary",
+                },
+            },
+            {
+                "name": "[concat(parameters('factoryName'), '/SomeDataflow')]",
+                "type": "Microsoft.DataFactory/factories/dataflows",
+                "properties": {"type": "MappingDataFlow", "typeProperties": {}},
+            },
+            udf_library,
+        ],
+    }
+    body = json.dumps(sample_file_content).encode("utf-8")
+    chunks = [body[index : index + 7] for index in range(0, len(body), 7)]
+
+    expected = [
+        lib.model_dump()
+        for lib in parse_udf_functions_with_comments(sample_file_content)
+    ]
+    actual = [lib.model_dump() for lib in parse_udf_functions_from_stream(chunks)]
+
+    TestCase().assertListEqual(expected, actual)
+    assert [lib["name"] for lib in actual] == ["SomeLibrary"]
+
+
+def test_parse_isolated_function_strings_splits_on_declarations():
+    script_lines = [
+        "CustomDivide(double, double) as double = /*",
+        ":Documentation:\r",
+        "Divide two values.\r",
+        ":Documentation:\r",
+        "*/\r",
+        "divide(i1, i2),",
+        "CustomAdd(double, double) as double = add(i1, i2)",
+    ]
+
+    expected = [
+        "CustomDivide(double, double) as double = /*\n"
+        ":Documentation:\r\n"
+        "Divide two values.\r\n"
+        ":Documentation:\r\n"
+        "*/\r\n"
+        "divide(i1, i2),\n",
+        "CustomAdd(double, double) as double = add(i1, i2)\n",
+    ]
+
+    TestCase().assertListEqual(expected, _parse_isolated_function_strings(script_lines))
+
+
+def test_resource_dispatcher_serves_every_extractor_in_one_walk():
+    def resource(name, resource_type, **properties):
+        return {
+            "name": f"[concat(parameters('factoryName'), '/{name}')]",
+            "type": f"Microsoft.DataFactory/factories/{resource_type}",
+            "properties": properties,
+        }
+
+    def names(resources):
+        return [_resource_name(resource) for resource in resources]
+
+    extractors = [
+        udf_library_extractor(),
+        # the data flows that are not UDF libraries
+        ResourceExtractor("data_flows", DATAFLOW_RESOURCE_TYPE, None, names),
+        ResourceExtractor(
+            "pipelines", "Microsoft.DataFactory/factories/pipelines", None, names
+        ),
+    ]
+    sample_file_content = {
+        "resources": [
+            resource("SomePipeline", "pipelines", activities=[]),
+            resource("SomeDataset", "datasets", type="DelimitedText"),
+            resource("SomeDataflow", "dataflows", type="MappingDataFlow"),
+            resource(
+                "SomeLibrary",
+                "dataflows",
+                type="UDFLibrary",
+                typeProperties={
+                    "scriptLines": ["CustomAdd(double, double) as double = add(i1, i2)"]
+                },
+            ),
+            resource("SomeTrigger", "triggers", type="ScheduleTrigger"),
+        ]
+    }
+
+    resources = ResourceDispatcher(extractors).extract(sample_file_content["resources"])
+    body = json.dumps(sample_file_content).encode("utf-8")
+    stream_parser = ARMTemplateStreamParser(extractors)
+    for index in range(0, len(body), 7):
+        stream_parser.feed(body[index : index + 7])
+    streamed = stream_parser.close()
+
+    assert [lib.name for lib in resources["user_defined_functions"]] == ["SomeLibrary"]
+    assert resources["data_flows"] == ["SomeDataflow"]
+    assert resources["pipelines"] == ["SomePipeline"]
+    assert streamed == resources
+
+
+def test_trusted_function_equals_the_validated_one():
+    fields = {
+        "name": "CustomAdd",
+        "declaration": "CustomAdd(double, double) as double",
+        "definition": "add(i1, i2)",
+        "documentation": "Adds two numbers.",
+        "params": "i1=double, i2=double",
+        "examples": "CustomAdd(1, 2) -> 3",
+    }
+
+    trusted = UserDefinedFunction.trusted(**fields)
+
+    assert trusted == UserDefinedFunction(**fields)
+    assert TypeAdapter(UserDefinedFunction).dump_python(trusted) == fields
@@ -0,0 +1,165 @@
+import gzip
+
+from fastapi.testclient import TestClient
+
+from .conftest import (
+    ARM_TEMPLATE_PATH,
+    FACTORY_NAME,
+    GLOBAL_PARAMETERS_PATH,
+    arm_template,
+)
+from .main import app
+from .responses import (
+    REPRESENTATION_VERSION,
+    choose_encoding,
+    encode_body,
+    is_not_modified,
+    join_json_object,
+)
+
+
+def test_choose_encoding_prefers_brotli_over_gzip():
+    assert choose_encoding("gzip, deflate, br") == "br"
+    assert choose_encoding("gzip, br;q=0") == "gzip"
+    assert choose_encoding("*") == "br"
+    assert choose_encoding("identity") == "identity"
+    assert choose_encoding(None) == "identity"
+
+
+def test_choose_encoding_prefers_the_highest_quality():
+    assert choose_encoding("br;q=0.1, gzip;q=1.0") == "gzip"
+    assert choose_encoding("br;q=0.5, gzip;q=0.5") == "br"
+    assert choose_encoding("gzip;q=0.2, *;q=0.8") == "br"
+    assert choose_encoding("identity, gzip;q=0.5") == "identity"
+    assert choose_encoding("br;q=0, gzip;q=0") == "identity"
+
+
+def test_encode_body_keeps_all_variants_of_the_same_content():
+    body = encode_body(b'{"some": "value"}')
+    assert gzip.decompress(body.gzip) == body.identity
+
+
+def test_join_json_object():
+    assert join_json_object({"a": b"[1]", "b": b"{}"}) == b'{"a":[1],"b":{}}'
+
+
+def test_endpoint_serves_pre_encoded_body(stand_in_github, app_settings):
+    stand_in_github.files[ARM_TEMPLATE_PATH] = arm_template("add(i1, i2)")
+
+    with TestClient(app) as client:
+        identity = client.get(
+            "/docs/datafactory/user-defined-functions",
+            headers={"Accept-Encoding": "identity"},
+        )
+        compressed = client.get(
+            "/docs/datafactory/user-defined-functions",
+            headers={"Accept-Encoding": "gzip"},
+        )
+
+    assert "Content-Encoding" not in identity.headers
+    assert compressed.headers["Content-Encoding"] == "gzip"
+    assert compressed.json() == identity.json()
+    assert identity.json()[0]["functions"][0]["definition"] == "add(i1, i2)"
+
+
+def test_is_not_modified_compares_tags_weakly_and_prefers_them_over_dates():
+    etag = '"some-sha-gzip"'
+    assert is_not_modified({"If-None-Match": '"other", W/"some-sha-gzip"'}, etag, 0)
+    assert is_not_modified({"If-None-Match": "*"}, etag, 0)
+    assert not is_not_modified({"If-None-Match": '"some-sha"'}, etag, 0)
+    assert not is_not_modified(
+        {
+            "If-None-Match": '"other"',
+            "If-Modified-Since": "Fri, 01 Jan 2100 00:00:00 GMT",
+        },
+        etag,
+        0,
+    )
+    assert is_not_modified(
+        {"If-Modified-Since": "Thu, 01 Jan 1970 00:00:10 GMT"}, etag, 10.5
+    )
+    assert not is_not_modified(
+        {"If-Modified-Since": "Thu, 01 Jan 1970 00:00:09 GMT"}, etag, 10.5
+    )
+    assert not is_not_modified({"If-Modified-Since": "yesterday"}, etag, 10.5)
+
+
+def test_repeat_request_with_the_etag_is_answered_from_the_snapshot(
+    stand_in_github, app_settings
+):
+    app_settings.setenv("HTTP_CACHE_CONTROL", "public, max-age=60")
+    stand_in_github.files[ARM_TEMPLATE_PATH] = arm_template("add(i1, i2)")
+    url = "/docs/datafactory/user-defined-functions"
+
+    with TestClient(app) as client:
+        first = client.get(url, headers={"Accept-Encoding": "br"})
+        requests_after_first = len(stand_in_github.requests)
+        repeat = client.get(
+            url,
+            headers={"Accept-Encoding": "br", "If-None-Match": first.headers["ETag"]},
+        )
+        other_encoding = client.get(
+            url,
+            headers={
+                "Accept-Encoding": "identity",
+                "If-None-Match": first.headers["ETag"],
+            },
+        )
+        function = client.get(f"{url}/SomeLibrary/CustomAdd")
+        function_repeat = client.get(
+            f"{url}/SomeLibrary/CustomAdd",
+            headers={"If-None-Match": function.headers["ETag"]},
+        )
+
+    assert first.headers["Cache-Control"] == "public, max-age=60"
+    assert first.headers["ETag"].endswith('-br"')
+    assert first.headers["ETag"].startswith(f'"v{REPRESENTATION_VERSION}-')
+    assert "Last-Modified" in first.headers
+    assert repeat.status_code == 304
+    assert repeat.content == b""
+    assert repeat.headers["ETag"] == first.headers["ETag"]
+    assert len(stand_in_github.requests) == requests_after_first
+    assert other_encoding.status_code == 200
+    assert function_repeat.status_code == 304
+
+
+def test_bundle_joins_both_documents_and_projects_the_functions(
+    stand_in_github, app_settings
+):
+    stand_in_github.files[ARM_TEMPLATE_PATH] = arm_template("add(i1, i2)")
+    stand_in_github.files[
+        GLOBAL_PARAMETERS_PATH
+    ] = b'{"SomeParameter": {"type": "String", "value": "some value"}}'
+    url = "/docs/datafactory/bundle"
+
+    with TestClient(app) as client:
+        full = client.get(url)
+        projected = client.get(
+            f"{url}?exclude=definition&exclude=examples",
+            headers={"Accept-Encoding": "gzip"},
+        )
+        document_service = client.app.state.document_services[FACTORY_NAME]
+        document_service._bundles.clear()
+        repeat = client.get(
+            f"{url}?exclude=definition&exclude=examples",
+            headers={
+                "Accept-Encoding": "gzip",
+                "If-None-Match": projected.headers["ETag"],
+            },
+        )
+        bundles_after_repeat = len(document_service._bundles)
+        unknown_field = client.get(f"{url}?exclude=name")
+
+    assert full.json()["global_parameters"]["SomeParameter"]["value"] == "some value"
+    assert full.json()["user_defined_functions"][0]["functions"][0]["definition"] == (
+        "add(i1, i2)"
+    )
+    function = projected.json()["user_defined_functions"][0]["functions"][0]
+    assert function["name"] == "CustomAdd"
+    assert "definition" not in function and "examples" not in function
+    assert projected.json()["global_parameters"] == full.json()["global_parameters"]
+    assert projected.headers["Content-Encoding"] == "gzip"
+    assert repeat.status_code == 304
+    # the conditional request is answered without building the bundle
+    assert bundles_after_repeat == 0
+    assert unknown_field.status_code == 422
@@ -0,0 +1,86 @@
+from .models import UserDefinedFunction, UserDefinedFunctionLibrary
+from .search import MAX_PREFIX_EXPANSIONS, UDFSearchIndex
+
+
+def _function(name: str, documentation: str = "") -> UserDefinedFunction:
+    return UserDefinedFunction(
+        name=name,
+        declaration=f"{name}(double, double) as double",
+        definition="",
+        documentation=documentation,
+        params="",
+        examples="",
+    )
+
+
+def _library(*functions: UserDefinedFunction) -> UserDefinedFunctionLibrary:
+    return UserDefinedFunctionLibrary(
+        name="SomeLibrary", description="", functions=list(functions)
+    )
+
+
+def test_search_ranks_name_matches_first_and_matches_prefixes():
+    index = UDFSearchIndex()
+    index.update(
+        [
+            _library(
+                _function("CustomAdd", "Add two values, unlike CustomDivide."),
+                _function("CustomDivide", "Divide two values."),
+            )
+        ]
+    )
+
+    assert [result.function.name for result in index.search("divide")] == [
+        "CustomDivide",
+        "CustomAdd",
+    ]
+    assert [result.function.name for result in index.search("two val")] == [
+        "CustomAdd",
+        "CustomDivide",
+    ]
+    assert [result.function.name for result in index.search("customdiv")] == [
+        "CustomDivide",
+        "CustomAdd",
+    ]
+    assert index.search("multiply") == []
+
+
+def test_search_index_is_updated_incrementally():
+    index = UDFSearchIndex()
+    custom_add = _function("CustomAdd")
+    index.update([_library(custom_add, _function("CustomDivide"))])
+    index.update([_library(custom_add, _function("CustomSubtract"))])
+
+    assert len(index) == 2
+    assert index.search("divide") == []
+    assert [result.function.name for result in index.search("subtract")] == [
+        "CustomSubtract"
+    ]
+
+
+def test_search_index_update_replaces_changed_functions():
+    index = UDFSearchIndex()
+    index.update([_library(_function("CustomAdd", "Add two values."))])
+    index.update([_library(_function("CustomAdd", "Add two numbers."))])
+
+    assert len(index) == 1
+    assert index.search("values") == []
+    assert [result.function.name for result in index.search("numbers")] == ["CustomAdd"]
+
+
+def test_short_and_common_prefixes_expand_to_a_bounded_number_of_tokens():
+    index = UDFSearchIndex()
+    index.update(
+        [
+            _library(
+                *[
+                    _function(f"Custom{index}", f"Returns value{index:03d}.")
+                    for index in range(MAX_PREFIX_EXPANSIONS * 2)
+                ]
+            )
+        ]
+    )
+
+    # shorter than MIN_PREFIX_LENGTH, only whole words match
+    assert index.search("va") == []
+    assert len(index.search("value", limit=1000)) == MAX_PREFIX_EXPANSIONS
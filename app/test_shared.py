@@ -0,0 +1,130 @@
+import asyncio
+
+import httpx
+
+from .cache import FetchCache
+from .config import GithubSettings
+from .conftest import (
+    ARM_TEMPLATE_PATH,
+    FACTORY_NAME,
+    ORGANIZATION_NAME,
+    REPOSITORY_NAME,
+    arm_template,
+)
+from .documents import GLOBAL_PARAMETERS, USER_DEFINED_FUNCTIONS, DocumentService
+from .github import GithubClient
+from .responses import encode_body
+from .shared import SharedSnapshotCache
+
+
+def test_snapshot_written_by_one_worker_is_seen_by_another(tmp_path):
+    writer = SharedSnapshotCache(str(tmp_path))
+    reader = SharedSnapshotCache(str(tmp_path))
+    assert not reader.changed(FACTORY_NAME, USER_DEFINED_FUNCTIONS)
+    assert reader.latest(FACTORY_NAME, USER_DEFINED_FUNCTIONS) is None
+
+    body = encode_body(b'[{"name": "SomeLibrary"}]')
+    writer.save(FACTORY_NAME, USER_DEFINED_FUNCTIONS, "some-sha", 1.5, body)
+
+    assert not writer.changed(FACTORY_NAME, USER_DEFINED_FUNCTIONS)
+    assert reader.changed(FACTORY_NAME, USER_DEFINED_FUNCTIONS)
+    shared = reader.latest(FACTORY_NAME, USER_DEFINED_FUNCTIONS)
+    assert (shared.source_sha, shared.stored_at, shared.body) == ("some-sha", 1.5, body)
+    assert not reader.changed(FACTORY_NAME, USER_DEFINED_FUNCTIONS)
+
+
+def test_lock_is_held_by_one_worker_at_a_time_per_document(tmp_path):
+    shared_cache = SharedSnapshotCache(str(tmp_path))
+    first = shared_cache.lock(FACTORY_NAME, USER_DEFINED_FUNCTIONS)
+    second = shared_cache.lock(FACTORY_NAME, USER_DEFINED_FUNCTIONS)
+    other_document = shared_cache.lock(FACTORY_NAME, GLOBAL_PARAMETERS)
+
+    assert first.try_acquire()
+    assert not second.try_acquire()
+    assert other_document.try_acquire()
+
+    first.release()
+    assert second.try_acquire()
+    second.release()
+    other_document.release()
+
+
+def test_workers_share_the_loaded_snapshot(stand_in_github, tmp_path):
+    stand_in_github.files[ARM_TEMPLATE_PATH] = arm_template("add(i1, i2)")
+    github_settings = GithubSettings(
+        base_url=stand_in_github.base_url,
+        organization_name=ORGANIZATION_NAME,
+        repository_name=REPOSITORY_NAME,
+        factory_name=FACTORY_NAME,
+        github_adf_token="some-token",
+    )
+
+    async def load_in_two_workers():
+        async with httpx.AsyncClient() as client:
+            workers = [
+                DocumentService(
+                    github_settings,
+                    GithubClient(client, FetchCache(ttl_seconds=60, max_entries=8)),
+                    shared_cache=SharedSnapshotCache(str(tmp_path)),
+                )
+                for _ in range(2)
+            ]
+            # both workers refresh at once, the one waiting for the lock adopts
+            return await asyncio.gather(
+                *[worker.load(USER_DEFINED_FUNCTIONS) for worker in workers]
+            )
+
+    loaded, adopted = asyncio.run(load_in_two_workers())
+
+    assert len(stand_in_github.requests) == 1
+    assert adopted.value == loaded.value
+    assert adopted.source_sha == loaded.source_sha
+    assert adopted.udf_index.functions[("SomeLibrary", "CustomAdd")].definition == (
+        "add(i1, i2)"
+    )
+
+
+def test_subscribers_of_every_worker_receive_a_change_with_the_same_id(
+    stand_in_github, tmp_path
+):
+    stand_in_github.files[ARM_TEMPLATE_PATH] = arm_template("add(i1, i2)")
+    github_settings = GithubSettings(
+        base_url=stand_in_github.base_url,
+        organization_name=ORGANIZATION_NAME,
+        repository_name=REPOSITORY_NAME,
+        factory_name=FACTORY_NAME,
+        github_adf_token="some-token",
+        events_poll_seconds=0.01,
+    )
+
+    async def reload_in_one_worker():
+        async with httpx.AsyncClient() as client:
+            loading, idle = [
+                DocumentService(
+                    github_settings,
+                    GithubClient(client, FetchCache(ttl_seconds=60, max_entries=8)),
+                    shared_cache=SharedSnapshotCache(str(tmp_path)),
+                )
+                for _ in range(2)
+            ]
+            await loading.load(USER_DEFINED_FUNCTIONS)
+            await idle.get(USER_DEFINED_FUNCTIONS)
+            subscriptions = [worker.changes.subscribe() for worker in (loading, idle)]
+            for subscription in subscriptions:
+                await subscription.__anext__()
+
+            stand_in_github.files[ARM_TEMPLATE_PATH] = arm_template("add(i2, i1)")
+            snapshot = await loading.load(USER_DEFINED_FUNCTIONS)
+            # the idle worker serves no read and learns of the change by polling
+            frames = [
+                await asyncio.wait_for(subscription.__anext__(), 1)
+                for subscription in subscriptions
+            ]
+            for subscription in subscriptions:
+                await subscription.aclose()
+            return snapshot, frames
+
+    snapshot, frames = asyncio.run(reload_in_one_worker())
+
+    assert frames[0] == frames[1]
+    assert frames[0].startswith(f"id: {snapshot.source_sha}\nevent: change".encode())
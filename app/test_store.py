@@ -0,0 +1,113 @@
+import json
+
+from fastapi.testclient import TestClient
+
+from .conftest import ARM_TEMPLATE_PATH, arm_template
+from .main import app
+from .models import GlobalParameters
+from .parse import parse_udf_functions_with_comments
+from .responses import encode_body
+from .store import SnapshotStore
+
+
+def _udf_libraries(definition: str):
+    return parse_udf_functions_with_comments(json.loads(arm_template(definition)))
+
+
+def test_store_keeps_every_version_and_the_latest_after_a_revert():
+    snapshot_store = SnapshotStore(":memory:")
+    first = _udf_libraries("add(i1, i2)")
+    second = _udf_libraries("subtract(i1, i2)")
+
+    assert snapshot_store.save(
+        "some-factory", "user-defined-functions", "sha-1", 1.0, first, encode_body(b"1")
+    )
+    assert snapshot_store.save(
+        "some-factory",
+        "user-defined-functions",
+        "sha-2",
+        2.0,
+        second,
+        encode_body(b"2"),
+    )
+    assert not snapshot_store.save(
+        "some-factory", "user-defined-functions", "sha-1", 3.0, first, encode_body(b"1")
+    )
+
+    latest = snapshot_store.latest("some-factory", "user-defined-functions")
+    assert (latest.source_sha, latest.body.identity) == ("sha-1", b"1")
+    second_version = snapshot_store.version(
+        "some-factory", "user-defined-functions", "sha-2"
+    )
+    assert second_version.body.identity == b"2"
+    versions = snapshot_store.versions(
+        "some-factory", "user-defined-functions", until=2.5
+    )
+    assert [version.source_sha for version in versions] == ["sha-2"]
+    assert snapshot_store.latest("other-factory", "user-defined-functions") is None
+
+
+def test_store_keeps_queryable_rows():
+    snapshot_store = SnapshotStore(":memory:")
+    global_parameters = GlobalParameters.model_validate(
+        {"SomeParameter": {"type": "array", "value": ["en", "de"]}}
+    )
+
+    snapshot_store.save(
+        "some-factory",
+        "global-parameters",
+        "sha-1",
+        1.0,
+        global_parameters,
+        encode_body(b"{}"),
+    )
+    snapshot_store.save(
+        "some-factory",
+        "user-defined-functions",
+        "sha-2",
+        1.0,
+        _udf_libraries("add(i1, i2)"),
+        encode_body(b"[]"),
+    )
+
+    connection = snapshot_store._connection
+    assert connection.execute(
+        "SELECT name, type, value FROM global_parameters"
+    ).fetchall() == [("SomeParameter", "array", '["en", "de"]')]
+    assert connection.execute(
+        "SELECT udf_libraries.name, udf_functions.name FROM udf_functions"
+        " JOIN udf_libraries USING (version_id)"
+        " WHERE udf_libraries.position = udf_functions.library_position"
+    ).fetchall() == [("SomeLibrary", "CustomAdd")]
+
+
+def test_restart_serves_the_stored_snapshot_without_github(
+    stand_in_github, app_settings, tmp_path
+):
+    app_settings.setenv("SNAPSHOT_STORE_PATH", str(tmp_path / "snapshots.db"))
+    app_settings.setenv("SNAPSHOT_SOFT_TTL_SECONDS", "3600")
+    stand_in_github.files[ARM_TEMPLATE_PATH] = arm_template("add(i1, i2)")
+
+    with TestClient(app) as client:
+        first = client.get("/docs/datafactory/user-defined-functions")
+    requests_before_restart = len(stand_in_github.requests)
+
+    with TestClient(app) as client:
+        restarted = client.get("/docs/datafactory/user-defined-functions")
+        history = client.get("/docs/datafactory/history/user-defined-functions")
+        source_sha = history.json()[0]["source_sha"]
+        version = client.get(
+            f"/docs/datafactory/history/user-defined-functions/{source_sha}"
+        )
+
+    assert len(stand_in_github.requests) == requests_before_restart
+    assert restarted.json() == first.json()
+    assert len(history.json()) == 1
+    assert version.json() == first.json()
+
+
+def test_history_is_not_found_without_a_store(stand_in_github, app_settings):
+    with TestClient(app) as client:
+        response = client.get("/docs/datafactory/history/global-parameters")
+
+    assert response.status_code == 404
@@ -0,0 +1,115 @@
+import hashlib
+import hmac
+import json
+import time
+
+from fastapi.testclient import TestClient
+
+from .conftest import (
+    ARM_TEMPLATE_PATH,
+    FACTORY_NAME,
+    GLOBAL_PARAMETERS_PATH,
+    arm_template,
+)
+from .main import app
+
+WEBHOOK_SECRET = "some-secret"
+
+# trimmed delivery of a Github push event
+PUSH_EVENT = {
+    "ref": "refs/heads/adf_publish",
+    "before": "6113728f27ae82c7b1a177c8d03f9e96e0adf246",
+    "after": "0d1a26e67d8f5eaf1f6ba5c57fc3c7d91ac0fd1c",
+    "repository": {"full_name": "some-organization/azure-datafactory"},
+    "pusher": {"name": "some-user"},
+    "commits": [
+        {
+            "id": "0d1a26e67d8f5eaf1f6ba5c57fc3c7d91ac0fd1c",
+            "message": "Azure Data Factory publish",
+            "added": [],
+            "removed": [],
+            "modified": [ARM_TEMPLATE_PATH],
+        }
+    ],
+}
+
+
+def _signed_headers(body: bytes, secret: str = WEBHOOK_SECRET):
+    signature = hmac.new(secret.encode("utf-8"), body, hashlib.sha256).hexdigest()
+    return {"X-GitHub-Event": "push", "X-Hub-Signature-256": f"sha256={signature}"}
+
+
+def _wait_for_snapshot(client: TestClient, document: str) -> None:
+    for _ in range(200):
+        document_service = client.app.state.document_services[FACTORY_NAME]
+        if document_service.snapshot(document) is not None:
+            return
+        time.sleep(0.01)
+    raise AssertionError(f"'{document}' was not loaded")
+
+
+def test_push_webhook_refreshes_the_warm_snapshot(stand_in_github, app_settings):
+    app_settings.setenv("GITHUB_WEBHOOK_SECRET", WEBHOOK_SECRET)
+    stand_in_github.files[ARM_TEMPLATE_PATH] = arm_template("add(i1, i2)")
+    stand_in_github.files[GLOBAL_PARAMETERS_PATH] = b"{}"
+
+    with TestClient(app) as client:
+        _wait_for_snapshot(client, "user-defined-functions")
+        requests_after_warm_up = len(stand_in_github.requests)
+
+        res = client.get("/docs/datafactory/user-defined-functions")
+        assert res.json()[0]["functions"][0]["definition"] == "add(i1, i2)"
+        assert len(stand_in_github.requests) == requests_after_warm_up
+
+        stand_in_github.files[ARM_TEMPLATE_PATH] = arm_template("add(i2, i1)")
+        body = json.dumps(PUSH_EVENT).encode("utf-8")
+        res = client.post(
+            "/webhooks/github", content=body, headers=_signed_headers(body)
+        )
+        assert res.status_code == 202
+        assert res.json() == {"refreshing": {FACTORY_NAME: ["user-defined-functions"]}}
+
+        res = client.get("/docs/datafactory/user-defined-functions")
+        assert res.json()[0]["functions"][0]["definition"] == "add(i2, i1)"
+
+
+def test_push_webhook_rejects_invalid_signature(stand_in_github, app_settings):
+    app_settings.setenv("GITHUB_WEBHOOK_SECRET", WEBHOOK_SECRET)
+
+    with TestClient(app) as client:
+        body = json.dumps(PUSH_EVENT).encode("utf-8")
+        res = client.post(
+            "/webhooks/github",
+            content=body,
+            headers=_signed_headers(body, secret="another-secret"),
+        )
+        assert res.status_code == 401
+
+
+def test_push_webhook_rejects_a_signed_malformed_payload(stand_in_github, app_settings):
+    app_settings.setenv("GITHUB_WEBHOOK_SECRET", WEBHOOK_SECRET)
+
+    with TestClient(app) as client:
+        for body in (
+            b"not json",
+            b"[]",
+            b'{"repository": "x"}',
+            b'{"commits": [1]}',
+            b'{"commits": [{"modified": "x"}]}',
+        ):
+            res = client.post(
+                "/webhooks/github", content=body, headers=_signed_headers(body)
+            )
+            assert res.status_code == 400
+
+
+def test_push_webhook_ignores_other_branches(stand_in_github, app_settings):
+    app_settings.setenv("GITHUB_WEBHOOK_SECRET", WEBHOOK_SECRET)
+
+    with TestClient(app) as client:
+        body = json.dumps({**PUSH_EVENT, "ref": "refs/heads/main"}).encode("utf-8")
+        res = client.post(
+            "/webhooks/github", content=body, headers=_signed_headers(body)
+        )
+        assert res.status_code == 202
+        assert res.json() == {"refreshing": {}}
@@ -0,0 +1,116 @@
+import hashlib
+import hmac
+import json
+from typing import Any, Dict, List, Optional
+
+from .config import GithubSettings
+from .documents import GLOBAL_PARAMETERS, USER_DEFINED_FUNCTIONS
+from .github import arm_template_path, global_parameters_path
+
+
+def verify_signature(secret: str, body: bytes, signature: Optional[str]) -> bool:
+    """
+    Verify the 'X-Hub-Signature-256' header Github sends with every webhook delivery.
+
+    Parameters
+    ----------
+    secret : str
+        The secret configured for the webhook.
+    body : bytes
+        The raw request body.
+    signature : Optional[str]
+        The value of the signature header.
+
+    Returns
+    -------
+    bool
+        True if the body was signed with the secret.
+    """
+    if not signature or not signature.startswith("sha256="):
+        return False
+    expected = hmac.new(secret.encode("utf-8"), body, hashlib.sha256).hexdigest()
+    return hmac.compare_digest(f"sha256={expected}", signature)
+
+
+def _is_commit(commit: Any) -> bool:
+    if not isinstance(commit, dict):
+        return False
+    for key in ("added", "modified", "removed"):
+        paths = commit.get(key, [])
+        if not isinstance(paths, list) or not all(isinstance(p, str) for p in paths):
+            return False
+    return True
+
+
+def parse_push_payload(body: bytes) -> Dict[str, Any]:
+    """
+    Decode a push event and check the types of the fields the app reads.
+
+    Parameters
+    ----------
+    body : bytes
+        The raw request body.
+
+    Returns
+    -------
+    Dict[str, Any]
+        The payload of the push event.
+
+    Raises
+    ------
+    ValueError
+        If the body is not json or a field has an unexpected type.
+    """
+    try:
+        payload = json.loads(body)
+    except ValueError:
+        payload = None
+    if not isinstance(payload, dict):
+        raise ValueError("The payload is not a json object.")
+    repository = payload.get("repository", {})
+    if not isinstance(repository, dict) or not isinstance(
+        repository.get("full_name", ""), (str, type(None))
+    ):
+        raise ValueError("'repository' is not a json object with a 'full_name'.")
+    commits = payload.get("commits", [])
+    if not isinstance(commits, list) or not all(_is_commit(c) for c in commits):
+        raise ValueError("'commits' is not a list of commits with lists of paths.")
+    return payload
+
+
+def changed_documents(
+    payload: Dict[str, Any], github_settings: GithubSettings
+) -> List[str]:
+    """
+    Find the documents touched by a push event on the configured branch.
+
+    Parameters
+    ----------
+    payload : Dict[str, Any]
+        The payload of a Github push event, as returned by parse_push_payload.
+    github_settings : GithubSettings
+        The configuration object for this app.
+
+    Returns
+    -------
+    List[str]
+        The touched documents out of GLOBAL_PARAMETERS and USER_DEFINED_FUNCTIONS.
+    """
+    if payload.get("ref") != f"refs/heads/{github_settings.branch_name}":
+        return []
+    repository = payload.get("repository", {}).get("full_name")
+    if repository and repository.lower() != (
+        f"{github_settings.organization_name}/{github_settings.repository_name}".lower()
+    ):
+        return []
+
+    touched_paths = set()
+    for commit in payload.get("commits", []):
+        for key in ("added", "modified", "removed"):
+            touched_paths.update(commit.get(key, []))
+
+    paths = {
+        GLOBAL_PARAMETERS: global_parameters_path(github_settings),
+        USER_DEFINED_FUNCTIONS: arm_template_path(github_settings),
+    }
+    return [document for document, path in paths.items() if path in touched_paths]
@@ -0,0 +1,241 @@
+import base64
+import json
+import random
+from typing import Any, Dict, List
+
+WORDS = (
+    "value customer order region total amount date string convert parse lookup "
+    "average divide add subtract multiply return quotient sum first second null"
+).split()
+TYPES = ("double", "integer", "string", "boolean", "date")
+NON_UDF_RESOURCE_TYPES = (
+    "Microsoft.DataFactory/factories/pipelines",
+    "Microsoft.DataFactory/factories/datasets",
+    "Microsoft.DataFactory/factories/linkedServices",
+    "Microsoft.DataFactory/factories/dataflows",
+)
+
+
+def _letters(number: int) -> str:
+    # function names may only contain letters, see _FUNCTION_PATTERN in app/parse.py
+    letters = ""
+    while True:
+        number, remainder = divmod(number, 26)
+        letters = chr(ord("a") + remainder) + letters
+        if number == 0:
+            return letters
+
+
+def _sentence(rng: random.Random, words: int) -> str:
+    return " ".join(rng.choice(WORDS) for _ in range(words))
+
+
+def _function_lines(
+    rng: random.Random, name: str, comment_lines: int, last: bool
+) -> List[str]:
+    arguments = ", ".join(rng.choice(TYPES) for _ in range(rng.randint(1, 4)))
+    declaration = f"{name}({arguments}) as {rng.choice(TYPES)}"
+    definition = f"{rng.choice(WORDS)}(i1, i2)" + ("" if last else ",")
+    if comment_lines == 0:
+        return [f"{declaration} = {definition}"]
+    return [
+        f"{declaration} = /*",
+        ":Documentation:\r",
+        *[_sentence(rng, 12) + "\r" for _ in range(comment_lines)],
+        ":Documentation:\r",
+        "\r",
+        ":Params:\r",
+        f"i1={rng.choice(TYPES)}, i2={rng.choice(TYPES)}\r",
+        ":Params:\r",
+        "\r",
+        ":Example:\r",
+        f"{name}(4.2, 2.1) -> 2.0\r",
+        ":Example:\r",
+        "*/\r",
+        "\r",
+        definition,
+    ]
+
+
+def generate_udf_library(
+    rng: random.Random, index: int, functions: int, comment_lines: int
+) -> Dict[str, Any]:
+    """
+    Generate a UDFLibrary resource.
+
+    Parameters
+    ----------
+    rng : random.Random
+        The seeded random generator.
+    index : int
+        The number of the library, used in its name.
+    functions : int
+        The number of functions in the library.
+    comment_lines : int
+        The number of documentation lines per function, 0 for functions without comment.
+
+    Returns
+    -------
+    Dict[str, Any]
+        The resource as it appears in 'ARMTemplateForFactory.json'.
+    """
+    script_lines = []
+    for function in range(functions):
+        script_lines.extend(
+            _function_lines(
+                rng,
+                f"Custom{rng.choice(WORDS).title()}{_letters(index).title()}"
+                f"{_letters(function).title()}",
+                comment_lines,
+                last=function == functions - 1,
+            )
+        )
+    return {
+        "name": f"[concat(parameters('factoryName'), '/Library{index}')]",
+        "type": "Microsoft.DataFactory/factories/dataflows",
+        "apiVersion": "2018-06-01",
+        "description": _sentence(rng, 8),
+        "properties": {
+            "type": "UDFLibrary",
+            "typeProperties": {
+                "sources": [],
+                "sinks": [],
+                "transformations": [],
+                "scriptLines": script_lines,
+            },
+        },
+        "dependsOn": [],
+    }
+
+
+def generate_other_resource(rng: random.Random, index: int) -> Dict[str, Any]:
+    """
+    Generate a pipeline, dataset, linked service or mapping data flow resource.
+
+    Parameters
+    ----------
+    rng : random.Random
+        The seeded random generator.
+    index : int
+        The number of the resource, used in its name.
+
+    Returns
+    -------
+    Dict[str, Any]
+        The resource as it appears in 'ARMTemplateForFactory.json'.
+    """
+    resource_type = NON_UDF_RESOURCE_TYPES[index % len(NON_UDF_RESOURCE_TYPES)]
+    return {
+        "name": f"[concat(parameters('factoryName'), '/Resource{index}')]",
+        "type": resource_type,
+        "apiVersion": "2018-06-01",
+        "properties": {
+            "description": _sentence(rng, 10),
+            "type": "MappingDataFlow"
+            if resource_type.endswith("dataflows")
+            else "Generic",
+            "annotations": [rng.choice(WORDS) for _ in range(3)],
+            "activities": [
+                {
+                    "name": f"Activity{activity}",
+                    "type": "Copy",
+                    "typeProperties": {
+                        "source": {
+                            "type": "DelimitedTextSource",
+                            "value": rng.random(),
+                        },
+                        "sink": {"type": "ParquetSink"},
+                        "script": [_sentence(rng, 20) for _ in range(5)],
+                    },
+                }
+                for activity in range(rng.randint(1, 6))
+            ],
+        },
+        "dependsOn": [],
+    }
+
+
+def generate_arm_template(
+    libraries: int,
+    functions_per_library: int,
+    comment_lines: int = 3,
+    other_resources: int = 0,
+    seed: int = 0,
+) -> Dict[str, Any]:
+    """
+    Generate a deterministic 'ARMTemplateForFactory.json'.
+
+    Parameters
+    ----------
+    libraries : int
+        The number of UDF libraries.
+    functions_per_library : int
+        The number of functions per library.
+    comment_lines : int
+        The number of documentation lines per function.
+    other_resources : int
+        The number of pipelines, datasets, linked services and data flows.
+    seed : int
+        The seed of the generator, equal seeds produce equal templates.
+
+    Returns
+    -------
+    Dict[str, Any]
+        The ARM template.
+    """
+    rng = random.Random(seed)
+    resources = [
+        generate_udf_library(rng, index, functions_per_library, comment_lines)
+        for index in range(libraries)
+    ]
+    resources.extend(
+        generate_other_resource(rng, index) for index in range(other_resources)
+    )
+    rng.shuffle(resources)
+    return {
+        "$schema": "http://schema.management.azure.com/schemas/2015-01-01/deploymentTemplate.json#",
+        "contentVersion": "1.0.0.0",
+        "parameters": {"factoryName": {"type": "string"}},
+        "resources": resources,
+    }
+
+
+def generate_global_parameters(
+    parameters: int, array_length: int = 10, seed: int = 0
+) -> str:
+    """
+    Generate the base64 content of a deterministic 'YOUR_DATA_FACTORY_GlobalParameters.json'.
+
+    Parameters
+    ----------
+    parameters : int
+        The number of global parameters.
+    array_length : int
+        The number of items of the array parameters.
+    seed : int
+        The seed of the generator, equal seeds produce equal files.
+
+    Returns
+    -------
+    str
+        The base64 encoded file, as returned by the Github contents API.
+    """
+    rng = random.Random(seed)
+    global_parameters = {}
+    for index in range(parameters):
+        kind = index % 4
+        if kind == 0:
+            parameter = {"type": "int", "value": rng.randint(0, 10_000)}
+        elif kind == 1:
+            parameter = {"type": "string", "value": _sentence(rng, 4)}
+        elif kind == 2:
+            parameter = {"type": "bool", "value": rng.random() > 0.5}
+        else:
+            parameter = {
+                "type": "array",
+                "value": [rng.choice(WORDS) for _ in range(array_length)],
+            }
+        global_parameters[f"Parameter{index}"] = parameter
+    return base64.b64encode(json.dumps(global_parameters).encode("utf-8")).decode(
+        "ascii"
+    )
@@ -0,0 +1,287 @@
+"""
+Benchmark the parser stages on synthetic ARM templates and global parameter files.
+
+Usage:
+
+    python -m benchmarks.run --scenario small --scenario medium
+    python -m benchmarks.run --scenario large --save-baseline
+    python -m benchmarks.run --libraries 20 --functions-per-library 500 --other-resources 0
+
+Every run is compared against the stored baseline. A stage that got slower or uses more
+memory than the threshold allows is reported as a regression and the run exits with 1.
+"""
+import argparse
+import base64
+import json
+import sys
+import time
+import tracemalloc
+from pathlib import Path
+from typing import Any, Callable, Dict, List
+
+from pydantic import BaseModel
+
+from app.models import UserDefinedFunction
+from app.parse import (
+    _parse_function_content,
+    _parse_isolated_function_strings,
+    _script_lines,
+    parse_global_parameters,
+    parse_global_parameters_json,
+    parse_udf_functions_from_stream,
+    parse_udf_functions_with_comments,
+)
+
+from .generate import generate_arm_template, generate_global_parameters
+
+DEFAULT_BASELINE = Path(__file__).parent / "baseline.json"
+STREAM_CHUNK_SIZE = 64 * 1024
+
+SCENARIOS: Dict[str, Dict[str, int]] = {
+    "small": {
+        "libraries": 5,
+        "functions_per_library": 20,
+        "comment_lines": 3,
+        "other_resources": 50,
+        "global_parameters": 100,
+    },
+    "medium": {
+        "libraries": 50,
+        "functions_per_library": 100,
+        "comment_lines": 3,
+        "other_resources": 500,
+        "global_parameters": 2_000,
+    },
+    "large": {
+        "libraries": 200,
+        "functions_per_library": 250,
+        "comment_lines": 5,
+        "other_resources": 2_000,
+        "global_parameters": 10_000,
+    },
+}
+
+
+class _FunctionModel(BaseModel):
+    """
+    A validated model with the fields of UserDefinedFunction, to compare the slotted
+    records with.
+    """
+
+    name: str
+    declaration: str
+    definition: str
+    documentation: str
+    params: str
+    examples: str
+
+
+def _stages(scenario: Dict[str, int]) -> Dict[str, Callable[[], Any]]:
+    template = generate_arm_template(
+        libraries=scenario["libraries"],
+        functions_per_library=scenario["functions_per_library"],
+        comment_lines=scenario["comment_lines"],
+        other_resources=scenario["other_resources"],
+    )
+    body = json.dumps(template).encode("utf-8")
+    chunks = [
+        body[index : index + STREAM_CHUNK_SIZE]
+        for index in range(0, len(body), STREAM_CHUNK_SIZE)
+    ]
+    script_lines = [
+        _script_lines(resource)
+        for resource in template["resources"]
+        if resource["properties"].get("type") == "UDFLibrary"
+    ]
+    isolated_function_strings = [
+        function_string
+        for lines in script_lines
+        for function_string in _parse_isolated_function_strings(lines)
+    ]
+    function_contents = [
+        _parse_function_content(function_string)
+        for function_string in isolated_function_strings
+    ]
+    global_parameters = generate_global_parameters(scenario["global_parameters"])
+    raw_global_parameters = base64.b64decode(global_parameters)
+
+    return {
+        "isolated_function_strings": lambda: [
+            _parse_isolated_function_strings(lines) for lines in script_lines
+        ],
+        "function_content": lambda: [
+            _parse_function_content(function_string)
+            for function_string in isolated_function_strings
+        ],
+        "function_records": lambda: [
+            UserDefinedFunction.trusted(**content) for content in function_contents
+        ],
+        "function_models": lambda: [
+            _FunctionModel(**content) for content in function_contents
+        ],
+        "udf_functions_with_comments": lambda: parse_udf_functions_with_comments(
+            template
+        ),
+        "udf_functions_from_stream": lambda: parse_udf_functions_from_stream(chunks),
+        "global_parameters": lambda: parse_global_parameters(global_parameters),
+        "global_parameters_raw": lambda: parse_global_parameters_json(
+            raw_global_parameters
+        ),
+    }
+
+
+def _measure(stage: Callable[[], Any], repeat: int) -> Dict[str, float]:
+    seconds = min(_time(stage) for _ in range(repeat))
+    # memory is traced in a separate run, tracing slows down the timed runs
+    tracemalloc.start()
+    try:
+        stage()
+        _, peak_bytes = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return {"seconds": seconds, "peak_bytes": peak_bytes}
+
+
+def _time(stage: Callable[[], Any]) -> float:
+    start = time.perf_counter()
+    stage()
+    return time.perf_counter() - start
+
+
+def run(
+    scenarios: Dict[str, Dict[str, int]], repeat: int
+) -> Dict[str, Dict[str, float]]:
+    """
+    Measure time and peak memory of every parser stage in every scenario.
+
+    Parameters
+    ----------
+    scenarios : Dict[str, Dict[str, int]]
+        The sizes of the generated inputs by scenario name.
+    repeat : int
+        The number of timed runs per stage, the fastest run is reported.
+
+    Returns
+    -------
+    Dict[str, Dict[str, float]]
+        The measurements by '<scenario>/<stage>'.
+    """
+    results = {}
+    for scenario_name, scenario in scenarios.items():
+        for stage_name, stage in _stages(scenario).items():
+            results[f"{scenario_name}/{stage_name}"] = _measure(stage, repeat)
+    return results
+
+
+def find_regressions(
+    results: Dict[str, Dict[str, float]],
+    baseline: Dict[str, Dict[str, float]],
+    threshold: float,
+) -> List[str]:
+    """
+    Compare measurements against a baseline.
+
+    Parameters
+    ----------
+    results : Dict[str, Dict[str, float]]
+        The current measurements.
+    baseline : Dict[str, Dict[str, float]]
+        The stored measurements.
+    threshold : float
+        The allowed relative increase, 0.2 allows 20% more time or memory.
+
+    Returns
+    -------
+    List[str]
+        A description of every regression.
+    """
+    regressions = []
+    for key, measurement in results.items():
+        if key not in baseline:
+            continue
+        for metric in ("seconds", "peak_bytes"):
+            before = baseline[key][metric]
+            after = measurement[metric]
+            if before > 0 and after > before * (1 + threshold):
+                regressions.append(
+                    f"{key} {metric}: {before:.6g} -> {after:.6g} "
+                    f"(+{(after / before - 1) * 100:.0f}%)"
+                )
+    return regressions
+
+
+def _print_results(
+    results: Dict[str, Dict[str, float]], baseline: Dict[str, Dict[str, float]]
+) -> None:
+    print(f"{'stage':<50} {'time [ms]':>12} {'peak [KiB]':>12} {'vs. baseline':>14}")
+    for key, measurement in results.items():
+        comparison = ""
+        if key in baseline and baseline[key]["seconds"] > 0:
+            ratio = measurement["seconds"] / baseline[key]["seconds"]
+            comparison = f"{(ratio - 1) * 100:+.0f}%"
+        print(
+            f"{key:<50} {measurement['seconds'] * 1000:>12.2f} "
+            f"{measurement['peak_bytes'] / 1024:>12.0f} {comparison:>14}"
+        )
+
+
+def main(argv: List[str] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0].strip())
+    parser.add_argument(
+        "--scenario",
+        action="append",
+        choices=sorted(SCENARIOS),
+        help="A predefined input size, can be given several times. Defaults to small and medium.",
+    )
+    parser.add_argument("--libraries", type=int, help="Run a custom scenario.")
+    parser.add_argument("--functions-per-library", type=int, default=100)
+    parser.add_argument("--comment-lines", type=int, default=3)
+    parser.add_argument("--other-resources", type=int, default=0)
+    parser.add_argument("--global-parameters", type=int, default=1_000)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--baseline", type=Path, default=DEFAULT_BASELINE)
+    parser.add_argument(
+        "--save-baseline",
+        action="store_true",
+        help="Store the measurements as the new baseline.",
+    )
+    parser.add_argument(
+        "--threshold",
+        type=float,
+        default=0.2,
+        help="The allowed relative increase of time or memory before a regression is reported.",
+    )
+    args = parser.parse_args(argv)
+
+    scenarios = {name: SCENARIOS[name] for name in args.scenario or []}
+    if args.libraries is not None:
+        scenarios["custom"] = {
+            "libraries": args.libraries,
+            "functions_per_library": args.functions_per_library,
+            "comment_lines": args.comment_lines,
+            "other_resources": args.other_resources,
+            "global_parameters": args.global_parameters,
+        }
+    if not scenarios:
+        scenarios = {name: SCENARIOS[name] for name in ("small", "medium")}
+
+    baseline = {}
+    if args.baseline.exists():
+        baseline = json.loads(args.baseline.read_text())
+
+    results = run(scenarios, args.repeat)
+    _print_results(results, baseline)
+
+    if args.save_baseline:
+        args.baseline.write_text(json.dumps({**baseline, **results}, indent=2))
+        print(f"Stored the baseline in {args.baseline}.")
+        return 0
+
+    regressions = find_regressions(results, baseline, args.threshold)
+    for regression in regressions:
+        print(f"REGRESSION {regression}")
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())